@@ -0,0 +1,32 @@
+{#
+  Returns a query of the deliveries (hesa_delivery) an incremental model must
+  rebuild: those in the upstream relation that are new to the model, or whose
+  row count or latest load_timestamp differ from the rows the model holds
+  (i.e. the delivery was reloaded since the model last built it).
+
+  Used in an incremental model's WHERE clause, with unique_key='hesa_delivery'
+  so each rebuilt delivery's rows are deleted then re-inserted:
+      {% if is_incremental() %}
+      WHERE hesa_delivery IN ({{ changed_deliveries(ref('stage_hesa_nn056_students')) }})
+      {% endif %}
+
+  Deliveries removed upstream are not removed from the model, run with
+  --full-refresh to rebuild it completely.
+#}
+{% macro changed_deliveries(upstream_relation) %}
+    SELECT upstream.hesa_delivery
+    FROM (
+        SELECT hesa_delivery, COUNT(*) AS row_count, MAX(load_timestamp) AS load_timestamp
+        FROM {{ upstream_relation }}
+        GROUP BY hesa_delivery
+    ) upstream
+    LEFT JOIN (
+        SELECT hesa_delivery, COUNT(*) AS row_count, MAX(load_timestamp) AS load_timestamp
+        FROM {{ this }}
+        GROUP BY hesa_delivery
+    ) built
+        ON built.hesa_delivery = upstream.hesa_delivery
+    WHERE built.hesa_delivery IS NULL
+        OR built.row_count <> upstream.row_count
+        OR NOT (built.load_timestamp <=> upstream.load_timestamp)
+{% endmacro %}
@@ -0,0 +1,41 @@
+{#
+  Post-hook creating the indexes listed in a model's "indexes" config (dbt-mysql
+  has no index support of its own). Each entry gives the columns and, optionally,
+  unique (default false) and name (default ix_/ux_ plus the column names):
+      {{ config(indexes=[
+          {'columns': ['dim_hesa_student_key'], 'unique': true},
+          {'columns': ['hesa_delivery', 'student_guid']}
+      ]) }}
+
+  Applied to every model by the project-level post-hook in dbt_project.yml.
+  Indexes already on the table are skipped, as incremental models keep theirs
+  between runs (table models are re-created, so get theirs again each run).
+  Set var create_indexes to false to build tables without indexes (e.g. to time
+  a build without them, with --full-refresh so existing indexes are dropped).
+#}
+{% macro create_indexes() %}
+    {% set indexes = config.get('indexes', []) %}
+    {% if execute and indexes and var('create_indexes', true) %}
+        {% set existing_query %}
+            SELECT DISTINCT index_name
+            FROM information_schema.statistics
+            WHERE table_schema = '{{ this.schema }}'
+                AND table_name = '{{ this.identifier }}'
+        {% endset %}
+        {% set existing = run_query(existing_query).columns[0].values() | map('lower') | list %}
+
+        {% for index in indexes %}
+            {% set unique = index.get('unique', false) %}
+            {% set index_name = index.get('name') or ((('ux_' if unique else 'ix_') ~ index['columns'] | join('_'))[:64]) %}
+
+            {% if index_name | lower not in existing %}
+                {% set create_query %}
+                    CREATE {{ 'UNIQUE ' if unique }}INDEX {{ index_name }}
+                    ON {{ this }} ({{ index['columns'] | join(', ') }})
+                {% endset %}
+                {% do log('Creating index ' ~ index_name ~ ' on ' ~ this, info=true) %}
+                {% do run_query(create_query) %}
+            {% endif %}
+        {% endfor %}
+    {% endif %}
+{% endmacro %}
@@ -0,0 +1,10 @@
+{#
+  Returns the dim_date key of a date expression, 'DAT_' plus the date as
+  YYYYMMDD (as dim_date is built, see date_key in utils/data_platform_core.py),
+  so models get date keys without joining dim_date:
+      {{ date_key('main_data.enrol_date') }} AS dim_enrol_date_key
+  A NULL date gives a NULL key.
+#}
+{% macro date_key(date_expression) %}
+    CONCAT('DAT_', DATE_FORMAT({{ date_expression }}, '%Y%m%d'))
+{%- endmacro %}
@@ -0,0 +1,27 @@
+{#
+  Returns the load table relation of one delivery's entity, for var
+  hesa_load_layout (see ingest/core/LoadTableLayout.py):
+    - per_delivery : hesa_load_relation('22056_20240331', 'students') is
+      load_hesa_22056_20240331_students
+    - partitioned : it is load_hesa_nn056_students, holding all deliveries
+  (in the target schema, where the load scripts write them).
+#}
+{% macro hesa_load_relation(delivery, entity) %}
+    {% if var('hesa_load_layout', 'per_delivery') == 'partitioned' %}
+        {{ return(api.Relation.create(schema=target.schema, identifier='load_hesa_nn056_' ~ entity)) }}
+    {% endif %}
+    {{ return(api.Relation.create(schema=target.schema, identifier='load_hesa_' ~ delivery ~ '_' ~ entity)) }}
+{% endmacro %}
+
+{#
+  Returns the table reference to select one delivery's entity FROM: its load
+  table, restricted to the delivery's partition in the partitioned layout
+  (explicit partition selection, so only that partition is read).
+#}
+{% macro hesa_load_table(delivery, entity) %}
+    {%- set relation = hesa_load_relation(delivery, entity) -%}
+    {%- if var('hesa_load_layout', 'per_delivery') == 'partitioned' -%}
+        {{ return(relation ~ ' PARTITION (p_' ~ delivery ~ ')') }}
+    {%- endif -%}
+    {{ return(relation) }}
+{% endmacro %}
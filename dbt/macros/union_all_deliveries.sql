@@ -0,0 +1,69 @@
+{#
+  Combines one SELECT per HESA delivery with UNION ALL. The SELECT is the
+  body of a call block, given the delivery code:
+
+      {% call(delivery) union_all_deliveries(['students', 'demographics']) %}
+      SELECT ... FROM {{ hesa_load_table(delivery, 'students') }} ...
+      {% endcall %}
+
+  Deliveries are those in var 'hesa_deliveries' (default in dbt_project.yml,
+  the pipeline passes the deliveries found under deliveries_dir). A delivery
+  without all of the entities' load tables (or load table partitions, in the
+  partitioned layout) is:
+      - a compiler error if in var 'hesa_loaded_deliveries' (those the
+        pipeline run has just loaded, so a missing table is a failed load)
+      - otherwise skipped with a DBT warning (an error with --warn-error)
+
+  UNION ALL, as rows of different deliveries never collide (hesa_delivery
+  differs) so UNION's de-duplication is wasted work; models needing
+  de-duplication within a delivery do it in their SELECT.
+#}
+{% macro union_all_deliveries(entities) %}
+    {%- set partitioned = var('hesa_load_layout', 'per_delivery') == 'partitioned' -%}
+    {%- set partitions = [] -%}
+    {%- if execute and partitioned -%}
+        {%- set partitions_query -%}
+            SELECT CONCAT(table_name, '.', partition_name)
+            FROM information_schema.partitions
+            WHERE table_schema = '{{ target.schema }}'
+                AND partition_name IS NOT NULL
+        {%- endset -%}
+        {%- do partitions.extend(run_query(partitions_query).columns[0].values()) -%}
+    {%- endif -%}
+
+    {%- set deliveries = [] -%}
+    {%- for delivery in var('hesa_deliveries') -%}
+        {%- set missing_tables = [] -%}
+        {%- if execute -%}
+            {%- for entity in entities -%}
+                {%- set load_table = hesa_load_relation(delivery, entity) -%}
+                {%- if partitioned -%}
+                    {%- if (load_table.identifier ~ '.p_' ~ delivery) not in partitions -%}
+                        {%- do missing_tables.append(load_table.identifier ~ ' PARTITION (p_' ~ delivery ~ ')') -%}
+                    {%- endif -%}
+                {%- elif adapter.get_relation(database=load_table.database, schema=load_table.schema, identifier=load_table.identifier) is none -%}
+                    {%- do missing_tables.append(load_table.identifier) -%}
+                {%- endif -%}
+            {%- endfor -%}
+        {%- endif -%}
+        {%- if missing_tables and delivery in var('hesa_loaded_deliveries', []) -%}
+            {{ exceptions.raise_compiler_error("Delivery " ~ delivery ~ " loaded by this run but load tables not found for " ~ this.identifier ~ ": " ~ missing_tables | join(', ')) }}
+        {%- elif missing_tables -%}
+            {%- do exceptions.warn("Delivery " ~ delivery ~ " skipped by " ~ this.identifier ~ ", load tables not found: " ~ missing_tables | join(', ')) -%}
+        {%- else -%}
+            {%- do deliveries.append(delivery) -%}
+        {%- endif -%}
+    {%- endfor -%}
+
+    {%- if execute and not deliveries -%}
+        {{ exceptions.raise_compiler_error("No deliveries with load tables for " ~ this.identifier ~ " (var hesa_deliveries: " ~ var('hesa_deliveries') ~ ")") }}
+    {%- endif -%}
+
+    {%- for delivery in deliveries %}
+{{ caller(delivery) }}
+        {%- if not loop.last %}
+
+UNION ALL
+        {% endif -%}
+    {%- endfor %}
+{% endmacro %}
@@ -3,7 +3,11 @@
 {{ config(
     materialized='table',
     unique_key='dim_hesa_delivery_key',
-    tags=['dimension', 'hesa', 'delivery'])
+    tags=['dimension', 'hesa', 'delivery'],
+    indexes=[
+        {'columns': ['dim_hesa_delivery_key'], 'unique': true},
+        {'columns': ['delivery_code'], 'unique': true}
+    ])
     }}
 
     WITH source_data AS (
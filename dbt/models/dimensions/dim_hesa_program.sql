@@ -1,6 +1,12 @@
-{{ config(materialized='table',
-    unique_key='dim_hesa_program_key',
-    tags=['dimension', 'hesa', 'program'])
+{{ config(materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='hesa_delivery',
+    tags=['dimension', 'hesa', 'program'],
+    indexes=[
+        {'columns': ['dim_hesa_program_key'], 'unique': true},
+        {'columns': ['hesa_delivery', 'program_guid'], 'unique': true},
+        {'columns': ['canonical_program_key']}
+    ])
     }}
 
 /*
@@ -15,6 +21,9 @@
      - Delivery-independent identifier for the same program
      - Enables cross-delivery analysis and reporting
      - Allows tracking the same program across different HESA deliveries
+
+  Built incrementally per delivery, as dim_hesa_student (see changed_deliveries
+  macro). Use --full-refresh to rebuild all deliveries.
 */
 
 WITH main_data AS (
@@ -22,8 +31,12 @@ WITH main_data AS (
             program_code, 
             program_name, 
             source_file, 
-            hesa_delivery
+            hesa_delivery,
+            load_timestamp
     FROM {{ref('stage_hesa_nn056_programs')}}
+    {% if is_incremental() %}
+    WHERE hesa_delivery IN ({{ changed_deliveries(ref('stage_hesa_nn056_programs')) }})
+    {% endif %}
 )
 
 SELECT CONCAT('PGM_', program_guid, '_', hesa_delivery) as dim_hesa_program_key,
@@ -32,5 +45,6 @@ SELECT CONCAT('PGM_', program_guid, '_', hesa_delivery) as dim_hesa_program_key,
         program_code, 
         program_name, 
         source_file, 
-        hesa_delivery
+        hesa_delivery,
+        load_timestamp
 FROM main_data
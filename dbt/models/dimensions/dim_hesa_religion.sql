@@ -3,7 +3,10 @@
 {{ config(
     materialized='table',
     unique_key='dim_hesa_religion_key',
-    tags=['dimension', 'hesa', 'lookup'])
+    tags=['dimension', 'hesa', 'lookup'],
+    indexes=[
+        {'columns': ['dim_hesa_religion_key'], 'unique': true}
+    ])
 }}
 
 WITH source_data AS (
@@ -1,7 +1,13 @@
 {{ config(
-    materialized='table',
-    unique_key='dim_hesa_student_key',
-    tags=['dimension', 'hesa', 'student'])
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='hesa_delivery',
+    tags=['dimension', 'hesa', 'student'],
+    indexes=[
+        {'columns': ['dim_hesa_student_key'], 'unique': true},
+        {'columns': ['hesa_delivery', 'student_guid'], 'unique': true},
+        {'columns': ['canonical_student_key']}
+    ])
 }}
 
 /*
@@ -16,6 +22,11 @@
      - Delivery-independent identifier for the same student
      - Enables cross-delivery analysis and reporting
      - Allows tracking the same student across different HESA deliveries
+
+  Built incrementally per delivery: only deliveries new or reloaded since the
+  last build are selected (see changed_deliveries macro), and their rows are
+  deleted and re-inserted (unique_key is the delivery, not the row key).
+  Use --full-refresh to rebuild all deliveries.
 */
 
 WITH main_data AS (
@@ -41,8 +52,12 @@ WITH main_data AS (
         trans,
         ethnicity_grp1, 
         ethnicity_grp2, 
-        ethnicity_grp3
+        ethnicity_grp3,
+        load_timestamp
     FROM {{ ref('stage_hesa_nn056_students')}}
+    {% if is_incremental() %}
+    WHERE hesa_delivery IN ({{ changed_deliveries(ref('stage_hesa_nn056_students')) }})
+    {% endif %}
 )
 
 SELECT
@@ -70,5 +85,6 @@ SELECT
     trans,
     ethnicity_grp1, 
     ethnicity_grp2, 
-    ethnicity_grp3
+    ethnicity_grp3,
+    load_timestamp
 FROM main_data
\ No newline at end of file
@@ -1,7 +1,15 @@
 {{ config(
-    materialized='table',
-    unique_key=['dim_hesa_student_key', 'dim_hesa_program_key'],
-    tags=['fact', 'hesa', 'enrolment'])
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='hesa_delivery',
+    tags=['fact', 'hesa', 'enrolment'],
+    indexes=[
+        {'columns': ['dim_hesa_student_key', 'dim_hesa_program_key'], 'unique': true},
+        {'columns': ['hesa_delivery']},
+        {'columns': ['canonical_student_key']},
+        {'columns': ['canonical_program_key']},
+        {'columns': ['dim_enrol_date_key']}
+    ])
 }}
 
 /*
@@ -13,16 +21,37 @@
   The same student in two deliveries will have two different dimension keys (STU_<guid>_<delivery1> vs 
   STU_<guid>_<delivery2>) but will share the same student_guid. This student_guid is exposed as 
   canonical_student_key to make its purpose clear - enabling cross-delivery student analysis.
+
+  Incremental build:
+  The table is built per delivery (unique_key above is the delivery, the partition deleted and
+  re-inserted, rather than the row key). Only deliveries whose enrolments, students or programs
+  were loaded since the last build are selected (changed_deliveries macro), and every source is
+  filtered to them, so a run's cost follows the size of new deliveries rather than all history.
+  Use --full-refresh to rebuild all deliveries.
+
+  Date keys:
+  dim_enrol_date_key is computed from enrol_date (date_key macro) rather than joined from dim_date,
+  as dim_date keys are derived from the date alone. The key's relationships test (yml) checks every
+  computed key exists in dim_date, i.e. that dim_date covers the enrolment dates.
 */
 
-WITH main_data AS (
+WITH {% if is_incremental() %}
+changed AS (
+    {{ changed_deliveries(ref('stage_hesa_nn056_student_programs')) }}
+),
+{% endif %}
+main_data AS (
     SELECT student_guid,
             program_guid,
             enrol_date,
             fees_paid,
             source_file,
-            hesa_delivery
+            hesa_delivery,
+            load_timestamp
     FROM {{ ref('stage_hesa_nn056_student_programs') }}
+    {% if is_incremental() %}
+    WHERE hesa_delivery IN (SELECT hesa_delivery FROM changed)
+    {% endif %}
 ),
 students AS (
     SELECT dim_hesa_student_key,
@@ -30,6 +59,9 @@ students AS (
             student_guid,
             hesa_delivery
     FROM {{ ref('dim_hesa_student') }}
+    {% if is_incremental() %}
+    WHERE hesa_delivery IN (SELECT hesa_delivery FROM changed)
+    {% endif %}
 ),
 programs AS (
     SELECT dim_hesa_program_key,
@@ -37,16 +69,14 @@ programs AS (
             program_guid,
             hesa_delivery
     FROM {{ ref('dim_hesa_program') }}
+    {% if is_incremental() %}
+    WHERE hesa_delivery IN (SELECT hesa_delivery FROM changed)
+    {% endif %}
 ),
 deliveries AS (
     SELECT dim_hesa_delivery_key,
             delivery_code
     FROM {{ ref('dim_hesa_delivery') }}
-),
-enrol_dates AS (
-    SELECT dim_date_key,
-            calendar_date
-    FROM {{ source('hesa', 'dim_date') }}
 )
 
 SELECT
@@ -64,14 +94,15 @@ SELECT
 
     -- Fact attributes
     main_data.enrol_date,
-    enrol_dates.dim_date_key as dim_enrol_date_key,
+    {{ date_key('main_data.enrol_date') }} as dim_enrol_date_key,
     main_data.fees_paid,
 
     -- Convert fees_paid from Y/N to 1/0 for ease of reporting
     CASE WHEN main_data.fees_paid = 'Y'
         THEN 1 ELSE 0 END as fees_paid_bool,
     
-    main_data.source_file
+    main_data.source_file,
+    main_data.load_timestamp
 
 FROM main_data
 INNER JOIN students
@@ -82,5 +113,3 @@ INNER JOIN programs
     AND programs.hesa_delivery = main_data.hesa_delivery
 INNER JOIN deliveries
     ON deliveries.delivery_code = main_data.hesa_delivery
-INNER JOIN enrol_dates
-    ON enrol_dates.calendar_date = main_data.enrol_date
@@ -1,15 +1,8 @@
+{% call(delivery) union_all_deliveries(['lookup_ethnicity']) %}
 SELECT
   code,
   label,
   hesa_delivery,
   source_file
-FROM {{ source('hesa', 'load_hesa_22056_20240331_lookup_ethnicity') }}
-
-UNION
-
-SELECT
-  code,
-  label,
-  hesa_delivery,
-  source_file
-FROM {{ source('hesa', 'load_hesa_23056_20250331_lookup_ethnicity') }}
+FROM {{ hesa_load_table(delivery, 'lookup_ethnicity') }}
+{% endcall %}
@@ -1,19 +1,27 @@
-SELECT DISTINCT 
+{#
+  Programs are repeated on each of their enrolments, so are de-duplicated
+  within each delivery (GROUP BY); deliveries are then combined with UNION ALL.
+#}
+{{ config(
+    indexes=[
+        {'columns': ['hesa_delivery', 'program_guid']}
+    ])
+}}
+
+{% call(delivery) union_all_deliveries(['student_programs']) %}
+SELECT 
     t1.program_guid, 
     t1.program_code, 
     t1.program_name, 
     t1.source_file, 
-    t1.hesa_delivery
-FROM 
-    {{ source('hesa', 'load_hesa_22056_20240331_student_programs') }} t1
-
-UNION
-
-SELECT DISTINCT 
-    t2.program_guid, 
-    t2.program_code, 
-    t2.program_name, 
-    t2.source_file, 
-    t2.hesa_delivery
+    t1.hesa_delivery,
+    MAX(t1.load_timestamp) AS load_timestamp
 FROM 
-    {{ source('hesa', 'load_hesa_23056_20250331_student_programs') }} t2
+    {{ hesa_load_table(delivery, 'student_programs') }} t1
+GROUP BY 
+    t1.program_guid, 
+    t1.program_code, 
+    t1.program_name, 
+    t1.source_file, 
+    t1.hesa_delivery
+{% endcall %}
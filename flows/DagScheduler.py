@@ -0,0 +1,120 @@
+import time
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class DagScheduler():
+    """
+    Small DAG scheduler for pipeline steps. Each node is a callable
+    (returning True on success) with a list of nodes it depends on.
+
+    A node starts as soon as all its dependencies have succeeded, with at
+    most max_workers nodes running at once. A node whose dependency failed
+    (or was skipped) is skipped, while unrelated nodes carry on.
+
+    Nodes already completed (e.g. by an earlier run being resumed) can be
+    passed to run, counting as succeeded without running again.
+
+    Usage: add_node for each step, then call run.
+    """
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+    def __init__(self, max_workers: int = 1, on_node_finished=None):
+        """Constructor for DagScheduler object. Parameters:
+            - max_workers : maximum number of nodes running at once
+            - on_node_finished : optional callable(name, status), called as each node finishes or is skipped
+        """
+        self.max_workers = max_workers
+        self.on_node_finished = on_node_finished
+        self.nodes = {}
+
+
+    def add_node(self, name: str, step, depends_on: list = None):
+        """Adds a node. Parameters:
+            - name : unique node name (e.g. 'extract_students_22056_20240331')
+            - step : callable taking no arguments, returning True on success
+            - depends_on : names of nodes that must succeed before this one starts
+        """
+        if name in self.nodes:
+            raise ValueError(f"Node {name} already added")
+
+        self.nodes[name] = {"step": step, "depends_on": list(depends_on or [])}
+
+
+    def _run_node(self, name: str):
+        """Runs a node's step, returning (success, elapsed seconds). Exceptions count as failure."""
+        start_time = time.time()
+        try:
+            success = bool(self.nodes[name]["step"]())
+        except Exception as e:
+            logging.error(f"{type(e).__name__} in node {name}: {e}")
+            logging.error(traceback.format_exc())
+            success = False
+
+        return success, time.time() - start_time
+
+
+    def _finish_node(self, results: dict, name: str, status: str, elapsed: float):
+        results[name] = {"status": status, "elapsed": elapsed}
+        if self.on_node_finished:
+            self.on_node_finished(name, status)
+
+
+    def run(self, completed: list = None):
+        """
+        Runs all nodes in dependency order, other than those in completed
+        (which count as succeeded, with "reused" set in their results).
+
+        Returns dictionary of {node name: {"status": succeeded/failed/skipped,
+        "elapsed": seconds}}, in the order nodes were added.
+        """
+        for name, node in self.nodes.items():
+            unknown = [dep for dep in node["depends_on"] if dep not in self.nodes]
+            if unknown:
+                raise ValueError(f"Node {name} depends on unknown node(s): {unknown}")
+
+        results = {name: {"status": self.SUCCEEDED, "elapsed": 0.0, "reused": True}
+                   for name in (completed or []) if name in self.nodes}
+        pending = [name for name in self.nodes if name not in results]
+        running = {}
+
+        if results:
+            logging.info(f"Reusing {len(results)} completed nodes, running {len(pending)}")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                # Skip nodes with a failed/skipped dependency, start nodes whose dependencies
+                # all succeeded (rescanning, as a skip may cascade to nodes earlier in the list)
+                rescan = True
+                while rescan:
+                    rescan = False
+                    for name in list(pending):
+                        dep_statuses = [results[dep]["status"] for dep in self.nodes[name]["depends_on"] if dep in results]
+
+                        if any(status != self.SUCCEEDED for status in dep_statuses):
+                            pending.remove(name)
+                            self._finish_node(results, name, self.SKIPPED, 0.0)
+                            rescan = True
+                            logging.warning(f"Node {name} skipped (dependency did not succeed)")
+
+                        elif len(dep_statuses) == len(self.nodes[name]["depends_on"]) and len(running) < self.max_workers:
+                            running[executor.submit(self._run_node, name)] = name
+                            pending.remove(name)
+                            logging.info(f"Node {name} started")
+
+                if not running:
+                    if pending:
+                        raise ValueError(f"Dependency cycle between nodes: {pending}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    success, elapsed = future.result()
+                    self._finish_node(results, name, self.SUCCEEDED if success else self.FAILED, elapsed)
+                    logging.info(f"Node {name} {results[name]['status']} in {elapsed:.2f} seconds")
+
+        return {name: results[name] for name in self.nodes}
@@ -0,0 +1,124 @@
+import os
+import glob
+import json
+import logging
+
+
+class DbtProjectRunner():
+    """
+    Helper class running the DBT project in-process via dbt-core's dbtRunner,
+    rather than shelling out to 'dbt run' once per model folder.
+
+    The project is parsed once per process and the manifest kept for later
+    runs, until a project file (model, macro, seed or project config) changes. Partial parsing state (partial_parse.msgpack), the manifest and
+    run_results.json are written to dbt_target_dir under _mounts, so they
+    persist between containers and later processes only re-parse changed files.
+
+    Usage: instantiate and then call run (e.g. run("staging+")).
+    """
+    # Parsed manifests already loaded by this process: {project dir: (project files signature, manifest)}
+    _manifests = {}
+
+    def __init__(self, config: dict, threads: int = None):
+        """Constructor for DbtProjectRunner object. Parameters:
+            - config : app config (provides dbt_project_dir and dbt_target_dir)
+            - threads : number of models DBT builds at once (default: profile setting)
+        """
+        self.project_dir = config["dbt_project_dir"]
+        self.profiles_dir = os.getenv("DBT_PROFILES_DIR") or os.path.join(self.project_dir, "profiles")
+        self.target_dir = config["dbt_target_dir"]
+        self.threads = threads
+
+
+    def _common_args(self):
+        """Returns CLI arguments shared by all DBT commands."""
+        return ["--project-dir", self.project_dir,
+                "--profiles-dir", self.profiles_dir,
+                "--target-path", self.target_dir]
+
+
+    def project_files(self):
+        """Returns paths of project files that models are built from (models, macros, seeds, project config)."""
+        project_files = [os.path.join(self.project_dir, "dbt_project.yml"), os.path.join(self.project_dir, "packages.yml")]
+
+        for folder in ["models", "macros", "seeds"]:
+            project_files += glob.glob(os.path.join(self.project_dir, folder, "**", "*.*"), recursive=True)
+
+        return project_files
+
+
+    def _project_signature(self):
+        """Returns (path, size, modified time) of each existing project file (stat calls only)."""
+        signature = []
+        for project_file in sorted(self.project_files()):
+            if os.path.exists(project_file):
+                file_stat = os.stat(project_file)
+                signature.append((project_file, file_stat.st_size, file_stat.st_mtime_ns))
+
+        return signature
+
+
+    def _get_manifest(self):
+        """
+        Returns parsed manifest, parsing the project (partially, if state exists)
+        once per process, or again if project files have changed since (e.g. models
+        edited while a long-running watcher is up).
+        """
+        # dbt is imported on first use, as its import is slow and only needed here
+        from dbt.cli.main import dbtRunner
+
+        signature = self._project_signature()
+        loaded = self._manifests.get(self.project_dir)
+        if loaded and loaded[0] == signature:
+            return loaded[1]
+
+        result = dbtRunner().invoke(["parse", "--partial-parse"] + self._common_args())
+        if not result.success:
+            raise RuntimeError(f"DBT parse failed: {result.exception}")
+
+        logging.info(f"Parsed DBT project {self.project_dir} (state in {self.target_dir})")
+
+        self._manifests[self.project_dir] = (signature, result.result)
+        return result.result
+
+
+    def parse(self):
+        """Parses the project now (e.g. to warm up a long-running process), rather than on first run."""
+        self._get_manifest()
+
+
+    def run(self, select: str = "staging+", full_refresh: bool = False, dbt_vars: dict = None):
+        """
+        Runs selected models as one graph-ordered DBT invocation. With
+        full_refresh, incremental models are rebuilt from scratch. dbt_vars
+        override the project's vars (e.g. {"hesa_deliveries": [...]}).
+
+        Returns (success, model timings), where model timings is a list of
+        {"model", "status", "execution_time", "rows_affected"} dictionaries
+        from run_results.
+        """
+        from dbt.cli.main import dbtRunner
+
+        run_args = ["run", "--select", select] + self._common_args()
+        if self.threads:
+            run_args += ["--threads", str(self.threads)]
+        if full_refresh:
+            run_args.append("--full-refresh")
+        if dbt_vars:
+            run_args += ["--vars", json.dumps(dbt_vars)]
+
+        result = dbtRunner(manifest=self._get_manifest()).invoke(run_args)
+
+        model_timings = []
+        if result.result is not None:
+            for node_result in result.result.results:
+                model_timings.append({"model": node_result.node.name,
+                                      "status": str(node_result.status),
+                                      "execution_time": node_result.execution_time,
+                                      "rows_affected": (node_result.adapter_response or {}).get("rows_affected")})
+
+        if not result.success:
+            logging.error(f"DBT run --select {select} failed: {result.exception}")
+
+        logging.info(f"DBT run --select {select} built {len(model_timings)} models")
+        return result.success, model_timings
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import logging
+
+
+class DeliveryWatcher():
+    """
+    Helper class watching deliveries_dir for new or changed deliveries.
+
+    Each poll is a cheap stat-only scan: a delivery's signature is the
+    name, size and modified time of each file in its folder (folders
+    without a <code>/<code>.json manifest are ignored). A new or changed
+    delivery is only returned as ready once none of its files has been
+    modified for settle_seconds (debounce, so files still being copied in
+    are not processed half-written).
+
+    Signatures of processed deliveries are saved in cache_dir, so a
+    restarted watcher does not re-process them.
+
+    Usage: instantiate, call poll periodically, mark_processed after processing.
+    """
+    def __init__(self, config: dict, settle_seconds: float = 30, process_existing: bool = False):
+        """Constructor for DeliveryWatcher object. Parameters:
+            - config : app config (provides deliveries_dir and cache_dir)
+            - settle_seconds : time a delivery must be unchanged before it is ready
+            - process_existing : treat deliveries already present at first start as new
+        """
+        self.deliveries_dir = config["deliveries_dir"]
+        self.state_path = os.path.join(config["cache_dir"], "delivery_watcher.json")
+        self.settle_seconds = settle_seconds
+
+        # Changed deliveries waiting to settle (logged once each)
+        self.pending = set()
+
+        # Signatures of processed deliveries: {delivery code: {"signature", "status", "run_id"}}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r") as state_file:
+                self.processed = json.load(state_file)
+        else:
+            self.processed = {}
+            if not process_existing:
+                for delivery_code, signature in self.scan().items():
+                    self.processed[delivery_code] = {"signature": signature, "status": "existing", "run_id": None}
+                self._save_state()
+                logging.info(f"Delivery watcher started, {len(self.processed)} existing deliveries not processed")
+
+
+    def scan(self):
+        """Returns {delivery code: signature} of delivery folders with a manifest (stat calls only)."""
+        signatures = {}
+
+        with os.scandir(self.deliveries_dir) as folders:
+            for folder in folders:
+                if not folder.is_dir() or not os.path.exists(os.path.join(folder.path, f"{folder.name}.json")):
+                    continue
+
+                with os.scandir(folder.path) as files:
+                    file_stats = [[entry.name, entry.stat().st_size, entry.stat().st_mtime_ns]
+                                  for entry in files if entry.is_file()]
+                signatures[folder.name] = sorted(file_stats)
+
+        return signatures
+
+
+    def poll(self, now: float = None):
+        """Scans deliveries_dir, returning list of (delivery code, signature) ready to process."""
+        now = now or time.time()
+        ready = []
+
+        for delivery_code, signature in self.scan().items():
+            if self.processed.get(delivery_code, {}).get("signature") == signature:
+                self.pending.discard(delivery_code)
+                continue
+
+            last_modified = max(mtime_ns for _, _, mtime_ns in signature) / 1e9
+            if now - last_modified >= self.settle_seconds:
+                ready.append((delivery_code, signature))
+
+            elif delivery_code not in self.pending:
+                self.pending.add(delivery_code)
+                logging.info(f"Delivery {delivery_code} new or changed, waiting for it to be unchanged for {self.settle_seconds}s")
+
+        return ready
+
+
+    def mark_processed(self, delivery_code: str, signature: list, status: str, run_id: str = None):
+        """Records a delivery's signature as processed (with its run status), so it isn't processed again until it changes."""
+        self.processed[delivery_code] = {"signature": signature, "status": status, "run_id": run_id}
+        self.pending.discard(delivery_code)
+        self._save_state()
+
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(f"{self.state_path}.tmp", "w") as state_file:
+            json.dump(self.processed, state_file, indent=4)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
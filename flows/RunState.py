@@ -0,0 +1,77 @@
+import os
+import json
+import logging
+from datetime import datetime
+
+
+class RunState():
+    """
+    Persisted state of a pipeline run: the options it was started with and
+    the status of each step (node), saved as each step finishes, so a failed
+    or interrupted run can be resumed under the same run ID.
+
+    State files are kept in cache_dir/runs/<run_id>.json.
+
+    Usage: instantiate for a new run (or load one to resume), then
+    set_node_status as steps finish and set_run_status at the end.
+    """
+    def __init__(self, config: dict, run_id: str, options: dict = None):
+        """Constructor for RunState object. Parameters:
+            - config : app config (provides cache_dir)
+            - run_id : ID of the run
+            - options : pipeline options the run was started with (restored on resume)
+        """
+        self.state_path = os.path.join(config["cache_dir"], "runs", f"{run_id}.json")
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+
+        self.state = {"run_id": run_id,
+                      "created": datetime.now().isoformat(timespec="seconds"),
+                      "status": "running",
+                      "options": options or {},
+                      "nodes": {}}
+
+
+    @classmethod
+    def load(cls, config: dict, run_id: str):
+        """Returns state of an earlier run. Raises FileNotFoundError if the run has no saved state."""
+        run_state = cls(config, run_id)
+
+        if not os.path.exists(run_state.state_path):
+            raise FileNotFoundError(f"No saved state for run {run_id} ({run_state.state_path})")
+
+        with open(run_state.state_path, "r") as state_file:
+            run_state.state = json.load(state_file)
+
+        return run_state
+
+
+    @property
+    def options(self):
+        return self.state["options"]
+
+
+    def get_completed_nodes(self):
+        """Returns names of nodes that succeeded (their outputs are reused on resume)."""
+        return [name for name, status in self.state["nodes"].items() if status == "succeeded"]
+
+
+    def set_node_status(self, node_name: str, status: str):
+        """Records a node's status and saves the state."""
+        self.state["nodes"][node_name] = status
+        self.save()
+
+
+    def set_run_status(self, status: str):
+        """Records the run's overall status (completed/failed) and saves the state."""
+        self.state["status"] = status
+        self.state["updated"] = datetime.now().isoformat(timespec="seconds")
+        self.save()
+
+        logging.info(f"Run {self.state['run_id']} {status}, state saved to {self.state_path}")
+
+
+    def save(self):
+        """Writes state file (via a temporary file, so an interrupted write leaves the previous state)."""
+        with open(f"{self.state_path}.tmp", "w") as state_file:
+            json.dump(self.state, state_file, indent=4)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
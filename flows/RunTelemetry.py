@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import uuid
+import logging
+import resource
+import threading
+from datetime import datetime
+from utils.data_platform_core import connect_to_db, STEP_COUNTS_PREFIX
+
+
+class RunTelemetry():
+    """
+    Helper class recording per-step telemetry of a pipeline run, under one run ID:
+        - start/end timestamps, wall and CPU time, peak RSS
+        - rows read/written/rejected and bytes processed (as reported by the
+          step on stdout, see report_step_counts in data_platform_core)
+
+    Each step record is appended to etl_run_history.jsonl (in the log
+    directory) as it completes, and all records are inserted into the
+    etl_run_history table at the end of the run.
+
+    Usage: instantiate per run, record_step as steps finish, then save_to_db.
+    """
+    COUNT_FIELDS = ["rows_read", "rows_written", "rows_rejected", "bytes_processed"]
+
+    def __init__(self, config: dict, run_id: str = None):
+        """Constructor for RunTelemetry object. Parameters:
+            - config : app config (provides log_dir and DB settings)
+            - run_id : ID of the run (default: new ID from timestamp and random suffix)
+        """
+        self.config = config
+        self.run_id = run_id or self.new_run_id()
+        self.jsonl_path = os.path.join(config["log_dir"], "etl_run_history.jsonl")
+        self.records = []
+
+        # Steps may finish on several scheduler threads at once
+        self._lock = threading.Lock()
+
+
+    @staticmethod
+    def new_run_id():
+        """Returns a new run ID (timestamp and random suffix, e.g. 20250331_142501_9f3c2a1b)."""
+        return f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}"
+
+
+    @staticmethod
+    def _cpu_time():
+        """Returns CPU time (user + system) of this process and child processes it waited for."""
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return self_usage.ru_utime + self_usage.ru_stime + child_usage.ru_utime + child_usage.ru_stime
+
+
+    @classmethod
+    def start_usage(cls):
+        """Returns start point for measuring work done in this process (pass to end_usage)."""
+        return {"started": datetime.now(), "start_time": time.time(), "start_cpu": cls._cpu_time()}
+
+
+    @classmethod
+    def end_usage(cls, usage_start: dict):
+        """
+        Returns dictionary of started, ended, elapsed, cpu_time and peak_rss_kb
+        of work done in this process since start_usage. Peak RSS is the process
+        high-water mark, so may reflect earlier steps of the same process.
+        """
+        peak_rss_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                          resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+        return {"started": usage_start["started"],
+                "ended": datetime.now(),
+                "elapsed": time.time() - usage_start["start_time"],
+                "cpu_time": cls._cpu_time() - usage_start["start_cpu"],
+                "peak_rss_kb": peak_rss_kb}
+
+
+    @classmethod
+    def parse_step_counts(cls, stdout: str):
+        """Returns counts reported on a step's stdout (summed, if reported more than once)."""
+        counts = {field: 0 for field in cls.COUNT_FIELDS}
+
+        for line in stdout.splitlines():
+            if line.startswith(STEP_COUNTS_PREFIX):
+                reported = json.loads(line[len(STEP_COUNTS_PREFIX):])
+                for field in cls.COUNT_FIELDS:
+                    counts[field] += reported.get(field, 0)
+
+        return counts
+
+
+    def record_step(self, step_name: str, result: dict, delivery_code: str = None):
+        """
+        Records a finished step. Parameters:
+            - step_name : pipeline step (node) name
+            - result : step result dictionary (returncode, stdout, started, ended,
+              elapsed, cpu_time, peak_rss_kb; counts are parsed from stdout
+              unless given under "counts"; "cached" if skipped by StepCache)
+            - delivery_code : delivery the step processed, if any
+        Returns the record.
+        """
+        counts = {field: 0 for field in self.COUNT_FIELDS}
+        counts.update(result.get("counts") or self.parse_step_counts(result.get("stdout", "")))
+
+        record = {"run_id": self.run_id,
+                  "step_name": step_name,
+                  "delivery_code": delivery_code,
+                  "status": "cached" if result.get("cached") else "succeeded" if result["returncode"] == 0 else "failed",
+                  "started_at": result["started"].isoformat(timespec="milliseconds"),
+                  "ended_at": result["ended"].isoformat(timespec="milliseconds"),
+                  "wall_seconds": round(result["elapsed"], 3),
+                  "cpu_seconds": round(result["cpu_time"], 3),
+                  "peak_rss_kb": result["peak_rss_kb"],
+                  **counts}
+
+        with self._lock:
+            self.records.append(record)
+            with open(self.jsonl_path, "a") as jsonl_file:
+                jsonl_file.write(json.dumps(record) + "\n")
+
+        return record
+
+
+    def save_to_db(self):
+        """
+        Inserts the run's step records into etl_run_history. A failure is
+        logged but not raised (telemetry must not fail the pipeline).
+        Returns True if the records were saved.
+        """
+        if not self.records:
+            return True
+
+        conn = None
+        cursor = None
+
+        try:
+            conn = connect_to_db(self.config, max_attempts=1)
+            cursor = conn.cursor()
+
+            columns = list(self.records[0].keys())
+            insert_cmd = f"""
+                INSERT INTO etl_run_history
+                            ({", ".join(columns)})
+                        VALUES ({", ".join(["%s"] * len(columns))})
+                """
+            cursor.executemany(insert_cmd, [list(record.values()) for record in self.records])
+            conn.commit()
+
+            logging.info(f"Saved {len(self.records)} step records of run {self.run_id} to etl_run_history")
+            return True
+
+        except Exception as e:
+            logging.warning(f"Unable to save run {self.run_id} to etl_run_history "
+                            f"(records kept in {self.jsonl_path}): {e}")
+            return False
+
+        finally:
+            if cursor:  cursor.close()
+            if conn:    conn.close()
@@ -0,0 +1,175 @@
+import os
+import glob
+import json
+import fnmatch
+import hashlib
+import logging
+from datetime import datetime
+
+
+class StepCache():
+    """
+    Content-addressed cache of pipeline step results, kept between runs.
+
+    A step's cache key is a SHA-256 fingerprint of its inputs:
+        - contents of its input files (e.g. delivery CSVs, transformed file)
+        - script version (contents of the step's script and the shared
+          ingest/core and data_platform_core modules)
+        - config (step arguments, app config file, target database)
+        - cache keys of upstream steps (e.g. DBT models on the loads)
+
+    After a step succeeds its key, output file hashes and row counts are
+    saved (one JSON file per step under cache_dir/steps). A later run can
+    skip a step whose key matches its last success, provided its output
+    files are unchanged. Table outputs can't be checked, so the cache must
+    be invalidated after the database is rebuilt (see invalidate_step_cache.py).
+
+    Usage: fingerprint the step, get_entry to check for a hit, save after success.
+    """
+    # File hashes already computed by this process: {(path, size, mtime): sha256}
+    _file_hashes = {}
+
+    # Hash of shared code, computed once per process
+    _code_version = None
+
+    def __init__(self, config: dict):
+        """Constructor for StepCache object. Parameters:
+            - config : app config (provides cache_dir, base_dir, DB settings)
+        """
+        self.config = config
+        self.cache_dir = os.path.join(config["cache_dir"], "steps")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+
+    @classmethod
+    def hash_file(cls, file_path: str):
+        """Returns SHA-256 of a file's contents (re-hashed only if its size or modified time changes)."""
+        file_stat = os.stat(file_path)
+        memo_key = (file_path, file_stat.st_size, file_stat.st_mtime_ns)
+
+        if memo_key not in cls._file_hashes:
+            file_hash = hashlib.sha256()
+            with open(file_path, "rb") as hashed_file:
+                for block in iter(lambda: hashed_file.read(1024 * 1024), b""):
+                    file_hash.update(block)
+            cls._file_hashes[memo_key] = file_hash.hexdigest()
+
+        return cls._file_hashes[memo_key]
+
+
+    def _get_code_version(self):
+        """Returns hash of shared modules used by every step (ingest/core and data_platform_core)."""
+        if StepCache._code_version is None:
+            code_paths = sorted(glob.glob(os.path.join(self.config["base_dir"], "ingest", "core", "*.py")))
+            code_paths.append(os.path.join(self.config["base_dir"], "utils", "data_platform_core.py"))
+
+            code_hash = hashlib.sha256()
+            for code_path in code_paths:
+                code_hash.update(self.hash_file(code_path).encode())
+            StepCache._code_version = code_hash.hexdigest()
+
+        return StepCache._code_version
+
+
+    def _entry_path(self, step_name: str):
+        return os.path.join(self.cache_dir, f"{step_name}.json")
+
+
+    def _read_entry(self, step_name: str):
+        """Returns a step's cache entry, or None if it has none (or it is unreadable)."""
+        try:
+            with open(self._entry_path(step_name), "r") as entry_file:
+                return json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+
+
+    def fingerprint(self, script_paths: list, script_args: list, input_paths: list, upstream_steps: list = None):
+        """
+        Returns a step's cache key. Parameters:
+            - script_paths : scripts run by the step (their contents are its version)
+            - script_args : the step's arguments
+            - input_paths : files the step reads (missing files are part of the key)
+            - upstream_steps : steps whose last cache keys the step's inputs depend on
+        """
+        fingerprint = {"code_version": self._get_code_version(),
+                       "scripts": {os.path.basename(path): self.hash_file(path) for path in script_paths},
+                       "args": list(script_args),
+                       "app_config": self.hash_file(os.getenv("CONFIG_FILE")),
+                       "database": [self.config["db_host_ip"], self.config["db_port"], self.config["db_name"]],
+                       "inputs": {path: self.hash_file(path) if os.path.exists(path) else None
+                                  for path in sorted(input_paths)},
+                       "upstream": {step: (self._read_entry(step) or {}).get("cache_key")
+                                    for step in sorted(upstream_steps or [])}}
+
+        return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+
+
+    def get_entry(self, step_name: str, cache_key: str):
+        """
+        Returns the step's cache entry if its last success had this key and
+        its output files are unchanged, otherwise None. Logs the decision.
+        """
+        entry = self._read_entry(step_name)
+
+        if entry is None:
+            logging.info(f"Step cache miss: {step_name} (no previous success)")
+            return None
+
+        if entry["cache_key"] != cache_key:
+            logging.info(f"Step cache miss: {step_name} (inputs, script or config changed)")
+            return None
+
+        for output_path, output_hash in entry["outputs"].items():
+            if not os.path.exists(output_path) or self.hash_file(output_path) != output_hash:
+                logging.info(f"Step cache miss: {step_name} (output {output_path} changed or missing)")
+                return None
+
+        logging.info(f"Step cache hit: {step_name} (key {cache_key[:12]}, cached {entry['created']}), step skipped")
+        return entry
+
+
+    def save(self, step_name: str, cache_key: str, output_paths: list = None, counts: dict = None):
+        """Saves a successful step's key, output file hashes and row counts (replacing its previous entry)."""
+        entry = {"step_name": step_name,
+                 "cache_key": cache_key,
+                 "created": datetime.now().isoformat(timespec="seconds"),
+                 "outputs": {path: self.hash_file(path) for path in (output_paths or []) if os.path.exists(path)},
+                 "counts": counts or {}}
+
+        # Written to a temporary file then renamed, so a reader never sees a partial entry
+        entry_path = self._entry_path(step_name)
+        with open(f"{entry_path}.tmp", "w") as entry_file:
+            json.dump(entry, entry_file, indent=4)
+        os.replace(f"{entry_path}.tmp", entry_path)
+
+        logging.info(f"Step cache saved: {step_name} (key {cache_key[:12]})")
+
+
+    def list_entries(self):
+        """Returns list of cache entries, ordered by step name."""
+        entries = []
+        for entry_path in sorted(glob.glob(os.path.join(self.cache_dir, "*.json"))):
+            entry = self._read_entry(os.path.basename(entry_path)[:-len(".json")])
+            if entry:
+                entries.append(entry)
+
+        return entries
+
+
+    def invalidate(self, patterns: list = None):
+        """
+        Removes cache entries of steps matching any of the patterns
+        (shell-style, e.g. 'load_*' or '*_22056_20240331'), or all entries
+        if no patterns given. Returns names of steps invalidated.
+        """
+        invalidated = []
+        for entry_path in sorted(glob.glob(os.path.join(self.cache_dir, "*.json"))):
+            step_name = os.path.basename(entry_path)[:-len(".json")]
+
+            if not patterns or any(fnmatch.fnmatch(step_name, pattern) for pattern in patterns):
+                os.remove(entry_path)
+                invalidated.append(step_name)
+
+        logging.info(f"Step cache invalidated for {len(invalidated)} steps: {invalidated}")
+        return invalidated
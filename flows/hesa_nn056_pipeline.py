@@ -1,223 +1,443 @@
+import io
+import os
+import sys
 import time
+import logging
+import tempfile
+import importlib
+import traceback
+import glob
 import subprocess
-from utils.data_platform_core import get_config
+from datetime import datetime
+from contextlib import redirect_stdout, redirect_stderr
+from utils.data_platform_core import get_config, set_up_logging, get_option_value, enable_connection_pool, POOL_PROCESSES_VAR
+from flows.DagScheduler import DagScheduler
+from flows.DbtProjectRunner import DbtProjectRunner
+from flows.RunTelemetry import RunTelemetry
+from flows.StepCache import StepCache
+from flows.RunState import RunState
+from ingest.core.DeliveryRegistry import DeliveryRegistry
+
+# Entities the pipeline has extract/load scripts for, in processing order
+# (deliveries and the entities each holds are discovered by DeliveryRegistry)
+NN056_ENTITIES = ["students", "demographics", "student_programs"]
+
+def run_script(script_path: str, script_args: list):
+    """
+    Runs a python script as a subprocess, returning a dictionary of its
+    exit status, stdout, stderr, start/end times, elapsed and CPU time
+    and peak RSS (of the script and any child processes it waited for).
+    """
+    started = datetime.now()
+    start_time = time.time()
 
-def run_extract_scripts(config):
+    # Output goes to temporary files, so the script can be waited for with
+    # wait4 (which also returns its resource usage) without filling a pipe
+    with tempfile.TemporaryFile(mode="w+") as stdout_file, tempfile.TemporaryFile(mode="w+") as stderr_file:
+        process = subprocess.Popen(["python3", script_path] + script_args, stdout=stdout_file, stderr=stderr_file, text=True)
+        _, wait_status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(wait_status)
+
+        stdout_file.seek(0)
+        stderr_file.seek(0)
+        stdout, stderr = stdout_file.read(), stderr_file.read()
+
+    return {"script": os.path.basename(script_path),
+            "args": script_args,
+            "returncode": process.returncode,
+            "stdout": stdout,
+            "stderr": stderr,
+            "started": started,
+            "ended": datetime.now(),
+            "elapsed": time.time() - start_time,
+            "cpu_time": usage.ru_utime + usage.ru_stime,
+            "peak_rss_kb": usage.ru_maxrss}
+
+
+def run_script_in_process(config, script_path: str, script_args: list):
     """
-    Runs all extract scripts. They are all initiated without any
-    dependencies between them.
+    Imports a script as a module (once per process) and calls its main(),
+    with script_args as its command-line arguments. Avoids the interpreter,
+    pandas and config start-up costs of a subprocess, and shares logging
+    and (pooled) DB connections with other steps.
+
+    Returns the same dictionary as run_script. An uncaught exception or
+    non-zero SystemExit counts as failure. Not thread-safe (sys.argv and
+    stdout are process-wide), so steps run in-process one at a time.
     """
-    print("Running extracts...")
-    transform_scripts = [
-        ("extract_hesa_nn056_students.py", "22056_20240331"),
-        ("extract_hesa_nn056_demographics.py", "22056_20240331"),
-        ("extract_hesa_nn056_student_programs.py", "22056_20240331"),
-        ("extract_hesa_nn056_students.py", "23056_20250331"),
-        ("extract_hesa_nn056_demographics.py", "23056_20250331"),
-        ("extract_hesa_nn056_student_programs.py", "23056_20250331")
-    ]
-
-    all_success = True
-    for script, delivery_code in transform_scripts:
-        script_path = f"{config['extract_script_dir']}/{script}"
-        result = subprocess.run(["python3", script_path, delivery_code],
-                       capture_output=True, text=True)
-
-        if result.returncode != 0:
-            print(f"Error in {script}: {result.stderr}")
-            all_success = False
-
-    if all_success:
-        print("Extracts completed successfully")
+    usage_start = RunTelemetry.start_usage()
+    saved_argv = sys.argv
+    stdout, stderr = io.StringIO(), io.StringIO()
+    returncode = 0
+
+    try:
+        # Import by package name (e.g. ingest.extract.extract_hesa_nn056_students)
+        # so multiprocessing workers can re-import the module if needed
+        module_name = os.path.splitext(os.path.relpath(script_path, config["base_dir"]))[0].replace(os.sep, ".")
+        step_module = importlib.import_module(module_name)
+
+        sys.argv = [script_path] + script_args
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            step_module.main()
+
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else int(e.code is not None)
+
+    except Exception:
+        returncode = 1
+        stderr.write(traceback.format_exc())
+
+    finally:
+        sys.argv = saved_argv
+
+    return {"script": os.path.basename(script_path),
+            "args": script_args,
+            "returncode": returncode,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+            **RunTelemetry.end_usage(usage_start)}
+
+
+def run_step(config, script_path: str, script_args: list, in_process: bool = False):
+    """Runs a script in-process or as a subprocess, returning its result dictionary."""
+    if in_process:
+        return run_script_in_process(config, script_path, script_args)
     else:
-        print("Some transforms failed")
+        return run_script(script_path, script_args)
 
-    return all_success
 
+def report_result(result: dict):
+    """Prints a script's exit status and timing (and stderr on failure). Returns True on success."""
+    print(f"{' '.join([result['script']] + result['args'])}: exit {result['returncode']} in {result['elapsed']:.2f} seconds")
 
-def run_load_scripts(config):
-    print("Running loads...")
-    success = True
+    if result["returncode"] != 0:
+        print(f"Error in {result['script']}: {result['stderr']}")
+        return False
 
-    # Process deliveries metadata file
-    script = "load_hesa_delivery_metadata.py"
-    script_path = f"{config['load_script_dir']}/{script}"
-    print(f"Running load script: {script}")
-    result = subprocess.run(["python3", script_path], capture_output=True, text=True)
+    return True
 
-    if result.returncode != 0:
-        print(f"Error in {script}: {result.stderr}")
-        success = False
-        return success
 
-    # Set up list of loads for main data files
-    main_nn056_loads = [
-        ("load_hesa_nn056_students.py", "22056_20240331"),
-        ("load_hesa_nn056_student_programs.py", "22056_20240331"),
-        ("load_hesa_nn056_demographics.py", "22056_20240331"),
-        ("load_hesa_nn056_students.py", "23056_20250331"),
-        ("load_hesa_nn056_student_programs.py", "23056_20250331"),
-        ("load_hesa_nn056_demographics.py", "23056_20250331"),
-    ]
-
-    # Process main load tables. Processing breaks on exception as
-    # these tend to be catastrophic and indicate a deep problem.
-    for script, delivery_code in main_nn056_loads:
-        script_path = f"{config['load_script_dir']}/{script}"
-        print(f"Running load script: {script}")
-        result = subprocess.run(["python3", script_path, delivery_code], capture_output=True, text=True)
-
-        if result.returncode != 0:
-            print(f"Error in {script}: {result.stderr}")
-            success = False
-            break
-
-    # Process lookup tables. Occurs independently of above success
-    # as they don't rely on extract phase and their success/failure
-    # is potentially useful in troubleshooting the above scripts.
-    nn056_lookups = ["DISABILITY", "ETHNICITY", "GENDERID", "RELIGION", 
-                     "SEXID", "SEXORT", "TRANS", "Z_ETHNICGRP1", "Z_ETHNICGRP2", "Z_ETHNICGRP3"]
-
-    nn056_deliveries = ["22056_20240331", "23056_20250331"]
-
-    for lookup_name in nn056_lookups:
-        for delivery_code in nn056_deliveries:
-            script_path = f"{config['load_script_dir']}/load_hesa_nn056_lookup_table.py"
-            result = subprocess.run(["python3", script_path, delivery_code, lookup_name], capture_output=True, text=True)
-
-            if result.returncode != 0:
-                print(f"Error in {script}: {result.stderr}")
-                success = False
-                break
+def skip_if_cached(cache: StepCache, telemetry: RunTelemetry, step_name: str, cache_key: str, delivery_code: str = None):
+    """
+    Returns True if the step's last success had this cache key (and its
+    outputs are unchanged), recording the skip (with cached row counts)
+    in the run's telemetry. Otherwise returns False.
+    """
+    entry = cache.get_entry(step_name, cache_key)
+    if entry is None:
+        return False
 
-    if success:
-        print("Loads completed successfully")
-    else:
-        print("Some loads failed")
+    now = datetime.now()
+    telemetry.record_step(step_name, {"returncode": 0, "cached": True, "counts": entry["counts"],
+                                      "started": now, "ended": now, "elapsed": 0.0,
+                                      "cpu_time": 0.0, "peak_rss_kb": 0}, delivery_code)
+    print(f"{step_name}: unchanged since {entry['created']} (cache key {cache_key[:12]}), skipped")
+    return True
 
-    return success
 
+def script_step(config, script_path: str, script_args: list, in_process: bool,
+                telemetry: RunTelemetry, step_name: str, delivery_code: str = None,
+                cache: StepCache = None, input_paths: list = None, output_paths: list = None):
+    """
+    Returns a scheduler step (callable) that runs a script, records its telemetry and reports its result.
+    With a cache, the step is skipped if its input_paths, script and arguments match its last success,
+    and its key, output_paths hashes and row counts are saved when it succeeds.
+    """
+    def step():
+        if cache:
+            cache_key = cache.fingerprint([script_path], script_args, input_paths or [])
+            if skip_if_cached(cache, telemetry, step_name, cache_key, delivery_code):
+                return True
 
-def run_stage_scripts(config):
-    print("Running DBT staging models...")
+        result = run_step(config, script_path, script_args, in_process)
+        record = telemetry.record_step(step_name, result, delivery_code)
+        success = report_result(result)
 
-    # Get start time for duration calculation
-    start_time = time.time()
+        if cache and success:
+            counts = {field: record[field] for field in RunTelemetry.COUNT_FIELDS}
+            cache.save(step_name, cache_key, output_paths, counts)
 
-    # Run DBT staging scripts
-    result = subprocess.run(
-        ["dbt", "run", "--models", "staging"],
-        cwd=config["dbt_project_dir"],
-        capture_output=True, text=True)
+        return success
 
-    # Calculate execution time
-    execution_time = time.time() - start_time
-    print(f"DBT staging ran for {execution_time} seconds")
+    return step
 
-    # Show DBT output for debugging
-    print(f"DBT output:\n{result.stdout}")
 
-    # Report errors
-    if result.returncode != 0:
-        print(f"Error in DBT staging: {result.stderr}")
-        return False
+def dbt_project_files(config):
+    """Returns paths of DBT project files that models are built from (models, macros, seeds, project config)."""
+    return DbtProjectRunner(config).project_files()
 
-    # Report success
-    print("DBT staging completed successfully")
-    return True
 
+def build_etl_graph(config, scheduler: DagScheduler, telemetry: RunTelemetry, deliveries: list,
+                    check_refs=False, in_process=False, dbt_threads=None, model_timings=None,
+                    cache: StepCache = None, full_refresh=False):
+    """
+    Adds pipeline steps to the scheduler as nodes, per delivery (from
+    DeliveryRegistry) and entity held by the delivery:
+        - extract <entity> <delivery> : no dependencies (with check_refs,
+          other extracts depend on the delivery's students extract)
+        - load <entity> <delivery> : depends on its extract
+        - load delivery metadata and the deliveries' lookups : no dependencies
+        - DBT models (staging+, one invocation) : depends on all loads
+          (with full_refresh, incremental models are rebuilt from scratch)
+    Each step's telemetry is recorded under the step (node) name. With a
+    cache, each step declares the files it reads (and extracts the files
+    they write) so unchanged steps can be skipped.
+    """
+    static_files = glob.glob(os.path.join(config["static_dir"], "*"))
+    load_nodes = []
+
+    # Extract then load each entity of each delivery
+    for delivery in deliveries:
+        delivery_code = delivery["delivery_code"]
+
+        unknown_entities = [entity for entity in delivery["entities"] if entity not in NN056_ENTITIES]
+        if unknown_entities:
+            logging.warning(f"Delivery {delivery_code} entities without extract scripts ignored: {unknown_entities}")
+
+        for entity in [entity for entity in NN056_ENTITIES if entity in delivery["entities"]]:
+            extract_node = f"extract_{entity}_{delivery_code}"
+            extract_path = f"{config['extract_script_dir']}/extract_hesa_nn056_{entity}.py"
+            extract_args = [delivery_code] + (["--check-refs"] if check_refs else [])
+            check_students = check_refs and entity != "students" and "students" in delivery["entities"]
+            extract_deps = [f"extract_students_{delivery_code}"] if check_students else []
+
+            # Extracts read the delivery's files (data, lookups) and schema specs, writing transformed and bad data files
+            transformed_path = os.path.join(config["transformed_dir"], delivery_code, f"hesa_{delivery_code}_{entity}_transformed.csv")
+            bad_data_path = os.path.join(config["bad_data_dir"], delivery_code, f"hesa_{delivery_code}_{entity}_bad_data.csv")
+            extract_inputs = glob.glob(os.path.join(delivery["path"], "*")) + static_files
+            if check_students:
+                extract_inputs.append(os.path.join(config["transformed_dir"], delivery_code, f"hesa_{delivery_code}_students_transformed.csv"))
+
+            scheduler.add_node(extract_node, script_step(config, extract_path, extract_args, in_process,
+                                                          telemetry, extract_node, delivery_code,
+                                                          cache, extract_inputs, [transformed_path, bad_data_path]), extract_deps)
+
+            load_node = f"load_{entity}_{delivery_code}"
+            load_path = f"{config['load_script_dir']}/load_hesa_nn056_{entity}.py"
+            scheduler.add_node(load_node, script_step(config, load_path, [delivery_code], in_process,
+                                                    telemetry, load_node, delivery_code,
+                                                    cache, [transformed_path]), [extract_node])
+            load_nodes.append(load_node)
+
+    # Deliveries metadata and lookup tables don't rely on the extract phase
+    metadata_path = f"{config['load_script_dir']}/load_hesa_delivery_metadata.py"
+    scheduler.add_node("load_delivery_metadata", script_step(config, metadata_path, [], in_process,
+                                                             telemetry, "load_delivery_metadata",
+                                                             cache=cache, input_paths=static_files))
+    load_nodes.append("load_delivery_metadata")
+
+    # Lookup files of all deliveries are loaded by one script run (one transaction per delivery)
+    lookups_path = f"{config['load_script_dir']}/load_hesa_nn056_lookup_tables.py"
+    lookups_args = [delivery["delivery_code"] for delivery in deliveries]
+    lookups_inputs = [path for delivery in deliveries
+                      for path in glob.glob(os.path.join(delivery["path"], "hesa_*_lookup_*.csv"))]
+    scheduler.add_node("load_lookups", script_step(config, lookups_path, lookups_args, in_process,
+                                                   telemetry, "load_lookups",
+                                                   cache=cache, input_paths=lookups_inputs))
+    load_nodes.append("load_lookups")
+
+    # DBT models (staging, then dimensions and facts) build on all load tables
+    loaded_deliveries = [delivery["delivery_code"] for delivery in deliveries]
+    scheduler.add_node("dbt_models", lambda: run_dbt_models(config, telemetry, dbt_threads, model_timings,
+                                                            cache, load_nodes, full_refresh, loaded_deliveries), load_nodes)
+
+
+def run_dbt_models(config, telemetry: RunTelemetry, threads=None, model_timings=None,
+                   cache: StepCache = None, load_nodes: list = None, full_refresh=False, loaded_deliveries=None):
+    """
+    Runs staging models and everything downstream of them (dimensions, facts)
+    as one graph-ordered DBT invocation, using DBT's programmatic runner.
+    Per-model timings are appended to model_timings, if given. Incremental
+    models (e.g. dim_hesa_student) only rebuild new or reloaded deliveries,
+    unless full_refresh.
+
+    Staging models combine every delivery found under deliveries_dir (passed
+    as DBT var hesa_deliveries), not only those processed by this run, from
+    load tables of the configured layout (var hesa_load_layout). Deliveries
+    this run loaded (loaded_deliveries, var hesa_loaded_deliveries) must have
+    load tables, so a missing one fails the build rather than being skipped.
+
+    With a cache, skipped if the DBT project files and the cache keys of
+    load_nodes (i.e. the load tables' contents) match the last success.
+    """
+    dbt_vars = {"hesa_deliveries": DeliveryRegistry(config).get_delivery_codes(),
+                "hesa_loaded_deliveries": loaded_deliveries or [],
+                "hesa_load_layout": config["load_layout"]}
+
+    if cache:
+        dbt_args = ["run", "--select", "staging+", "--vars", dbt_vars] + (["--full-refresh"] if full_refresh else [])
+        cache_key = cache.fingerprint([], dbt_args, dbt_project_files(config), load_nodes)
+        if skip_if_cached(cache, telemetry, "dbt_models", cache_key):
+            return True
 
-def run_dimension_scripts(config):
-    print("Running DBT dimension models...")
+    print(f"Running DBT models (staging+{', full refresh' if full_refresh else ''})...")
+    usage_start = RunTelemetry.start_usage()
 
-    # Get start time for duration calculation
-    start_time = time.time()
+    success, timings = DbtProjectRunner(config, threads).run("staging+", full_refresh, dbt_vars)
 
-    # Run DBT dimension scripts
-    result = subprocess.run(
-        ["dbt", "run", "--models", "dimensions"],
-        cwd=config["dbt_project_dir"],
-        capture_output=True, text=True)
+    # Rows written are those DBT reports as affected by each model's build
+    rows_written = sum(timing["rows_affected"] or 0 for timing in timings)
+    dbt_result = {"returncode": 0 if success else 1,
+                  "counts": {"rows_written": rows_written},
+                  **RunTelemetry.end_usage(usage_start)}
+    telemetry.record_step("dbt_models", dbt_result)
 
-    # Calculate execution time
-    execution_time = time.time() - start_time
-    print(f"DBT dimensions ran for {execution_time} seconds")
+    print(f"DBT ran for {dbt_result['elapsed']:.2f} seconds")
+    for timing in timings:
+        print(f"    {timing['model']}: {timing['status']} ({timing['execution_time']:.2f} seconds)")
 
-    # Show DBT output for debugging
-    print(f"DBT output:\n{result.stdout}")
+    if model_timings is not None:
+        model_timings.extend(timings)
 
-    # Report errors
-    if result.returncode != 0:
-        print(f"Error in DBT dimensions: {result.stderr}")
-        return False
+    if cache and success:
+        cache.save("dbt_models", cache_key, counts={"rows_written": rows_written})
 
-    # Report success
-    print("DBT dimensions completed successfully")
-    return True
+    if success:
+        print("DBT models completed successfully")
+    else:
+        print("Error in DBT models")
 
+    return success
 
-def run_fact_scripts(config):
-    print("Running DBT fact models...")
 
-    # Get start time for duration calculation
+def etl_flow(check_refs=False, max_workers=None, in_process=False, dbt_threads=None, delivery_codes=None,
+             use_cache=False, resume_run_id=None, run_id=None, full_refresh=False):
+    """
+    Runs the pipeline as a DAG of steps (see build_etl_graph), each starting
+    as soon as its dependencies succeed, at most max_workers at once
+    (default: CPU count). In-process steps run one at a time. Each step's
+    worker process pool gets cpu_count // max_workers processes, so
+    concurrent steps share the CPUs rather than each using them all.
+
+    Processes every delivery found under deliveries_dir, or only those in
+    delivery_codes if given (raising ValueError for any not found).
+
+    With use_cache, steps whose inputs, scripts and config are unchanged
+    since their last success are skipped (see StepCache), the decisions
+    being written to the run log.
+
+    Each step's status is saved as it finishes (see RunState). With
+    resume_run_id, that run's options and deliveries are restored and only
+    its steps that did not succeed are run, reusing completed steps' outputs.
+
+    With full_refresh, DBT's incremental models are rebuilt from scratch
+    rather than only for new or reloaded deliveries.
+
+    Returns dictionary of {node name: {"status": ..., "elapsed": ...}},
+    the dbt_models node also having per-model timings under "models".
+    Per-step telemetry is recorded under the run ID (see RunTelemetry),
+    new unless run_id (or resume_run_id) is given.
+    """
+    config = get_config()
+    set_up_logging(config, os.path.basename(__file__))
+
+    if resume_run_id:
+        # Graph must be rebuilt as the run built it, so its options (other than workers/in-process) are restored
+        run_state = RunState.load(config, resume_run_id)
+        check_refs, dbt_threads, delivery_codes, use_cache = (run_state.options[option] for option in
+                                                              ["check_refs", "dbt_threads", "delivery_codes", "use_cache"])
+        full_refresh = run_state.options.get("full_refresh", False)
+        completed_nodes = run_state.get_completed_nodes()
+        print(f"Resuming run {resume_run_id} ({run_state.state['status']}), {len(completed_nodes)} steps already completed")
+
+    telemetry = RunTelemetry(config, resume_run_id or run_id)
+    cache = StepCache(config) if use_cache else None
+
+    deliveries = DeliveryRegistry(config).get_deliveries()
+    if delivery_codes:
+        unknown_codes = set(delivery_codes) - {delivery["delivery_code"] for delivery in deliveries}
+        if unknown_codes:
+            raise ValueError(f"Deliveries not found in {config['deliveries_dir']}: {sorted(unknown_codes)}")
+        deliveries = [delivery for delivery in deliveries if delivery["delivery_code"] in delivery_codes]
+
+    if not resume_run_id:
+        run_state = RunState(config, telemetry.run_id,
+                             {"check_refs": check_refs, "dbt_threads": dbt_threads, "use_cache": use_cache,
+                              "full_refresh": full_refresh,
+                              "delivery_codes": [delivery["delivery_code"] for delivery in deliveries]})
+        completed_nodes = []
+
+    # In-process steps share this process's config, logging and DB connections
+    if in_process:
+        enable_connection_pool(config)
+        max_workers = 1
+
+    max_workers = max_workers or os.cpu_count()
+
+    # Steps run concurrently share the CPUs: each extract's transform pool gets
+    # cpu_count // max_workers processes (inherited by subprocess steps)
+    os.environ[POOL_PROCESSES_VAR] = str(max(1, os.cpu_count() // max_workers))
+
+    scheduler = DagScheduler(max_workers, run_state.set_node_status)
+    model_timings = []
+    build_etl_graph(config, scheduler, telemetry, deliveries, check_refs, in_process, dbt_threads, model_timings, cache,
+                    full_refresh)
+
+    print(f"Run {telemetry.run_id}: {len(deliveries)} deliveries, {len(scheduler.nodes)} pipeline steps ({max_workers} workers)...")
     start_time = time.time()
+    results = scheduler.run(completed_nodes)
+    results["dbt_models"]["models"] = model_timings
 
-    # Run DBT dimension scripts
-    result = subprocess.run(
-        ["dbt", "run", "--models", "facts"],
-        cwd=config["dbt_project_dir"],
-        capture_output=True, text=True)
+    for node_name, result in results.items():
+        reused = ", reused from earlier attempt" if result.get("reused") else ""
+        print(f"{node_name}: {result['status']} ({result['elapsed']:.2f} seconds{reused})")
 
-    # Calculate execution time
-    execution_time = time.time() - start_time
-    print(f"DBT facts ran for {execution_time} seconds")
+    run_succeeded = all(result["status"] == DagScheduler.SUCCEEDED for result in results.values())
+    run_state.set_run_status("completed" if run_succeeded else "failed")
 
-    # Show DBT output for debugging
-    print(f"DBT output:\n{result.stdout}")
+    print(f"Pipeline ran for {time.time() - start_time:.2f} seconds")
+    if not run_succeeded:
+        print(f"Resume with: python flows/hesa_nn056_pipeline.py --resume {telemetry.run_id}")
 
-    # Report errors
-    if result.returncode != 0:
-        print(f"Error in DBT facts: {result.stderr}")
-        return False
+    # Step telemetry is already in the JSON lines file, the table is updated once per run
+    telemetry.save_to_db()
+    print(f"Step telemetry of run {telemetry.run_id} written to {telemetry.jsonl_path}")
+    return results
 
-    # Report success
-    print("DBT facts completed successfully")
-    return True
 
+def main():
+    # Optionally reject rows whose stu_id is not in the delivery's students file
+    check_refs = "--check-refs" in sys.argv
 
+    # Maximum steps run at once (--workers=N, default CPU count)
+    max_workers = get_option_value("workers")
+    max_workers = int(max_workers) if max_workers else None
 
-def etl_flow():
-    config = get_config()
+    # Run extract/load steps in this process rather than as subprocesses
+    in_process = "--in-process" in sys.argv
 
-    transform_success = False
-    load_success = False
-    stage_success = False
-    dimension_success = False
-    fact_success = False
-
-    transform_success = run_extract_scripts(config)
-    if transform_success:
-        load_success = run_load_scripts(config)
-        if load_success:
-            stage_success = run_stage_scripts(config)
-            if stage_success:
-                dimension_success = run_dimension_scripts(config)
-                if dimension_success:
-                    fact_success = run_fact_scripts(config)
-    
-    return {"transform success": transform_success,
-            "load success": load_success,
-            "stage success": stage_success,
-            "dimension success": dimension_success,
-            "fact success": fact_success}
+    # Models DBT builds at once (--dbt-threads=N, default profile setting)
+    dbt_threads = get_option_value("dbt-threads")
+    dbt_threads = int(dbt_threads) if dbt_threads else None
 
-def main():
-    results = etl_flow()
+    # Deliveries to process (--deliveries=code1,code2, default all found under deliveries_dir)
+    delivery_codes = get_option_value("deliveries")
+    delivery_codes = delivery_codes.split(",") if delivery_codes else None
+
+    # Skip steps unchanged since their last success (invalidate with invalidate_step_cache.py)
+    use_cache = "--cache" in sys.argv
+
+    # Rebuild incremental DBT models from scratch (default: only new or reloaded deliveries)
+    full_refresh = "--full-refresh" in sys.argv
+
+    # Resume an earlier run from its failed/unfinished steps (--resume <run_id> or --resume=<run_id>),
+    # with that run's options
+    resume_run_id = get_option_value("resume")
+    if "--resume" in sys.argv:
+        resume_index = sys.argv.index("--resume") + 1
+        if resume_index >= len(sys.argv):
+            sys.exit("--resume needs a run ID")
+        resume_run_id = sys.argv[resume_index]
+
+    results = etl_flow(check_refs, max_workers, in_process, dbt_threads, delivery_codes, use_cache, resume_run_id,
+                       full_refresh=full_refresh)
 
-    if all(results.values()):
+    failed_nodes = [name for name, result in results.items() if result["status"] != DagScheduler.SUCCEEDED]
+    if not failed_nodes:
         print("ETL pipeline completed")
     else:
-        print(f"ETL pipeline failed: {results}")
+        print(f"ETL pipeline failed, steps not completed: {failed_nodes}")
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,40 @@
+"""
+Script to list or invalidate pipeline step cache entries (see StepCache).
+
+Usage:
+    python flows/invalidate_step_cache.py --list
+    python flows/invalidate_step_cache.py <step pattern> [<step pattern> ...]
+        e.g. 'load_*' or '*_22056_20240331' (shell-style patterns)
+    python flows/invalidate_step_cache.py --all
+
+Invalidate all load steps (or --all) after the database is rebuilt, as
+the cache can't tell that load tables were emptied.
+"""
+import os
+import sys
+from utils.data_platform_core import get_config, set_up_logging
+from flows.StepCache import StepCache
+
+
+def main():
+    config = get_config()
+    set_up_logging(config, os.path.basename(__file__))
+    step_cache = StepCache(config)
+
+    patterns = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
+    if "--list" in sys.argv:
+        for entry in step_cache.list_entries():
+            print(f"{entry['step_name']}: key {entry['cache_key'][:12]}, cached {entry['created']}, counts {entry['counts']}")
+
+    elif patterns or "--all" in sys.argv:
+        invalidated = step_cache.invalidate(patterns or None)
+        print(f"Invalidated {len(invalidated)} step cache entries: {invalidated}")
+
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Long-running watcher that processes new or changed HESA deliveries as
+they land in deliveries_dir (see DeliveryWatcher for change detection).
+
+For each delivery that is ready, only that delivery's extract -> load ->
+DBT subgraph is run (etl_flow limited to the delivery, steps in-process).
+The process is warmed up once at start (step modules imported, DB
+connection pool created, DBT project parsed) so processing of a new
+delivery starts within seconds. What the warm process keeps in memory
+(delivery lookups, compiled schema specs, the DBT manifest) is reloaded
+when its source files change, so a re-delivery is validated and built
+against its own files.
+
+Options:
+    --interval=N : seconds between scans (default 5)
+    --settle=N : seconds a delivery must be unchanged before processing (default 30)
+    --process-existing : on first start, also process deliveries already present
+    --cache : skip steps unchanged since their last success (see StepCache)
+    --once : scan once, process what is ready and exit (e.g. from cron)
+"""
+import os
+import sys
+import time
+import logging
+import importlib
+from utils.data_platform_core import get_config, set_up_logging, get_option_value, enable_connection_pool
+from flows.DagScheduler import DagScheduler
+from flows.DbtProjectRunner import DbtProjectRunner
+from flows.DeliveryWatcher import DeliveryWatcher
+from flows.RunTelemetry import RunTelemetry
+from flows.hesa_nn056_pipeline import NN056_ENTITIES, etl_flow
+
+
+def warm_up(config):
+    """Imports step modules, creates the DB connection pool and parses the DBT project, once per process."""
+    for entity in NN056_ENTITIES:
+        importlib.import_module(f"ingest.extract.extract_hesa_nn056_{entity}")
+        importlib.import_module(f"ingest.load.load_hesa_nn056_{entity}")
+    importlib.import_module("ingest.load.load_hesa_delivery_metadata")
+    importlib.import_module("ingest.load.load_hesa_nn056_lookup_tables")
+
+    enable_connection_pool(config)
+
+    # Without a parsed project the first delivery pays for it instead
+    try:
+        DbtProjectRunner(config).parse()
+    except Exception as e:
+        logging.warning(f"DBT project not parsed during warm-up: {e}")
+
+
+def process_delivery(watcher: DeliveryWatcher, delivery_code: str, signature: list, use_cache: bool):
+    """Runs the pipeline for one delivery, recording the outcome with the watcher."""
+    run_id = RunTelemetry.new_run_id()
+    print(f"Processing delivery {delivery_code} (run {run_id})...")
+    logging.info(f"Delivery {delivery_code} ready, processing as run {run_id}")
+
+    try:
+        results = etl_flow(in_process=True, delivery_codes=[delivery_code], use_cache=use_cache, run_id=run_id)
+        succeeded = all(result["status"] == DagScheduler.SUCCEEDED for result in results.values())
+        status = "completed" if succeeded else "failed"
+
+    except Exception as e:
+        logging.critical(f"{type(e).__name__} processing delivery {delivery_code}: {e}")
+        status = "failed"
+
+    # Failed deliveries are retried when they next change (or resumed by run ID)
+    watcher.mark_processed(delivery_code, signature, status, run_id)
+    print(f"Delivery {delivery_code}: {status} (run {run_id})")
+
+
+def main():
+    interval = float(get_option_value("interval", 5))
+    settle_seconds = float(get_option_value("settle", 30))
+    process_existing = "--process-existing" in sys.argv
+    use_cache = "--cache" in sys.argv
+    run_once = "--once" in sys.argv
+
+    config = get_config()
+    set_up_logging(config, os.path.basename(__file__))
+
+    start_time = time.time()
+    warm_up(config)
+    watcher = DeliveryWatcher(config, settle_seconds, process_existing)
+    print(f"Watching {config['deliveries_dir']} (warm-up {time.time() - start_time:.2f} seconds, "
+          f"scan every {interval}s, settle {settle_seconds}s)")
+
+    while True:
+        for delivery_code, signature in watcher.poll():
+            process_delivery(watcher, delivery_code, signature, use_cache)
+
+        if run_once:
+            break
+
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,30 @@
 import pandas as pd
 import os
 import logging
-from utils.data_platform_core import get_config, set_up_logging, connect_to_db
+from utils.data_platform_core import get_config, set_up_logging, connect_to_db, report_step_counts
+from ingest.core.EntityDtypes import EntityDtypes
+from ingest.core.LoadTableLayout import LoadTableLayout
 
 class CsvTableCopier():
     """
     Helper class to bulk copy from a CSV file to a SQL table.
 
+    Given the delivery code of a partitioned load table (see LoadTableLayout),
+    rows are loaded into a swap table and exchanged with the delivery's
+    partition, instead of replacing the table's contents.
+
     Usage: instantiate and then call transfer_data.
     """
     def __init__(self, source_path: str, target_table: str,
-                 column_mappings: dict, caller_name: str = None):
+                 column_mappings: dict, caller_name: str = None, entity: str = None,
+                 delivery_code: str = None):
         """Constructor for CsvTableCopier object. Parameters:
             - source_path : fully qualified path of source CSV file
             - target_table : table to which data is written
             - column_mappings : dictionary of column name pairs (csv col: table col)
             - caller_name : name of the calling script/module (for logging)
+            - entity : entity whose memory-lean dtypes are used (default: all str)
+            - delivery_code : delivery loaded, replacing its partition if the load layout is partitioned
         """
         self.config = get_config()
         script_name = caller_name or self.__class__.__name__
@@ -24,6 +33,11 @@ class CsvTableCopier():
         self.config["source_path"] = source_path
         self.config["target_table"] = target_table
         self.config["column_mappings"] = column_mappings
+        self.config["dtypes"] = EntityDtypes(entity).dtypes if entity else str
+
+        # Delivery whose partition is replaced (None: target table contents replaced)
+        self.layout = LoadTableLayout(self.config)
+        self.partition_delivery = delivery_code if self.layout.partitioned else None
 
 
     def _read_in_chunks(self, chunk_size=200):
@@ -32,8 +46,9 @@ class CsvTableCopier():
             csv_path = self.config["source_path"]
             total_read = 0
 
-            for chunk in pd.read_csv(csv_path, chunksize=chunk_size, dtype=str):
+            for chunk in pd.read_csv(csv_path, chunksize=chunk_size, dtype=self.config["dtypes"]):
                 total_read += len(chunk)
+                EntityDtypes.log_memory_usage(chunk, f"Chunk from row {chunk.index[0]}")
                 yield chunk
 
             logging.info(f"Read {total_read} rows from {csv_path}")
@@ -63,7 +78,7 @@ class CsvTableCopier():
             raise
 
 
-    def _write_to_target(self, csv_df: pd.DataFrame, cursor):
+    def _write_to_target(self, csv_df: pd.DataFrame, cursor, target_table: str):
         """Writes CSV rows to SQL table"""
         try:
             # Declare which csv columns to use as insert values
@@ -72,7 +87,9 @@ class CsvTableCopier():
             target_cols = list(column_mappings.values())
 
             # Build array of tuples as values for db mass-insert
-            data_for_insert = csv_df[source_cols].values.tolist()
+            # (as objects, with missing values as None, whatever the column dtypes)
+            source_df = csv_df[source_cols].astype(object)
+            data_for_insert = source_df.where(source_df.notna(), None).values.tolist()
 
             # Add "source file" column to target columns list and
             # add corresponding source filename to value row.
@@ -81,11 +98,17 @@ class CsvTableCopier():
             for row in data_for_insert:
                 row.append(source_file)
 
+            # Partitioned load tables have no per-delivery default, so set delivery on every row
+            if self.partition_delivery:
+                target_cols.append("hesa_delivery")
+                for row in data_for_insert:
+                    row.append(self.partition_delivery)
+
             # Setup insert command (with value placeholders)
             columns = ", ".join(target_cols)
             placeholders = ", ".join(["%s"] * len(target_cols))
             insert_cmd = f"""
-                INSERT INTO {self.config['target_table']}
+                INSERT INTO {target_table}
                             ({columns})
                         VALUES ({placeholders})
                 """
@@ -109,17 +132,28 @@ class CsvTableCopier():
             conn = connect_to_db(self.config)
             cursor = conn.cursor()
 
-            # Delete existing data from load_students table
-            self._cleardown_target(cursor)
+            # Delete existing data from load_students table (or load into
+            # a swap table, to replace the delivery's partition)
+            target_table = self.config["target_table"]
+            if self.partition_delivery:
+                write_table = self.layout.create_swap_table(cursor, target_table, self.partition_delivery)
+            else:
+                self._cleardown_target(cursor)
+                write_table = target_table
 
             # Read data from CSV file
             total_written = 0
             for chunk in(self._read_in_chunks()):
-                self._write_to_target(chunk, cursor)
+                self._write_to_target(chunk, cursor, write_table)
                 conn.commit()
                 total_written += len(chunk)
 
+            if self.partition_delivery:
+                self.layout.exchange_partition(cursor, target_table, write_table, self.partition_delivery)
+
             logging.info(f"Wrote {total_written} rows to table {self.config['target_table']}")
+            report_step_counts(rows_read=total_written, rows_written=total_written,
+                               bytes_processed=os.path.getsize(self.config["source_path"]))
 
         except Exception as e:
             # In case of error, rollback DB transaction and display error
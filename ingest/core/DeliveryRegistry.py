@@ -0,0 +1,107 @@
+import os
+import json
+import logging
+
+
+class DeliveryRegistry():
+    """
+    Helper class listing the HESA deliveries found under deliveries_dir.
+
+    A delivery is a directory <code> holding a manifest <code>/<code>.json
+    (delivery_code, collection_reference, received_date, etc). Its entities
+    are taken from the data files it holds (hesa_<code>_data_<entity>.csv).
+
+    Manifests are parsed once per process and re-read only when the
+    directory listing or a manifest's size/modified time changes.
+
+    Usage: instantiate and then call get_deliveries or get_delivery_codes.
+    """
+    # Deliveries already read by this process: {deliveries_dir: (signature, deliveries)}
+    _cache = {}
+
+    def __init__(self, config: dict):
+        """Constructor for DeliveryRegistry object. Parameters:
+            - config : app config (provides deliveries_dir)
+        """
+        self.deliveries_dir = config["deliveries_dir"]
+
+
+    def _manifest_path(self, delivery_code: str):
+        return os.path.join(self.deliveries_dir, delivery_code, f"{delivery_code}.json")
+
+
+    def _get_signature(self):
+        """Returns (delivery code, directory mtime, manifest mtime, manifest size) of each delivery directory."""
+        signature = []
+
+        with os.scandir(self.deliveries_dir) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+
+                try:
+                    manifest_stat = os.stat(self._manifest_path(entry.name))
+                except FileNotFoundError:
+                    continue
+
+                signature.append((entry.name, entry.stat().st_mtime_ns, manifest_stat.st_mtime_ns, manifest_stat.st_size))
+
+        return tuple(sorted(signature))
+
+
+    def _read_delivery(self, delivery_code: str):
+        """Returns a delivery's manifest, with its path and entities added (None if manifest invalid)."""
+        manifest_path = self._manifest_path(delivery_code)
+        try:
+            with open(manifest_path, "r") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Delivery manifest {manifest_path} unreadable, delivery skipped: {e}")
+            return None
+
+        if manifest.get("delivery_code") != delivery_code:
+            logging.warning(f"Delivery manifest {manifest_path} has delivery_code "
+                            f"'{manifest.get('delivery_code')}', delivery skipped")
+            return None
+
+        delivery_path = os.path.dirname(manifest_path)
+        data_prefix = f"hesa_{delivery_code}_data_"
+        entities = [file_name[len(data_prefix):-len(".csv")] for file_name in os.listdir(delivery_path)
+                    if file_name.startswith(data_prefix) and file_name.endswith(".csv")]
+
+        return {**manifest, "path": delivery_path, "entities": sorted(entities)}
+
+
+    def get_deliveries(self):
+        """Returns list of deliveries (manifest dictionaries plus 'path' and 'entities'), ordered by delivery code."""
+        signature = self._get_signature()
+
+        cached = self._cache.get(self.deliveries_dir)
+        if cached and cached[0] == signature:
+            return list(cached[1])
+
+        deliveries = []
+        for delivery_code, *_ in signature:
+            delivery = self._read_delivery(delivery_code)
+            if delivery:
+                deliveries.append(delivery)
+
+        logging.info(f"Found {len(deliveries)} deliveries in {self.deliveries_dir}: "
+                     f"{[delivery['delivery_code'] for delivery in deliveries]}")
+
+        self._cache[self.deliveries_dir] = (signature, deliveries)
+        return list(deliveries)
+
+
+    def get_delivery_codes(self):
+        """Returns list of delivery codes, ordered."""
+        return [delivery["delivery_code"] for delivery in self.get_deliveries()]
+
+
+    def get_delivery(self, delivery_code: str):
+        """Returns one delivery's manifest dictionary. Raises KeyError if not found."""
+        for delivery in self.get_deliveries():
+            if delivery["delivery_code"] == delivery_code:
+                return delivery
+
+        raise KeyError(f"Delivery {delivery_code} not found in {self.deliveries_dir}")
@@ -0,0 +1,177 @@
+import os
+import csv
+import heapq
+import shutil
+import logging
+import tempfile
+import itertools
+import numpy as np
+import pandas as pd
+
+
+class DuplicateKeyDetector():
+    """
+    Helper class to find rows of a CSV file sharing the same key (e.g. a
+    stu_id appearing twice in a student delivery), before the file is
+    cleansed chunk by chunk.
+
+    A first pass streams the key column only. Keys are held in a hash map
+    (key: first row number), each chunk's new keys being found and added in
+    bulk and only repeated keys handled row by row, until max_memory_keys is exceeded, after which
+    (key, row number) pairs are spilled to sorted run files on disk and
+    merged (external sort), so memory stays bounded for any file size.
+
+    The policy decides which occurrences of a duplicated key are rejected:
+        - keep-first : all but the first occurrence
+        - keep-last : all but the last occurrence
+        - reject-all : every occurrence
+
+    Usage: instantiate and then call find_duplicates on each chunk (chunks
+    must keep pandas' default file-wide row index).
+    """
+    POLICIES = ("keep-first", "keep-last", "reject-all")
+
+    def __init__(self, csv_path: str, key_column: str, policy: str = "keep-first",
+                 max_memory_keys: int = 2_000_000, chunk_size: int = 100_000, spill_dir: str = None):
+        """Constructor for DuplicateKeyDetector object. Parameters:
+            - csv_path : fully qualified path of CSV file to check
+            - key_column : name of key column in the CSV file
+            - policy : one of POLICIES (which occurrences are rejected)
+            - max_memory_keys : above this many distinct keys, spill to disk
+            - chunk_size : rows read per chunk whilst streaming the file
+            - spill_dir : directory for temporary sort runs (default: system temp)
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Duplicate policy '{policy}' not one of {self.POLICIES}")
+
+        self.csv_path = csv_path
+        self.key_column = key_column
+        self.policy = policy
+        self.max_memory_keys = max_memory_keys
+        self.chunk_size = chunk_size
+        self.spill_dir = spill_dir
+        self.spilled = False
+
+        duplicate_groups = self._find_duplicate_groups()
+        self.duplicate_key_count = len(duplicate_groups)
+        self.rejected_rows = set()
+
+        for row_numbers in duplicate_groups:
+            row_numbers = sorted(row_numbers)
+            if policy == "keep-first":
+                self.rejected_rows.update(row_numbers[1:])
+            elif policy == "keep-last":
+                self.rejected_rows.update(row_numbers[:-1])
+            else:
+                self.rejected_rows.update(row_numbers)
+
+        # Sorted once, so each chunk only looks up the rejected rows in its own row number range
+        self._rejected_array = np.array(sorted(self.rejected_rows), dtype=np.int64)
+
+        method = "external sort" if self.spilled else "hash map"
+        logging.info(f"Found {self.duplicate_key_count} duplicated {key_column} values in {csv_path} "
+                     f"by {method}, {len(self.rejected_rows)} rows rejected ({policy})")
+
+
+    def _read_keys(self):
+        """Generator function - yields key column chunks (blank keys excluded, row numbers as index)."""
+        for chunk in pd.read_csv(self.csv_path, usecols=[self.key_column], dtype=str, chunksize=self.chunk_size):
+            keys = chunk[self.key_column]
+            yield keys[keys.notna() & (keys != "")]
+
+
+    def _find_duplicate_groups(self):
+        """Returns list of row number lists, one per key occurring more than once."""
+        first_rows = {}
+        repeat_rows = {}
+        key_chunks = self._read_keys()
+
+        for keys in key_chunks:
+            key_values = keys.to_numpy()
+            row_numbers = keys.index.to_numpy()
+
+            # New keys are neither repeated within the chunk nor seen in earlier chunks. Seen keys
+            # are looked up in the hash map itself (isin would re-hash all keys seen so far per chunk)
+            seen = np.fromiter(map(first_rows.__contains__, key_values), dtype=bool, count=len(key_values))
+            new = ~(keys.duplicated().to_numpy() | seen)
+            first_rows.update(zip(key_values[new], row_numbers[new].tolist()))
+
+            for key, row_number in zip(key_values[~new], row_numbers[~new].tolist()):
+                repeat_rows.setdefault(key, []).append(row_number)
+
+            if len(first_rows) > self.max_memory_keys:
+                return self._external_sort_groups(first_rows, repeat_rows, key_chunks)
+
+        return [[first_rows[key]] + row_numbers for key, row_numbers in repeat_rows.items()]
+
+
+    def _external_sort_groups(self, first_rows: dict, repeat_rows: dict, key_chunks):
+        """
+        Spills keys seen so far, and all remaining chunks, to sorted run files
+        (max_memory_keys rows each) then merges the runs to group equal keys.
+        """
+        self.spilled = True
+        logging.info(f"More than {self.max_memory_keys} keys in {self.csv_path}, spilling to disk")
+
+        run_dir = tempfile.mkdtemp(prefix="duplicate_keys_", dir=self.spill_dir)
+        try:
+            run_paths = []
+
+            def write_run(run_df: pd.DataFrame):
+                run_path = os.path.join(run_dir, f"run_{len(run_paths):05d}.csv")
+                run_df.sort_values(["key", "row_number"]).to_csv(run_path, header=False, index=False)
+                run_paths.append(run_path)
+
+            seen_df = pd.DataFrame({"key": list(first_rows.keys()), "row_number": list(first_rows.values())})
+            repeat_df = pd.DataFrame([(key, row_number) for key, row_numbers in repeat_rows.items() for row_number in row_numbers],
+                                     columns=["key", "row_number"])
+            write_run(pd.concat([seen_df, repeat_df]))
+            first_rows.clear()
+            repeat_rows.clear()
+
+            buffered = []
+            buffered_count = 0
+            for keys in key_chunks:
+                buffered.append(pd.DataFrame({"key": keys.to_numpy(), "row_number": keys.index}))
+                buffered_count += len(keys)
+                if buffered_count >= self.max_memory_keys:
+                    write_run(pd.concat(buffered))
+                    buffered, buffered_count = [], 0
+
+            if buffered:
+                write_run(pd.concat(buffered))
+
+            return self._merge_runs(run_paths)
+
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+    @staticmethod
+    def _merge_runs(run_paths: list):
+        """K-way merge of sorted run files, returning row numbers of each duplicated key."""
+        run_files = [open(run_path, "r", newline="") for run_path in run_paths]
+        try:
+            runs = [((key, int(row_number)) for key, row_number in csv.reader(run_file)) for run_file in run_files]
+            duplicate_groups = []
+
+            for _, pairs in itertools.groupby(heapq.merge(*runs), key=lambda pair: pair[0]):
+                row_numbers = [row_number for _, row_number in pairs]
+                if len(row_numbers) > 1:
+                    duplicate_groups.append(row_numbers)
+
+            return duplicate_groups
+
+        finally:
+            for run_file in run_files:
+                run_file.close()
+
+
+    def find_duplicates(self, df: pd.DataFrame):
+        """Returns boolean Series, True where the row is a rejected duplicate under the policy."""
+        row_numbers = df.index.to_numpy()
+        if len(row_numbers) == 0:
+            return pd.Series(False, index=df.index)
+
+        start, end = np.searchsorted(self._rejected_array, [row_numbers.min(), row_numbers.max() + 1])
+        return pd.Series(np.isin(row_numbers, self._rejected_array[start:end]), index=df.index)
@@ -0,0 +1,62 @@
+import logging
+import importlib.util
+from collections import defaultdict
+import pandas as pd
+
+# Arrow-backed strings are used for free text when pyarrow is installed
+# (optional dependency), otherwise pandas' own string dtype.
+if importlib.util.find_spec("pyarrow") is not None:
+    TEXT_DTYPE = pd.StringDtype("pyarrow")
+else:
+    TEXT_DTYPE = pd.StringDtype("python")
+
+
+class EntityDtypes():
+    """
+    Helper class providing memory-lean pandas dtypes for each HESA entity,
+    in place of dtype=str (one Python object per value):
+        - category : low-cardinality code columns (e.g. demographics codes, countries)
+        - TEXT_DTYPE : every other column (keys, names, addresses, etc)
+
+    Column names cover both delivery and transformed files of the entity.
+
+    Usage: pass dtypes to pd.read_csv, then fill_blanks in place of fillna("").
+    """
+    CATEGORY_COLUMNS = {
+        "students": ["home_country", "term_country"],
+        "demographics": ["ethnicity", "gender", "religion", "sexid", "sexort", "trans",
+                         "ethnicity_grp1", "ethnicity_grp2", "ethnicity_grp3"],
+        "student_programs": ["program_id", "program_code", "program_name", "fees_paid"]
+    }
+
+    def __init__(self, entity: str):
+        """Constructor for EntityDtypes object. Parameters:
+            - entity : entity name (a key of CATEGORY_COLUMNS, e.g. 'demographics')
+        """
+        if entity not in self.CATEGORY_COLUMNS:
+            raise ValueError(f"No dtypes declared for entity '{entity}'")
+
+        self.entity = entity
+        self.category_columns = self.CATEGORY_COLUMNS[entity]
+
+        # Columns not listed default to text (dtype keys not in a file are ignored by read_csv)
+        self.dtypes = defaultdict(lambda: TEXT_DTYPE, {col: "category" for col in self.category_columns})
+
+
+    @staticmethod
+    def fill_blanks(df: pd.DataFrame, columns: list):
+        """Fills missing values with empty string, adding '' as a category where needed."""
+        for col in columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype) and "" not in df[col].cat.categories:
+                df[col] = df[col].cat.add_categories("")
+            df[col] = df[col].fillna("")
+
+        return df
+
+
+    @staticmethod
+    def log_memory_usage(df: pd.DataFrame, label: str):
+        """Logs in-memory size of a DataFrame (deep, i.e. including string contents)."""
+        total_bytes = int(df.memory_usage(deep=True).sum())
+        bytes_per_row = total_bytes / len(df) if len(df) else 0
+        logging.info(f"{label}: {len(df)} rows, {total_bytes / 1024:.1f} KiB in memory ({bytes_per_row:.0f} bytes/row)")
@@ -0,0 +1,65 @@
+import os
+import logging
+import pandas as pd
+from ingest.core.BloomFilter import BloomFilter
+
+
+class KeySet():
+    """
+    Helper class holding the set of valid keys from one column of a CSV file
+    (e.g. student_guid from the transformed students file), for referential
+    checks during extract.
+
+    The file is streamed in chunks (key column only). Keys are held in a
+    Python set, or in a BloomFilter when the file is estimated to hold more
+    than max_exact_keys rows. A Bloom filter may let a small fraction of
+    orphans through but never rejects a valid key.
+
+    Usage: instantiate and then call contains on each chunk.
+    """
+    def __init__(self, csv_path: str, key_column: str, max_exact_keys: int = 2_000_000,
+                 error_rate: float = 0.001, chunk_size: int = 100_000):
+        """Constructor for KeySet object. Parameters:
+            - csv_path : fully qualified path of CSV file containing valid keys
+            - key_column : name of key column in the CSV file
+            - max_exact_keys : above this (estimated) row count a Bloom filter is used
+            - error_rate : Bloom filter false positive rate
+            - chunk_size : rows read per chunk whilst streaming the file
+        """
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"Key file {csv_path} not found (has its extract run?)")
+
+        estimated_rows = self._estimate_rows(csv_path)
+        self.use_bloom = estimated_rows > max_exact_keys
+        self.keys = BloomFilter(estimated_rows, error_rate) if self.use_bloom else set()
+        self.key_count = 0
+
+        for chunk in pd.read_csv(csv_path, usecols=[key_column], dtype=str, chunksize=chunk_size):
+            chunk_keys = chunk[key_column].dropna()
+            if self.use_bloom:
+                self.keys.add(chunk_keys)
+            else:
+                self.keys.update(chunk_keys)
+            self.key_count += len(chunk_keys)
+
+        key_store = "Bloom filter" if self.use_bloom else "set"
+        logging.info(f"Read {self.key_count} keys from {csv_path} into {key_store}")
+
+
+    @staticmethod
+    def _estimate_rows(csv_path: str, sample_bytes: int = 1_000_000):
+        """Estimates row count from file size and line density of the first sample_bytes."""
+        file_size = os.path.getsize(csv_path)
+        with open(csv_path, "rb") as csv_file:
+            sample = csv_file.read(sample_bytes)
+
+        sample_lines = max(1, sample.count(b"\n"))
+        return int(file_size / len(sample) * sample_lines) if sample else 0
+
+
+    def contains(self, keys: pd.Series):
+        """Returns boolean Series, True where key is in the key set."""
+        if self.use_bloom:
+            return pd.Series(self.keys.contains(keys.fillna("")), index=keys.index)
+        else:
+            return keys.isin(self.keys)
@@ -0,0 +1,108 @@
+import logging
+
+
+class LoadTableLayout():
+    """
+    Helper class resolving the load tables of a delivery's entities, for the
+    layout set by app config load_layout:
+        - per_delivery (default) : a table per delivery and entity,
+          load_hesa_<delivery>_<entity> (utils/create_hesa_<nn>056_load_tables.py)
+        - partitioned : a table per entity, load_hesa_nn056_<entity>, LIST
+          partitioned by hesa_delivery with a partition p_<delivery> per delivery
+          (utils/create_hesa_nn056_partitioned_load_tables.py)
+
+    In the partitioned layout a delivery is replaced by partition exchange
+    rather than DELETE: rows are loaded into an unpartitioned swap table, which
+    is then exchanged with the delivery's partition. The exchange swaps table
+    metadata, so costs the same whatever the delivery or table size, and
+    readers see the old or the new delivery, never a part-loaded one.
+
+    Partition DDL commits any open transaction (MySQL), so is not run mid-transaction.
+
+    Usage: instantiate, call table_name to get load targets, then (when partitioned)
+    create_swap_table before loading and exchange_partition after.
+    """
+    LAYOUTS = ["per_delivery", "partitioned"]
+
+    def __init__(self, config: dict):
+        """Constructor for LoadTableLayout object. Parameters:
+            - config : app config (provides load_layout)
+        """
+        self.layout = config.get("load_layout") or "per_delivery"
+        if self.layout not in self.LAYOUTS:
+            raise ValueError(f"Unknown load_layout '{self.layout}' (expected one of {self.LAYOUTS})")
+
+
+    @property
+    def partitioned(self):
+        return self.layout == "partitioned"
+
+
+    def table_name(self, delivery_code: str, entity: str):
+        """Returns the load table of a delivery's entity (e.g. students, lookup_ethnicity)."""
+        if self.partitioned:
+            return f"load_hesa_nn056_{entity}"
+        return f"load_hesa_{delivery_code}_{entity}"
+
+
+    @staticmethod
+    def partition_name(delivery_code: str):
+        return f"p_{delivery_code}"
+
+
+    def ensure_partition(self, cursor, table_name: str, delivery_code: str):
+        """Adds the delivery's partition to a partitioned load table, if missing. Returns True if added."""
+        partition_name = self.partition_name(delivery_code)
+
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.partitions
+            WHERE table_schema = DATABASE()
+                AND table_name = %s
+                AND partition_name = %s
+            """, (table_name, partition_name))
+        if cursor.fetchone()[0] > 0:
+            return False
+
+        cursor.execute(f"ALTER TABLE {table_name} ADD PARTITION "
+                       f"(PARTITION {partition_name} VALUES IN ('{delivery_code}'))")
+        logging.info(f"Added partition {partition_name} to {table_name}")
+        return True
+
+
+    def create_swap_table(self, cursor, table_name: str, delivery_code: str):
+        """
+        Creates an empty, unpartitioned copy of a partitioned load table, to load
+        a delivery into before exchange_partition. Returns the swap table name.
+        A swap table left by a failed load is replaced.
+        """
+        swap_table = f"{table_name}_swap_{delivery_code}"
+
+        cursor.execute(f"DROP TABLE IF EXISTS {swap_table}")
+        cursor.execute(f"CREATE TABLE {swap_table} LIKE {table_name}")
+        cursor.execute(f"ALTER TABLE {swap_table} REMOVE PARTITIONING")
+
+        return swap_table
+
+
+    def exchange_partition(self, cursor, table_name: str, swap_table: str, delivery_code: str):
+        """
+        Exchanges a loaded swap table with the delivery's partition (added if
+        missing), then drops the swap table, which then holds the replaced rows.
+        Returns the number of rows replaced.
+
+        Rows are not validated against the partition (WITHOUT VALIDATION, as
+        that would scan them): every row loaded must have the delivery's hesa_delivery.
+        """
+        partition_name = self.partition_name(delivery_code)
+        self.ensure_partition(cursor, table_name, delivery_code)
+
+        cursor.execute(f"ALTER TABLE {table_name} EXCHANGE PARTITION {partition_name} "
+                       f"WITH TABLE {swap_table} WITHOUT VALIDATION")
+
+        cursor.execute(f"SELECT COUNT(*) FROM {swap_table}")
+        row_count = cursor.fetchone()[0]
+        cursor.execute(f"DROP TABLE {swap_table}")
+
+        logging.info(f"Exchanged partition {partition_name} of {table_name}, replacing {row_count} rows")
+        return row_count
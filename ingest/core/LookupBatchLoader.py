@@ -0,0 +1,141 @@
+import os
+import glob
+import logging
+import pandas as pd
+from utils.data_platform_core import get_config, set_up_logging, connect_to_db
+from ingest.core.LoadTableLayout import LoadTableLayout
+
+
+class LookupBatchLoader():
+    """
+    Helper class to load every HESA lookup file (hesa_<delivery>_lookup_<name>.csv)
+    found under deliveries_dir into its load table (load_hesa_<delivery>_lookup_<name>,
+    or load_hesa_nn056_lookup_<name> in the partitioned layout, see LoadTableLayout).
+
+    All tables are loaded over one connection, in a single transaction per
+    delivery (a failed delivery is rolled back, other deliveries still load).
+    So in the partitioned layout a delivery's lookup rows are replaced by DELETE
+    (pruned to its partition) rather than partition exchange, which would commit
+    each table separately; lookups are small, so exchange would gain little.
+
+    Usage: instantiate and then call transfer_data.
+    """
+    def __init__(self, delivery_codes: list = None, caller_name: str = None):
+        """Constructor for LookupBatchLoader object. Parameters:
+            - delivery_codes : deliveries to load (default: all found under deliveries_dir)
+            - caller_name : name of the calling script/module (for logging)
+        """
+        self.config = get_config()
+        script_name = caller_name or self.__class__.__name__
+        set_up_logging(self.config, script_name)
+
+        self.lookup_files = self._discover_lookup_files(delivery_codes)
+        self.layout = LoadTableLayout(self.config)
+
+
+    def _discover_lookup_files(self, delivery_codes: list = None):
+        """Returns {delivery code: [(lookup name, file path), ...]} for lookup files found."""
+        lookup_files = {}
+        lookup_paths = glob.glob(os.path.join(self.config["deliveries_dir"], "*", "hesa_*_lookup_*.csv"))
+
+        for lookup_path in sorted(lookup_paths):
+            delivery_code = os.path.basename(os.path.dirname(lookup_path))
+            file_prefix = f"hesa_{delivery_code}_lookup_"
+            file_name = os.path.basename(lookup_path)
+
+            # Skip files not named for the delivery directory they are in
+            if not file_name.startswith(file_prefix):
+                logging.warning(f"Lookup file {lookup_path} not named for its delivery, skipped")
+                continue
+
+            if delivery_codes and delivery_code not in delivery_codes:
+                continue
+
+            lookup_name = file_name[len(file_prefix):-len(".csv")]
+            lookup_files.setdefault(delivery_code, []).append((lookup_name, lookup_path))
+
+        logging.info(f"Found {sum(len(files) for files in lookup_files.values())} lookup files "
+                     f"for {len(lookup_files)} deliveries")
+        return lookup_files
+
+
+    def _load_table(self, cursor, delivery_code: str, lookup_name: str, lookup_path: str):
+        """Replaces contents of one lookup load table. Returns (rows deleted, rows inserted)."""
+        target_table = self.layout.table_name(delivery_code, f"lookup_{lookup_name.lower()}")
+
+        lookup_df = pd.read_csv(lookup_path, dtype=str)
+        lookup_df.columns = [col.lower() for col in lookup_df.columns]
+        lookup_df = lookup_df[["code", "label"]].astype(object)
+
+        # Missing values inserted as NULL, source file recorded on every row
+        data_for_insert = lookup_df.where(lookup_df.notna(), None).values.tolist()
+        source_file = os.path.basename(lookup_path)
+        for row in data_for_insert:
+            row.append(source_file)
+            row.append(delivery_code)
+
+        # No COUNT needed, as DELETE reports the rows it removed (commit logic is in 'transfer_data')
+        cursor.execute(f"DELETE FROM {target_table} WHERE hesa_delivery = %s", (delivery_code,))
+        count_deleted = cursor.rowcount
+
+        insert_cmd = f"""
+            INSERT INTO {target_table}
+                        (code, label, source_file, hesa_delivery)
+                    VALUES (%s, %s, %s, %s)
+            """
+        cursor.executemany(insert_cmd, data_for_insert)
+
+        logging.info(f"{target_table}: deleted {count_deleted} rows, inserted {len(data_for_insert)} rows")
+        return count_deleted, len(data_for_insert)
+
+
+    def transfer_data(self):
+        """
+        Main method: loads each delivery's lookups in one transaction.
+
+        Returns dictionary of {table name: rows inserted}. Raises RuntimeError
+        after all deliveries are attempted if any delivery failed.
+        """
+        conn = None
+        cursor = None
+        table_counts = {}
+        failed_deliveries = []
+
+        try:
+            conn = connect_to_db(self.config)
+            cursor = conn.cursor()
+
+            for delivery_code, lookups in self.lookup_files.items():
+                try:
+                    # Partitions added first, as DDL would commit the delivery's transaction part-way
+                    if self.layout.partitioned:
+                        for lookup_name, _ in lookups:
+                            target_table = self.layout.table_name(delivery_code, f"lookup_{lookup_name.lower()}")
+                            self.layout.ensure_partition(cursor, target_table, delivery_code)
+
+                    delivery_counts = {}
+                    for lookup_name, lookup_path in lookups:
+                        _, count_inserted = self._load_table(cursor, delivery_code, lookup_name, lookup_path)
+                        target_table = self.layout.table_name(delivery_code, f"lookup_{lookup_name.lower()}")
+                        delivery_counts[target_table] = count_inserted
+
+                    conn.commit()
+
+                    # Summed, as deliveries share each table when partitioned
+                    for target_table, count_inserted in delivery_counts.items():
+                        table_counts[target_table] = table_counts.get(target_table, 0) + count_inserted
+                    logging.info(f"Loaded {len(lookups)} lookup tables for delivery {delivery_code}")
+
+                except Exception as e:
+                    logging.critical(f"Error loading lookups for delivery {delivery_code}, rolled back: {e}")
+                    conn.rollback()
+                    failed_deliveries.append(delivery_code)
+
+        finally:
+            if cursor:  cursor.close()
+            if conn:    conn.close()
+
+        if failed_deliveries:
+            raise RuntimeError(f"Lookup load failed for deliveries: {failed_deliveries}")
+
+        return table_counts
@@ -0,0 +1,96 @@
+import os
+import glob
+import logging
+import pandas as pd
+
+
+class LookupIndex():
+    """
+    Helper class holding all HESA lookup files for a delivery in memory,
+    as {lookup name: {code: label}} (e.g. {"SEXID": {"10": "Female", ...}}).
+
+    Used by extract scripts to validate codes against the lookups shipped
+    with the same delivery, so unknown codes are rejected at extract rather
+    than being silently dropped by joins during dimensional modelling.
+
+    Usage: instantiate and then call find_unknown/add_labels on each chunk.
+    """
+    # Lookups already loaded by this process: {delivery code: (lookup files signature, lookups)}
+    _loaded_lookups = {}
+
+    def __init__(self, config: dict, delivery_code: str, column_mappings: dict):
+        """Constructor for LookupIndex object. Parameters:
+            - config : app config (provides deliveries_dir)
+            - delivery_code : delivery whose lookup files are loaded (e.g. 22056_20240331)
+            - column_mappings : dictionary of column/lookup pairs (csv col: lookup name)
+        """
+        self.delivery_code = delivery_code
+        self.delivery_dir = os.path.join(config["deliveries_dir"], delivery_code)
+        self.lookups = self._get_lookups()
+
+        # Keep only mappings for lookups present in the delivery
+        self.column_mappings = {}
+        for csv_col, lookup_name in column_mappings.items():
+            if lookup_name.upper() in self.lookups:
+                self.column_mappings[csv_col] = lookup_name.upper()
+            else:
+                logging.warning(f"Lookup {lookup_name} not found for delivery {delivery_code}, column {csv_col} not validated")
+
+
+    def _get_lookups(self):
+        """
+        Reads every hesa_<delivery>_lookup_<name>.csv file, once per process
+        unless the files change (e.g. a re-delivery processed by a long-running
+        watcher): reuse is keyed on the files' names, sizes and modified times.
+        """
+        file_prefix = f"hesa_{self.delivery_code}_lookup_"
+        lookup_paths = sorted(glob.glob(os.path.join(self.delivery_dir, f"{file_prefix}*.csv")))
+
+        signature = []
+        for lookup_path in lookup_paths:
+            lookup_stat = os.stat(lookup_path)
+            signature.append((os.path.basename(lookup_path), lookup_stat.st_size, lookup_stat.st_mtime_ns))
+
+        loaded = self._loaded_lookups.get(self.delivery_code)
+        if loaded and loaded[0] == signature:
+            return loaded[1]
+
+        lookups = {}
+        for lookup_path in lookup_paths:
+            lookup_name = os.path.basename(lookup_path)[len(file_prefix):-len(".csv")].upper()
+
+            lookup_df = pd.read_csv(lookup_path, dtype=str, keep_default_na=False)
+            lookup_df.columns = [col.lower() for col in lookup_df.columns]
+            lookups[lookup_name] = dict(zip(lookup_df["code"], lookup_df["label"]))
+
+        logging.info(f"Loaded {len(lookups)} lookups for delivery {self.delivery_code}")
+
+        self._loaded_lookups[self.delivery_code] = (signature, lookups)
+        return lookups
+
+
+    def find_unknown(self, df: pd.DataFrame):
+        """
+        Checks mapped columns against the delivery's lookup codes (vectorised isin).
+        Blank values are not checked (mandatory checks remain with each extract).
+
+        Returns dictionary of {failure reason: boolean Series of invalid rows}.
+        Only reasons with at least one failure are included.
+        """
+        failures = {}
+
+        for col, lookup_name in self.column_mappings.items():
+            values = df[col].fillna("")
+            unknown_codes = (values != "") & ~values.isin(self.lookups[lookup_name].keys())
+            if unknown_codes.any():
+                failures[f"{col} code not in {lookup_name} lookup"] = unknown_codes
+
+        return failures
+
+
+    def add_labels(self, df: pd.DataFrame):
+        """Adds a '<col>_label' column for each mapped column, mapped from the lookup."""
+        for col, lookup_name in self.column_mappings.items():
+            df[f"{col}_label"] = df[col].map(self.lookups[lookup_name])
+
+        return df
@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import pickle
+import logging
+import pandas as pd
+
+
+class SchemaValidator():
+    """
+    Helper class to validate delivery DataFrames against the HESA schema
+    specification (e.g. SchemaSpecification22056.json).
+
+    The spec is compiled once into per-field rules (frozenset of valid
+    entries, max length, format regex) and cached to disk, so subsequent
+    processes only unpickle the compiled rules rather than parse 500KB of JSON.
+
+    Usage: instantiate and then call find_invalid on each chunk.
+    """
+    # Bump when the compiled format changes, to invalidate disk caches
+    COMPILER_VERSION = 1
+
+    # Compiled specs already loaded by this process: {collection: (cache key, compiled spec)}
+    _compiled_specs = {}
+
+    def __init__(self, config: dict, collection_ref: str, column_mappings: dict):
+        """Constructor for SchemaValidator object. Parameters:
+            - config : app config (provides static_dir and cache_dir)
+            - collection_ref : HESA collection whose spec applies (e.g. '22056')
+            - column_mappings : dictionary of column/field pairs (csv col: spec field name)
+
+        If no spec exists for the collection, a warning is logged and no
+        schema checks are applied (e.g. 23056 until its spec is published).
+        """
+        self.collection_ref = collection_ref
+        self.spec_path = os.path.join(config["static_dir"], f"SchemaSpecification{collection_ref}.json")
+        self.cache_path = os.path.join(config["cache_dir"], f"schema_spec_{collection_ref}.pkl")
+
+        compiled = self._get_compiled_spec()
+
+        # Keep only rules for mapped columns, ignoring unknown spec fields
+        self.column_rules = {}
+        for csv_col, field_name in column_mappings.items():
+            rule = compiled.get(field_name.upper())
+            if rule is None and compiled:
+                logging.warning(f"Field {field_name} not in schema spec {collection_ref}, column {csv_col} not validated")
+            elif rule is not None:
+                self.column_rules[csv_col] = rule
+
+
+    @staticmethod
+    def compile_field(field: dict):
+        """
+        Compiles one spec field definition into a validation rule dict:
+            - valid_entries : frozenset of codes (None if free-format)
+            - max_length : maximum characters (None if not a string type)
+            - pattern : regex pattern for the data type (None if not needed)
+        """
+        data_type = field["DataType"].upper()
+        rule = {"data_type": data_type, "valid_entries": None, "max_length": None, "pattern": None}
+
+        if field["ValidEntries"]:
+            rule["valid_entries"] = frozenset(code for entries in field["ValidEntries"] for code in entries)
+
+        string_match = re.match(r"^N?VARCHAR\((\d+)\)$", data_type)
+        numeric_match = re.match(r"^(?:NUMERIC|DECIMAL)\((\d+),\s*(\d+)\)$", data_type)
+
+        if string_match:
+            rule["max_length"] = int(string_match.group(1))
+        elif numeric_match:
+            precision, scale = int(numeric_match.group(1)), int(numeric_match.group(2))
+            integer_digits = precision - scale
+            if scale > 0:
+                rule["pattern"] = rf"^-?\d{{1,{integer_digits}}}(\.\d{{1,{scale}}})?$"
+            else:
+                rule["pattern"] = rf"^-?\d{{1,{integer_digits}}}$"
+        elif data_type == "DATE":
+            rule["pattern"] = r"^\d{4}-\d{2}-\d{2}$"
+
+        return rule
+
+
+    def _compile_spec(self):
+        """Parses the JSON spec and flattens all entities into {field name: rule}."""
+        with open(self.spec_path, "r") as spec_file:
+            spec = json.load(spec_file)
+
+        compiled = {}
+
+        def compile_entity(entity: dict):
+            for field in entity["Fields"]:
+                compiled.setdefault(field["Name"].upper(), self.compile_field(field))
+            for child_entity in entity.get("ChildEntities", {}).values():
+                compile_entity(child_entity)
+
+        for entity in spec[self.collection_ref].values():
+            compile_entity(entity)
+
+        return compiled
+
+
+    def _get_compiled_spec(self):
+        """
+        Returns compiled spec from (in order of preference) this process,
+        the disk cache, or by compiling the JSON spec and caching it.
+        Either cache is reused only if the spec file is unchanged since caching
+        (e.g. a long-running watcher picks up a replaced spec).
+        """
+        if not os.path.exists(self.spec_path):
+            loaded = self._compiled_specs.get(self.collection_ref)
+            if not loaded or loaded[0] is not None:
+                logging.warning(f"No schema spec found at {self.spec_path}, schema validation skipped")
+            self._compiled_specs[self.collection_ref] = (None, {})
+            return {}
+
+        spec_stat = os.stat(self.spec_path)
+        cache_key = (self.COMPILER_VERSION, spec_stat.st_mtime_ns, spec_stat.st_size)
+
+        loaded = self._compiled_specs.get(self.collection_ref)
+        if loaded and loaded[0] == cache_key:
+            return loaded[1]
+
+        compiled = None
+
+        try:
+            if os.path.exists(self.cache_path):
+                with open(self.cache_path, "rb") as cache_file:
+                    cached = pickle.load(cache_file)
+                if cached["cache_key"] == cache_key:
+                    compiled = cached["rules"]
+                    logging.info(f"Loaded compiled schema spec from {self.cache_path}")
+
+        except Exception as e:
+            logging.warning(f"{type(e).__name__} reading schema cache {self.cache_path}, recompiling: {e}")
+
+        if compiled is None:
+            compiled = self._compile_spec()
+            logging.info(f"Compiled {len(compiled)} fields from {self.spec_path}")
+
+            # Written to a per-process temporary file then renamed, as concurrent extracts may cache the same spec
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as cache_file:
+                pickle.dump({"cache_key": cache_key, "rules": compiled}, cache_file)
+            os.replace(temp_path, self.cache_path)
+
+        self._compiled_specs[self.collection_ref] = (cache_key, compiled)
+        return compiled
+
+
+    def find_invalid(self, df: pd.DataFrame):
+        """
+        Applies vectorised checks (isin, str.len, str.match) to mapped columns.
+        Blank values are not checked (mandatory checks remain with each extract).
+
+        Returns dictionary of {failure reason: boolean Series of invalid rows}.
+        Only reasons with at least one failure are included.
+        """
+        failures = {}
+
+        for col, rule in self.column_rules.items():
+            values = df[col].fillna("").astype(str)
+            populated = values != ""
+
+            if rule["valid_entries"] is not None:
+                bad_codes = populated & ~values.isin(rule["valid_entries"])
+                if bad_codes.any():
+                    failures[f"invalid {col} code"] = bad_codes
+
+            if rule["max_length"] is not None:
+                too_long = populated & (values.str.len() > rule["max_length"])
+                if too_long.any():
+                    failures[f"{col} exceeds {rule['max_length']} chars"] = too_long
+
+            if rule["pattern"] is not None:
+                bad_format = populated & ~values.str.match(rule["pattern"])
+                if bad_format.any():
+                    failures[f"{col} not valid {rule['data_type']}"] = bad_format
+
+        return failures
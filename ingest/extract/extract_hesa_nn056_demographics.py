@@ -5,7 +5,11 @@ import sys
 from multiprocessing import Pool
 import time
 import traceback
-from utils.data_platform_core import get_config, set_up_logging
+from utils.data_platform_core import get_config, set_up_logging, report_step_counts, get_pool_processes
+from ingest.core.SchemaValidator import SchemaValidator
+from ingest.core.LookupIndex import LookupIndex
+from ingest.core.KeySet import KeySet
+from ingest.core.EntityDtypes import EntityDtypes
 
 
 def init(delivery_code):
@@ -19,14 +23,45 @@ def init(delivery_code):
     config["input_path"] = os.path.join(config["deliveries_dir"], f"{delivery_code}/hesa_{delivery_code}_data_demographics.csv")
     config["transformed_path"] = os.path.join(config["transformed_dir"], f"{delivery_code}/hesa_{delivery_code}_demographics_transformed.csv")
     config["bad_data_path"] = os.path.join(config["bad_data_dir"], f"{delivery_code}/hesa_{delivery_code}_demographics_bad_data.csv")
+
+    # Memory-lean dtypes (category codes, Arrow-backed text) used from read through to write
+    config["entity_dtypes"] = EntityDtypes("demographics")
+
+    # Validate codes against HESA schema spec of the delivery's collection (e.g. 22056)
+    schema_mappings = {"ethnicity": "ETHNIC", "gender": "GENDERID", "religion": "RELIGION",
+                       "sexid": "SEXID", "sexort": "SEXORT", "trans": "TRANS",
+                       "ethnicity_grp1": "Z_ETHNICGRP1", "ethnicity_grp2": "Z_ETHNICGRP2",
+                       "ethnicity_grp3": "Z_ETHNICGRP3"}
+    collection_ref = delivery_code.split("_")[0]
+    config["schema_validator"] = SchemaValidator(config, collection_ref, schema_mappings)
+
+    # Validate codes against lookup files shipped with the same delivery
+    lookup_mappings = {"ethnicity": "ETHNICITY", "gender": "GENDERID", "religion": "RELIGION",
+                       "sexid": "SEXID", "sexort": "SEXORT", "trans": "TRANS",
+                       "ethnicity_grp1": "Z_ETHNICGRP1", "ethnicity_grp2": "Z_ETHNICGRP2",
+                       "ethnicity_grp3": "Z_ETHNICGRP3"}
+    config["lookup_index"] = LookupIndex(config, delivery_code, lookup_mappings)
+
+    # Optionally add lookup labels alongside codes in transformed file
+    config["enrich_labels"] = "--enrich-labels" in sys.argv
+
+    # Optionally check stu_id exists in students extract output (students extract must run first)
+    config["check_refs"] = "--check-refs" in sys.argv
+    config["count_orphans"] = 0
+    if config["check_refs"]:
+        students_path = os.path.join(config["transformed_dir"], f"{delivery_code}/hesa_{delivery_code}_students_transformed.csv")
+        config["student_keys"] = KeySet(students_path, "student_guid")
     return config
 
 
 def init_output_files(config):
     """
-    Remove output files if they exist. This supports append mode and
-    header-row logic during batched file writes.
+    Create output directories (new deliveries have none) and remove output
+    files if they exist. This supports append mode and header-row logic
+    during batched file writes.
     """
+    os.makedirs(os.path.dirname(config["transformed_path"]), exist_ok=True)
+    os.makedirs(os.path.dirname(config["bad_data_path"]), exist_ok=True)
     if os.path.exists(config["transformed_path"]):
         os.remove(config["transformed_path"])
     if os.path.exists(config["bad_data_path"]):
@@ -39,7 +74,7 @@ def read_data_chunks(config, chunk_size=500):
     """
     logging.info(f"Reading extract file: {config['input_path']}")
 
-    for chunk in pd.read_csv(config["input_path"], chunksize=chunk_size, dtype=str):
+    for chunk in pd.read_csv(config["input_path"], chunksize=chunk_size, dtype=config["entity_dtypes"].dtypes):
         yield chunk
 
 
@@ -67,15 +102,45 @@ def cleanse_data(df: pd.DataFrame, config):
     """
     # Fill NA columns with empty string (simplifies subsequent validation logic)
     columns_to_fill = ["stu_id", "ethnicity", "gender", "religion", "sexid", "sexort", "trans", "ethnicity_grp1", "ethnicity_grp2", "ethnicity_grp3"]
-    df[columns_to_fill] = df[columns_to_fill].fillna("")
+    EntityDtypes.fill_blanks(df, columns_to_fill)
 
     cols_missing = ((df["stu_id"] == "") | (df["ethnicity"] == "") | (df["gender"] == "") | (df["religion"] == "") |
                     (df["sexid"] == "") | (df["sexort"] == "") | (df["trans"] == "") |
                     (df["ethnicity_grp1"] == "") | (df["ethnicity_grp2"] == "") | (df["ethnicity_grp3"] == ""))
 
+    # Check stu_id is in students extract (orphans would be dropped by staging joins)
+    orphan_rows = pd.Series(False, index=df.index)
+    if config["check_refs"]:
+        orphan_rows = (df["stu_id"] != "") & ~config["student_keys"].contains(df["stu_id"])
+        config["count_orphans"] += int(orphan_rows.sum())
+
+    # Check codes and lengths against HESA schema spec
+    schema_failures = config["schema_validator"].find_invalid(df)
+
+    # Check codes exist in the delivery's lookup files
+    lookup_failures = config["lookup_index"].find_unknown(df)
+
     # Combine error series and write bad rows to separate csv file
-    bad_indexes = cols_missing
-    bad_rows = df[bad_indexes]
+    code_failures = {**schema_failures, **lookup_failures}
+    bad_indexes = cols_missing | orphan_rows
+    for failed_rows in code_failures.values():
+        bad_indexes = bad_indexes | failed_rows
+    bad_rows = df[bad_indexes].copy()
+
+    # Add "failure reasons" column to bad data dataframe
+    bad_rows["failure_reasons"] = ""
+
+    if any(cols_missing):
+        bad_rows.loc[cols_missing, "failure_reasons"] += "mandatory data missing; "
+
+    if any(orphan_rows):
+        bad_rows.loc[orphan_rows, "failure_reasons"] += "stu_id not in students file; "
+
+    for reason, failed_rows in code_failures.items():
+        bad_rows.loc[failed_rows, "failure_reasons"] += f"{reason}; "
+
+    bad_rows["failure_reasons"] = bad_rows["failure_reasons"].str.rstrip("; ")
+
     write_header = not(os.path.exists(config["bad_data_path"]))
     bad_rows.to_csv(config["bad_data_path"], mode="a", header=write_header, index=False)
 
@@ -100,14 +165,14 @@ def transform_batch(batch: pd.DataFrame):
 def transform_parallel(df, batch_size=50):
     """
     Breaks an input DataFrame into batches and invokes parallelised
-    transformation on them all.
+    transformation on them all (pool size from get_pool_processes).
     """
     batches = []
     for i in range(0, len(df), batch_size):
         batch = df.iloc[i:i+batch_size]
         batches.append(batch)
 
-    with Pool() as pool:
+    with Pool(get_pool_processes()) as pool:
         transformed_batches = pool.map(transform_batch, batches)
     
     return pd.concat(transformed_batches)
@@ -134,12 +199,16 @@ def main():
         # Streams/chunks input file and for each chunk:
         #   - check for correct columns
         #   - cleanse data (exceptions go to 'bad_data' file)
+        #   - add lookup labels (if --enrich-labels given)
         #   - transform and write good data ('transformed' file)
         for chunk in read_data_chunks(config, 200):
             count_read += len(chunk)
+            EntityDtypes.log_memory_usage(chunk, f"Chunk from row {chunk.index[0]}")
             chunk_copy = chunk.copy()
             check_columns(chunk_copy)
             chunk_copy = cleanse_data(chunk_copy, config)
+            if config["enrich_labels"]:
+                chunk_copy = config["lookup_index"].add_labels(chunk_copy)
             chunk_copy = transform_parallel(chunk_copy)
             count_transformed += len(chunk_copy)
             write_transformed_data(chunk_copy, config)
@@ -148,15 +217,26 @@ def main():
         logging.info(f"Rows extracted: {count_read}")
         logging.info(f"Rows failed validation: {count_read - count_transformed}")
         logging.info(f"Rows transformed: {count_transformed}")
+        if config["check_refs"]:
+            logging.info(f"Rows with stu_id not in students file: {config['count_orphans']}")
 
         end_time = time.time()
         elapsed_time = end_time - start_time
         logging.info(f"Demographics transform complete. Elapsed time: {elapsed_time:.4f} seconds")
 
+        # Counts for the pipeline's run telemetry
+        report_step_counts(rows_read=count_read,
+                           rows_written=count_transformed,
+                           rows_rejected=count_read - count_transformed,
+                           bytes_processed=os.path.getsize(config["input_path"]))
+
     except Exception as e:
         logging.critical(f"{type(e).__name__} during extract: {e}")
         logging.critical(traceback.format_exc())
 
+        # Non-zero exit status, so the pipeline treats the step as failed (and skips its load)
+        sys.exit(1)
+
 
 if __name__ == '__main__':
     main()
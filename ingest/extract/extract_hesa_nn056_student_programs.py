@@ -6,7 +6,10 @@ import traceback
 import logging
 import pandas as pd
 from multiprocessing import Pool
-from utils.data_platform_core import get_config, set_up_logging, is_valid_date
+from utils.data_platform_core import get_config, set_up_logging, is_valid_date, report_step_counts, get_pool_processes
+from ingest.core.SchemaValidator import SchemaValidator
+from ingest.core.KeySet import KeySet
+from ingest.core.EntityDtypes import EntityDtypes
 
 
 def init(delivery_code):
@@ -21,15 +24,34 @@ def init(delivery_code):
     config["transformed_path"] = os.path.join(config["transformed_dir"], f"{delivery_code}/hesa_{delivery_code}_student_programs_transformed.csv")
     config["bad_data_path"] = os.path.join(config["bad_data_dir"], f"{delivery_code}/hesa_{delivery_code}_student_programs_bad_data.csv")
 
+    # Memory-lean dtypes (category codes, Arrow-backed text) used from read through to write
+    config["entity_dtypes"] = EntityDtypes("student_programs")
+
+    # Validate against HESA schema spec of the delivery's collection (e.g. 22056)
+    # (enrol_date is not mapped as the date checks below already cover it)
+    schema_mappings = {"program_id": "COURSEID", "program_name": "COURSETITLE"}
+    collection_ref = delivery_code.split("_")[0]
+    config["schema_validator"] = SchemaValidator(config, collection_ref, schema_mappings)
+
+    # Optionally check stu_id exists in students extract output (students extract must run first)
+    config["check_refs"] = "--check-refs" in sys.argv
+    config["count_orphans"] = 0
+    if config["check_refs"]:
+        students_path = os.path.join(config["transformed_dir"], f"{delivery_code}/hesa_{delivery_code}_students_transformed.csv")
+        config["student_keys"] = KeySet(students_path, "student_guid")
+
     return config
 
 
 def init_output_files(config):
     """
-    Remove output files if they exist. This supports append mode and
-    header-row logic during batched file writes.
+    Create output directories (new deliveries have none) and remove output
+    files if they exist. This supports append mode and header-row logic
+    during batched file writes.
     """
     try:
+        os.makedirs(os.path.dirname(config["transformed_path"]), exist_ok=True)
+        os.makedirs(os.path.dirname(config["bad_data_path"]), exist_ok=True)
         if os.path.exists(config["transformed_path"]):
             os.remove(config["transformed_path"])
         if os.path.exists(config["bad_data_path"]):
@@ -47,7 +69,7 @@ def read_data_chunks(config, chunk_size=500):
     try:
         logging.info(f"Reading extract CSV: {config['input_path']}")
 
-        for chunk in pd.read_csv(config["input_path"], chunksize=chunk_size, dtype=str):
+        for chunk in pd.read_csv(config["input_path"], chunksize=chunk_size, dtype=config["entity_dtypes"].dtypes):
             yield chunk
 
     except Exception as e:
@@ -79,7 +101,7 @@ def cleanse_data(df: pd.DataFrame, config):
     """
     # Fill NA columns with empty string (simplifies subsequent validation logic)
     columns_to_fill = ["stu_id", "program_id", "program_code", "program_name", "enrol_date", "fees_paid"]
-    df[columns_to_fill] = df[columns_to_fill].fillna("")
+    EntityDtypes.fill_blanks(df, columns_to_fill)
 
     # Check for mandatory columns
     mandatory_cols_missing = ((df["stu_id"] == "") | (df["enrol_date"] == "") | (df["fees_paid"] == "") |
@@ -93,8 +115,19 @@ def cleanse_data(df: pd.DataFrame, config):
     bad_format_enrol_dates = ~(df["enrol_date"].apply(lambda x: bool(date_pattern.match(x)) if x else False))
     bad_enrol_dates = ~(df["enrol_date"].apply(lambda x: is_valid_date(x) if x else False))
 
+    # Check stu_id is in students extract (orphans would be dropped by staging joins)
+    orphan_rows = pd.Series(False, index=df.index)
+    if config["check_refs"]:
+        orphan_rows = (df["stu_id"] != "") & ~config["student_keys"].contains(df["stu_id"])
+        config["count_orphans"] += int(orphan_rows.sum())
+
+    # Check codes and lengths against HESA schema spec
+    schema_failures = config["schema_validator"].find_invalid(df)
+
     # Combine error series
-    bad_indexes = (mandatory_cols_missing | bad_format_enrol_dates | bad_enrol_dates | bad_fees_flag)
+    bad_indexes = (mandatory_cols_missing | bad_format_enrol_dates | bad_enrol_dates | bad_fees_flag | orphan_rows)
+    for failed_rows in schema_failures.values():
+        bad_indexes = bad_indexes | failed_rows
     bad_rows = df[bad_indexes].copy()
 
     # Add "failure reasons" column to bad data dataframe
@@ -112,6 +145,12 @@ def cleanse_data(df: pd.DataFrame, config):
     if any(bad_fees_flag):
         bad_rows.loc[bad_fees_flag, "failure_reasons"] += "bad fees flag; "
 
+    if any(orphan_rows):
+        bad_rows.loc[orphan_rows, "failure_reasons"] += "stu_id not in students file; "
+
+    for reason, failed_rows in schema_failures.items():
+        bad_rows.loc[failed_rows, "failure_reasons"] += f"{reason}; "
+
     bad_rows["failure_reasons"] = bad_rows["failure_reasons"].str.rstrip("; ")
 
     # write rejected rows to bad data csv
@@ -142,14 +181,14 @@ def transform_batch(batch: pd.DataFrame):
 def transform_parallel(df, batch_size=50):
     """
     Breaks an input DataFrame into batches and invokes parallelised
-    transformation on them all.
+    transformation on them all (pool size from get_pool_processes).
     """
     batches = []
     for i in range(0, len(df), batch_size):
         batch = df.iloc[i:i+batch_size]
         batches.append(batch)
 
-    with Pool() as pool:
+    with Pool(get_pool_processes()) as pool:
         transformed_batches = pool.map(transform_batch, batches)
     
     return pd.concat(transformed_batches)
@@ -184,6 +223,7 @@ def main():
         #   - transform and write good data ("transformed" file)
         for chunk in read_data_chunks(config, 200):
             count_read += len(chunk)
+            EntityDtypes.log_memory_usage(chunk, f"Chunk from row {chunk.index[0]}")
             chunk_copy = chunk.copy()
             check_columns(chunk_copy)
             chunk_copy = cleanse_data(chunk_copy, config)
@@ -195,15 +235,26 @@ def main():
         logging.info(f"CSV rows extracted: {count_read}")
         logging.info(f"CSV rows failed validation: {count_read - count_transformed}")
         logging.info(f"CSV rows transformed: {count_transformed}")
+        if config["check_refs"]:
+            logging.info(f"CSV rows with stu_id not in students file: {config['count_orphans']}")
 
         end_time = time.time()
         elapsed_time = end_time - start_time
         logging.info(f"Student program extract complete. Elapsed time: {elapsed_time:.4f} seconds")
 
+        # Counts for the pipeline's run telemetry
+        report_step_counts(rows_read=count_read,
+                           rows_written=count_transformed,
+                           rows_rejected=count_read - count_transformed,
+                           bytes_processed=os.path.getsize(config["input_path"]))
+
     except Exception as e:
         # In case of error, rollback DB transaction and display error
         logging.critical(f"{type(e).__name__} during extract : {e}")
         logging.critical(traceback.format_exc())
 
+        # Non-zero exit status, so the pipeline treats the step as failed (and skips its load)
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
@@ -6,7 +6,9 @@ import re
 import sys
 from multiprocessing import Pool
 import time
-from utils.data_platform_core import get_config, set_up_logging, is_valid_date
+from utils.data_platform_core import get_config, set_up_logging, is_valid_date, get_option_value, report_step_counts, get_pool_processes
+from ingest.core.DuplicateKeyDetector import DuplicateKeyDetector
+from ingest.core.EntityDtypes import EntityDtypes
 
 
 def init(delivery_code):
@@ -20,15 +22,26 @@ def init(delivery_code):
     config["input_path"] = os.path.join(config["deliveries_dir"], f"{delivery_code}/hesa_{delivery_code}_data_students.csv")
     config["transformed_path"] = os.path.join(config["transformed_dir"], f"{delivery_code}/hesa_{delivery_code}_students_transformed.csv")
     config["bad_data_path"] = os.path.join(config["bad_data_dir"], f"{delivery_code}/hesa_{delivery_code}_students_bad_data.csv")
+
+    # Memory-lean dtypes (category codes, Arrow-backed text) used from read through to write
+    config["entity_dtypes"] = EntityDtypes("students")
+
+    # Find duplicated stu_ids up front, so they can be rejected chunk by chunk
+    # (policy via --duplicates=keep-first|keep-last|reject-all)
+    config["duplicate_policy"] = get_option_value("duplicates", "keep-first")
+    config["duplicate_keys"] = DuplicateKeyDetector(config["input_path"], "stu_id", config["duplicate_policy"])
     return config
 
 
 def init_output_files(config):
     """
-    Remove output files if they exist. This supports append mode and
-    header-row logic during batched file writes.
+    Create output directories (new deliveries have none) and remove output
+    files if they exist. This supports append mode and header-row logic
+    during batched file writes.
     """
     try:
+        os.makedirs(os.path.dirname(config["transformed_path"]), exist_ok=True)
+        os.makedirs(os.path.dirname(config["bad_data_path"]), exist_ok=True)
         if os.path.exists(config["transformed_path"]):
             os.remove(config["transformed_path"])
         if os.path.exists(config["bad_data_path"]):
@@ -46,7 +59,7 @@ def read_data_chunks(config, chunk_size=500):
     try:
         logging.info(f"Reading student extract: {config['input_path']}")
 
-        for chunk in pd.read_csv(config["input_path"], chunksize=chunk_size, dtype=str):
+        for chunk in pd.read_csv(config["input_path"], chunksize=chunk_size, dtype=config["entity_dtypes"].dtypes):
             yield chunk
 
     except Exception as e:
@@ -79,7 +92,7 @@ def cleanse_data(df: pd.DataFrame, config):
     """
     # Fill NA columns with empty string (simplifies subsequent validation logic)
     columns_to_fill = ["stu_id", "phone", "email", "home_address", "home_postcode", "home_country", "term_address", "term_postcode", "term_country", "name", "dob"]
-    df[columns_to_fill] = df[columns_to_fill].fillna("")
+    EntityDtypes.fill_blanks(df, columns_to_fill)
 
     # And check for missing address details
     home_addr_incomplete = (
@@ -100,8 +113,11 @@ def cleanse_data(df: pd.DataFrame, config):
     bad_format_dobs = ~(df["dob"].apply(lambda x: bool(date_pattern.match(x)) if x else False))
     bad_date_dobs = ~(df["dob"].apply(lambda x: is_valid_date(x) if x else False))
 
+    # Check for duplicate stu_id (rows rejected depend on duplicate policy)
+    duplicate_ids = config["duplicate_keys"].find_duplicates(df)
+
     # Combine error series and write bad rows to separate csv file
-    bad_indexes = home_addr_incomplete | term_addr_incomplete | other_cols_missing | bad_emails | bad_format_dobs | bad_date_dobs
+    bad_indexes = home_addr_incomplete | term_addr_incomplete | other_cols_missing | bad_emails | bad_format_dobs | bad_date_dobs | duplicate_ids
     bad_rows = df[bad_indexes].copy()
 
     # Add "failure reasons" column to bad data dataframe
@@ -125,6 +141,9 @@ def cleanse_data(df: pd.DataFrame, config):
     if any(bad_date_dobs):
         bad_rows.loc[bad_date_dobs, "failure_reasons"] += "invalid dob; "
 
+    if any(duplicate_ids):
+        bad_rows.loc[duplicate_ids, "failure_reasons"] += f"duplicate stu_id ({config['duplicate_policy']}); "
+
     bad_rows["failure_reasons"] = bad_rows["failure_reasons"].str.rstrip("; ")
 
     # Write data quality issues to "bad data" csv file
@@ -172,14 +191,14 @@ def transform_batch(batch: pd.DataFrame):
 def transform_parallel(df, batch_size=50):
     """
     Breaks an input DataFrame into batches and invokes parallelised
-    transformation on them all.
+    transformation on them all (pool size from get_pool_processes).
     """
     batches = []
     for i in range(0, len(df), batch_size):
         batch = df.iloc[i:i+batch_size]
         batches.append(batch)
 
-    with Pool() as pool:
+    with Pool(get_pool_processes()) as pool:
         transformed_batches = pool.map(transform_batch, batches)
     
     return pd.concat(transformed_batches)
@@ -214,6 +233,7 @@ def main():
         #   - transform and write good data ("transformed" file)
         for chunk in read_data_chunks(config, 200):
             count_read += len(chunk)
+            EntityDtypes.log_memory_usage(chunk, f"Chunk from row {chunk.index[0]}")
             chunk_copy = chunk.copy()
             check_columns(chunk_copy)
             chunk_copy = cleanse_data(chunk_copy, config)
@@ -230,10 +250,19 @@ def main():
         elapsed_time = end_time - start_time
         logging.info(f"Student transform complete. Elapsed time: {elapsed_time:.4f} seconds")
 
+        # Counts for the pipeline's run telemetry
+        report_step_counts(rows_read=count_read,
+                           rows_written=count_transformed,
+                           rows_rejected=count_read - count_transformed,
+                           bytes_processed=os.path.getsize(config["input_path"]))
+
     except Exception as e:
         logging.critical(f"{type(e).__name__} during extract: {e}")
         logging.critical(traceback.format_exc())
 
+        # Non-zero exit status, so the pipeline treats the step as failed (and skips its load)
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
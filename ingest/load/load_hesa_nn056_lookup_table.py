@@ -1,6 +1,7 @@
 import os
 import sys
 from ingest.core.CsvTableCopier import CsvTableCopier
+from ingest.core.LoadTableLayout import LoadTableLayout
 from utils.data_platform_core import get_config
 
 def main():
@@ -12,11 +13,12 @@ def main():
     source_file = f"hesa_{delivery_code}_lookup_{lookup_name}.csv"
     source_path = os.path.join(config['deliveries_dir'], delivery_code, source_file)
 
-    target_table = f"load_hesa_{delivery_code}_lookup_{lookup_name.lower()}"
+    target_table = LoadTableLayout(config).table_name(delivery_code, f"lookup_{lookup_name.lower()}")
     column_mappings = {"Code": "code", "Label": "label"}
 
     script_name = os.path.basename(__file__)
-    table_copier = CsvTableCopier(source_path, target_table, column_mappings, script_name)
+    table_copier = CsvTableCopier(source_path, target_table, column_mappings, script_name,
+                                  delivery_code=delivery_code)
     table_copier.transfer_data()
 
 
@@ -0,0 +1,28 @@
+"""
+Script to load every HESA lookup file found under the deliveries directory
+(optionally only for the delivery codes given as arguments).
+"""
+import os
+import sys
+from utils.data_platform_core import report_step_counts
+from ingest.core.LookupBatchLoader import LookupBatchLoader
+
+
+def main():
+    delivery_codes = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
+    script_name = os.path.basename(__file__)
+    lookup_loader = LookupBatchLoader(delivery_codes, script_name)
+    table_counts = lookup_loader.transfer_data()
+
+    for table_name, row_count in table_counts.items():
+        print(f"{table_name}: {row_count} rows")
+
+    lookup_bytes = sum(os.path.getsize(lookup_path) for lookups in lookup_loader.lookup_files.values()
+                       for _, lookup_path in lookups)
+    report_step_counts(rows_read=sum(table_counts.values()), rows_written=sum(table_counts.values()),
+                       bytes_processed=lookup_bytes)
+
+
+if __name__ == "__main__":
+    main()
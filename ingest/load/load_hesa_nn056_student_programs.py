@@ -2,6 +2,7 @@ import os
 import sys
 from utils.data_platform_core import get_config
 from ingest.core.CsvTableCopier import CsvTableCopier
+from ingest.core.LoadTableLayout import LoadTableLayout
 
 def main():
     """Set generic config and process-specific additional (filenames, etc)"""
@@ -13,7 +14,7 @@ def main():
     source_path = os.path.join(config['transformed_dir'], delivery_code, source_file)
 
     # Target table and column name mappings
-    target_table = f"load_hesa_{delivery_code}_student_programs"
+    target_table = LoadTableLayout(config).table_name(delivery_code, "student_programs")
     column_mappings = {"student_guid": "student_guid",
                     "email": "email",
                     "program_guid": "program_guid",
@@ -23,7 +24,7 @@ def main():
                     "fees_paid": "fees_paid"}
 
     script_name = os.path.basename(__file__)
-    table_copier = CsvTableCopier(source_path, target_table, column_mappings, script_name)
+    table_copier = CsvTableCopier(source_path, target_table, column_mappings, script_name, "student_programs", delivery_code)
     table_copier.transfer_data()
 
 
@@ -2,6 +2,7 @@ import os
 import sys
 from utils.data_platform_core import get_config
 from ingest.core.CsvTableCopier import CsvTableCopier
+from ingest.core.LoadTableLayout import LoadTableLayout
 
 def main():
     """Set generic config and process-specific additional (filenames, etc)"""
@@ -13,7 +14,7 @@ def main():
     source_path = os.path.join(config['transformed_dir'], delivery_code, source_file)
 
     # Target table and column name mappings
-    target_table = f"load_hesa_{delivery_code}_students"
+    target_table = LoadTableLayout(config).table_name(delivery_code, "students")
     column_mappings = {"student_guid": "student_guid",
                         "first_names": "first_names",
                         "last_name": "last_name",
@@ -28,7 +29,7 @@ def main():
                         "term_country": "term_country"}
 
     script_name = os.path.basename(__file__)
-    table_copier = CsvTableCopier(source_path, target_table, column_mappings, script_name)
+    table_copier = CsvTableCopier(source_path, target_table, column_mappings, script_name, "students", delivery_code)
     table_copier.transfer_data()
 
 
@@ -43,5 +43,6 @@ docker compose run --rm app python utils/create_dim_date.py
 docker compose run --rm app python utils/create_hesa_22056_load_tables.py
 docker compose run --rm app python utils/create_hesa_23056_load_tables.py
 docker compose run --rm app python utils/create_hesa_static_load_tables.py
+docker compose run --rm app python utils/create_etl_run_history_table.py
 
-echo "Date dimension and load tables created."
\ No newline at end of file
+echo "Date dimension, load tables and run history table created."
\ No newline at end of file
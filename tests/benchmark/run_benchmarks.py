@@ -0,0 +1,320 @@
+"""
+Benchmarks each pipeline stage at fixed synthetic data sizes, against the
+database configured by the DB_* environment variables (a local MySQL
+container, as load tables and models there are replaced):
+    - extract per entity
+    - load per table (and the delivery's lookups)
+    - DBT staging, dimensions and facts models
+
+For each size a synthetic delivery is generated (utils/generate_synthetic_delivery.py)
+under an existing delivery code, in its own data directory (cache_dir/benchmark),
+so the existing load tables and staging models apply to it.
+
+Each stage's rows, wall time, rows/s, CPU time and peak memory are compared
+with a JSON baseline. The script fails (exit 1) if any stage's wall time or
+peak memory exceeds its baseline by more than the threshold. The baseline is
+written on the first run, or with --save-baseline (e.g. after an intended change).
+
+DBT models are built with the indexes in their configs (macro create_indexes),
+or without them with --no-indexes. --compare-indexes times the fact build
+before/after indexing: each size's delivery is generated once and its stages
+run with --full-refresh (which drops existing indexes) without, then with,
+the indexes, and the DBT stage timings are printed side by side (no baseline).
+
+Usage:
+    python tests/benchmark/run_benchmarks.py [--sizes=10000,100000] [--seed=N]
+        [--delivery=<delivery code>] [--repeat=N] [--threshold=0.2]
+        [--min-seconds=1.0] [--baseline=<path>] [--save-baseline]
+        [--full-refresh] [--no-indexes] [--compare-indexes]
+"""
+import os
+import sys
+import json
+import shutil
+import logging
+import platform
+import resource
+import statistics
+from datetime import datetime
+from utils.data_platform_core import get_config, set_up_logging, get_option_value
+from flows.hesa_nn056_pipeline import NN056_ENTITIES, run_script
+from flows.DbtProjectRunner import DbtProjectRunner
+from flows.RunTelemetry import RunTelemetry
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# DBT model folders, benchmarked (in this order) as separate stages
+DBT_STAGES = ["staging", "dimensions", "facts"]
+
+# Metrics compared with the baseline (higher is worse)
+COMPARED_METRICS = ["wall_seconds", "peak_rss_kb"]
+
+
+def prepare_data_dir(config, delivery_code: str):
+    """
+    Points DATA_DIR (for this process and the scripts it runs) at the benchmark
+    data directory, holding the static files and the delivery's lookups and
+    manifest. Returns the benchmark config.
+    """
+    benchmark_dir = os.path.join(config["cache_dir"], "benchmark")
+    os.environ["DATA_DIR"] = benchmark_dir
+    benchmark_config = get_config()
+
+    if not os.path.exists(benchmark_config["static_dir"]):
+        os.makedirs(os.path.dirname(benchmark_config["static_dir"]), exist_ok=True)
+        os.symlink(config["static_dir"], benchmark_config["static_dir"])
+
+    source_dir = os.path.join(config["deliveries_dir"], delivery_code)
+    delivery_dir = os.path.join(benchmark_config["deliveries_dir"], delivery_code)
+    os.makedirs(delivery_dir, exist_ok=True)
+    for file_name in os.listdir(source_dir):
+        if "_lookup_" in file_name or file_name == f"{delivery_code}.json":
+            shutil.copyfile(os.path.join(source_dir, file_name), os.path.join(delivery_dir, file_name))
+
+    return benchmark_config
+
+
+def stage_metrics(rows: int, elapsed: float, cpu_time: float, peak_rss_kb: int):
+    """Returns a stage's metrics dictionary."""
+    return {"rows": rows,
+            "wall_seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else None,
+            "cpu_seconds": round(cpu_time, 3),
+            "peak_rss_kb": peak_rss_kb}
+
+
+def run_script_stage(script_path: str, script_args: list):
+    """Runs a pipeline script as a subprocess, returning its metrics (rows read as reported by the script)."""
+    result = run_script(script_path, script_args)
+    if result["returncode"] != 0:
+        raise RuntimeError(f"{result['script']} {' '.join(script_args)} failed: {result['stderr'][-2000:]}")
+
+    counts = RunTelemetry.parse_step_counts(result["stdout"])
+    return stage_metrics(counts.get("rows_read") or 0, result["elapsed"], result["cpu_time"], result["peak_rss_kb"])
+
+
+def run_dbt_stage(dbt_runner: DbtProjectRunner, select: str, full_refresh: bool, dbt_vars: dict):
+    """
+    Runs selected DBT models in this process, returning their metrics (rows
+    affected). Peak memory is this process's high-water mark (DBT stages run
+    in order, so a later stage's figure includes earlier stages).
+    """
+    usage_start = RunTelemetry.start_usage()
+    success, timings = dbt_runner.run(select, full_refresh, dbt_vars)
+    usage = RunTelemetry.end_usage(usage_start)
+
+    if not success:
+        raise RuntimeError(f"DBT models '{select}' failed: {[t['model'] for t in timings if t['status'] != 'success']}")
+
+    rows = sum(timing["rows_affected"] or 0 for timing in timings)
+    return stage_metrics(rows, usage["elapsed"], usage["cpu_time"], resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def run_stages(config, delivery_code: str, dbt_runner: DbtProjectRunner, full_refresh: bool, indexes: bool):
+    """Runs every stage once, in pipeline order. Returns {stage name: metrics}."""
+    stages = {}
+
+    for entity in NN056_ENTITIES:
+        extract_path = os.path.join(config["extract_script_dir"], f"extract_hesa_nn056_{entity}.py")
+        stages[f"extract_{entity}"] = run_script_stage(extract_path, [delivery_code])
+
+    for entity in NN056_ENTITIES:
+        load_path = os.path.join(config["load_script_dir"], f"load_hesa_nn056_{entity}.py")
+        stages[f"load_{entity}"] = run_script_stage(load_path, [delivery_code])
+
+    lookups_path = os.path.join(config["load_script_dir"], "load_hesa_nn056_lookup_tables.py")
+    stages["load_lookups"] = run_script_stage(lookups_path, [delivery_code])
+
+    dbt_vars = {"hesa_deliveries": [delivery_code], "hesa_loaded_deliveries": [delivery_code],
+                "hesa_load_layout": config["load_layout"],
+                "create_indexes": indexes}
+    for dbt_stage in DBT_STAGES:
+        stages[f"dbt_{dbt_stage}"] = run_dbt_stage(dbt_runner, dbt_stage, full_refresh, dbt_vars)
+
+    for stage_name, metrics in stages.items():
+        logging.info(f"Benchmark stage {stage_name}: {metrics}")
+
+    return stages
+
+
+def generate_delivery(config, delivery_code: str, rows: int, seed: int):
+    """Generates a synthetic delivery of rows students under delivery_code."""
+    generator_path = os.path.join(config["base_dir"], "utils", "generate_synthetic_delivery.py")
+    print(f"Generating synthetic delivery {delivery_code} of {rows} students...")
+    result = run_script(generator_path, [delivery_code, f"--rows={rows}", f"--seed={seed}", f"--template={delivery_code}"])
+    if result["returncode"] != 0:
+        raise RuntimeError(f"Synthetic delivery generation failed: {result['stderr'][-2000:]}")
+
+
+def run_stages_median(config, delivery_code: str, rows: int, repeat: int, dbt_runner: DbtProjectRunner,
+                      full_refresh: bool, indexes: bool):
+    """Runs the stages repeat times. Returns {stage name: metrics}, each metric the median of the runs."""
+    runs = []
+    for run_number in range(1, repeat + 1):
+        print(f"Running stages ({rows} students, {'with' if indexes else 'without'} indexes, run {run_number} of {repeat})...")
+        runs.append(run_stages(config, delivery_code, dbt_runner, full_refresh, indexes))
+
+    medians = {}
+    for stage_name in runs[0]:
+        stage_runs = [run[stage_name] for run in runs]
+        wall_seconds = statistics.median(run["wall_seconds"] for run in stage_runs)
+        medians[stage_name] = stage_metrics(stage_runs[0]["rows"], wall_seconds,
+                                            statistics.median(run["cpu_seconds"] for run in stage_runs),
+                                            int(statistics.median(run["peak_rss_kb"] for run in stage_runs)))
+
+    return medians
+
+
+def benchmark_size(config, delivery_code: str, rows: int, seed: int, repeat: int, dbt_runner: DbtProjectRunner,
+                   full_refresh: bool, indexes: bool):
+    """Generates a synthetic delivery of rows students, then returns its median stage metrics."""
+    generate_delivery(config, delivery_code, rows, seed)
+    return run_stages_median(config, delivery_code, rows, repeat, dbt_runner, full_refresh, indexes)
+
+
+def compare_indexes(config, delivery_code: str, rows: int, seed: int, repeat: int, dbt_runner: DbtProjectRunner):
+    """
+    Generates a synthetic delivery of rows students, then times its stages
+    (full refresh) without, then with, the models' indexes. Returns
+    {"without_indexes": {stage name: metrics}, "with_indexes": {...}}.
+    """
+    generate_delivery(config, delivery_code, rows, seed)
+    return {"without_indexes": run_stages_median(config, delivery_code, rows, repeat, dbt_runner, True, False),
+            "with_indexes": run_stages_median(config, delivery_code, rows, repeat, dbt_runner, True, True)}
+
+
+def print_index_comparison(comparisons: dict):
+    """Prints DBT stage wall times without and with indexes (dbt_facts being the fact build)."""
+    for size, comparison in comparisons.items():
+        print(f"\n{size} students, DBT stages (full refresh):")
+        print(f"    {'stage':<26}{'no indexes s':>14}{'indexes s':>12}{'change':>10}")
+
+        for stage_name in [f"dbt_{dbt_stage}" for dbt_stage in DBT_STAGES]:
+            without_seconds = comparison["without_indexes"][stage_name]["wall_seconds"]
+            with_seconds = comparison["with_indexes"][stage_name]["wall_seconds"]
+            change = f"{with_seconds / without_seconds - 1:+.0%}" if without_seconds else "-"
+            print(f"    {stage_name:<26}{without_seconds:>14.2f}{with_seconds:>12.2f}{change:>10}")
+            logging.info(f"Index comparison, {size} students, {stage_name}: "
+                         f"{without_seconds}s without indexes, {with_seconds}s with")
+
+
+def compare_to_baseline(results: dict, baseline: dict, threshold: float, min_seconds: float):
+    """
+    Returns list of regressions: stage metrics more than threshold (a fraction)
+    above the baseline. Wall times are not compared for stages quicker than
+    min_seconds both times, as their timings are mostly noise.
+    """
+    regressions = []
+
+    for size, stages in results.items():
+        baseline_stages = baseline.get("sizes", {}).get(size, {}).get("stages")
+        if baseline_stages is None:
+            print(f"No baseline for {size} students, not compared")
+            continue
+
+        for stage_name, metrics in stages.items():
+            baseline_metrics = baseline_stages.get(stage_name)
+            if baseline_metrics is None:
+                continue
+
+            for metric in COMPARED_METRICS:
+                current, previous = metrics[metric], baseline_metrics.get(metric)
+                if not previous:
+                    continue
+                if metric == "wall_seconds" and max(current, previous) < min_seconds:
+                    continue
+                if current > previous * (1 + threshold):
+                    regressions.append(f"{size} students, {stage_name}: {metric} {current} vs baseline {previous} "
+                                       f"(+{current / previous - 1:.0%})")
+
+    return regressions
+
+
+def print_results(results: dict, baseline: dict):
+    """Prints each stage's metrics, with wall time change against the baseline."""
+    for size, stages in results.items():
+        baseline_stages = baseline.get("sizes", {}).get(size, {}).get("stages", {})
+        print(f"\n{size} students:")
+        print(f"    {'stage':<26}{'rows':>10}{'wall s':>10}{'rows/s':>12}{'peak MB':>10}{'vs baseline':>13}")
+
+        for stage_name, metrics in stages.items():
+            previous = baseline_stages.get(stage_name, {}).get("wall_seconds")
+            change = f"{metrics['wall_seconds'] / previous - 1:+.0%}" if previous else "-"
+            print(f"    {stage_name:<26}{metrics['rows']:>10}{metrics['wall_seconds']:>10.2f}"
+                  f"{metrics['rows_per_second'] or 0:>12.0f}{metrics['peak_rss_kb'] / 1024:>10.0f}{change:>13}")
+
+
+def save_baseline(baseline_path: str, baseline: dict, results: dict, options: dict):
+    """Writes results to the baseline file (sizes not benchmarked this time are kept)."""
+    baseline = {"created": datetime.now().isoformat(timespec="seconds"),
+                "host": platform.node(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+                "options": options,
+                "sizes": {**baseline.get("sizes", {}),
+                          **{size: {"stages": stages} for size, stages in results.items()}}}
+
+    with open(baseline_path, "w") as baseline_file:
+        json.dump(baseline, baseline_file, indent=4)
+
+    print(f"Baseline saved to {baseline_path}")
+
+
+def main():
+    config = get_config()
+    set_up_logging(config, os.path.basename(__file__))
+
+    sizes = [int(size) for size in get_option_value("sizes", "10000,100000").split(",")]
+    seed = int(get_option_value("seed", 0))
+    delivery_code = get_option_value("delivery", "22056_20240331")
+    repeat = int(get_option_value("repeat", 1))
+    threshold = float(get_option_value("threshold", 0.2))
+    min_seconds = float(get_option_value("min-seconds", 1.0))
+    baseline_path = get_option_value("baseline", DEFAULT_BASELINE_PATH)
+    full_refresh = "--full-refresh" in sys.argv
+    indexes = "--no-indexes" not in sys.argv
+
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    try:
+        benchmark_config = prepare_data_dir(config, delivery_code)
+        dbt_runner = DbtProjectRunner(benchmark_config)
+
+        if "--compare-indexes" in sys.argv:
+            comparisons = {str(rows): compare_indexes(benchmark_config, delivery_code, rows, seed, repeat, dbt_runner)
+                           for rows in sizes}
+            print_index_comparison(comparisons)
+            return
+
+        results = {}
+        for rows in sizes:
+            results[str(rows)] = benchmark_size(benchmark_config, delivery_code, rows, seed, repeat, dbt_runner,
+                                               full_refresh, indexes)
+
+    except Exception as e:
+        logging.critical(f"{type(e).__name__} during benchmark: {e}")
+        print(f"Benchmark failed: {e}")
+        sys.exit(1)
+
+    print_results(results, baseline)
+
+    if "--save-baseline" in sys.argv or not baseline:
+        save_baseline(baseline_path, baseline, results, {"seed": seed, "delivery_code": delivery_code, "repeat": repeat,
+                                                         "full_refresh": full_refresh, "indexes": indexes})
+        return
+
+    regressions = compare_to_baseline(results, baseline, threshold, min_seconds)
+    if regressions:
+        print(f"\n{len(regressions)} regressions past {threshold:.0%} threshold:")
+        for regression in regressions:
+            print(f"    {regression}")
+        sys.exit(1)
+
+    print(f"\nNo stage regressed past {threshold:.0%} threshold")
+
+
+if __name__ == "__main__":
+    main()
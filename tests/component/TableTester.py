@@ -3,6 +3,7 @@ import pandas as pd
 import logging
 import datetime
 from utils.data_platform_core import get_config, set_up_logging, connect_to_db
+from ingest.core.EntityDtypes import EntityDtypes
 
 class TableTester():
     """
@@ -11,7 +12,7 @@ class TableTester():
     
     def __init__(self, target_table: str, column_mappings: dict,
                  source_path: str = "", source_table: str = "",
-                 caller_name: str = None):
+                 caller_name: str = None, source_entity: str = None):
         """Constructor with source and target details provided as arguments.
 
             Fetches config (database info, file location paths) and sets up logging.
@@ -22,6 +23,7 @@ class TableTester():
                 source_path: fully qualified path of transformed CSV file if target was loaded from one.
                 source_table: Source table if target was loaded from another table.
                 caller_name: Name of script that instantiated this class. Used in logging messages.
+                source_entity: Entity whose memory-lean dtypes are used to read source CSV (default: all str).
             
             Note: column mappings and key column are converted to lowercase to support inconsistently-cased CSV files.
         """
@@ -38,6 +40,7 @@ class TableTester():
         self.source_table = source_table
         self.source_path = source_path
         self.target_table = target_table
+        self.source_dtypes = EntityDtypes(source_entity).dtypes if source_entity else str
 
         # Store column mappings (converted to lowercase to support
         # vendor-supplied CSV files containing capitalised column names).
@@ -106,7 +109,8 @@ class TableTester():
         Returns:
             df: Query results converted to a DataFrame.
         """
-        df = pd.read_csv(csv_path, dtype=str)
+        df = pd.read_csv(csv_path, dtype=self.source_dtypes)
+        EntityDtypes.log_memory_usage(df, csv_path)
 
         # Convert column names to lowercase (to support key-based row matching)
         df.columns = [col.lower() for col in df.columns]
@@ -165,9 +169,10 @@ class TableTester():
                 target_val = target_row[target_column]
 
                 # Check for source/target mismatch. Match conditions are NaN-NaN or value-value.
-                if ((pd.isna(source_val) and not pd.isna(target_val)) or
-                    (pd.isna(target_val) and not pd.isna(source_val)) or
-                    (source_val != target_val)):
+                source_missing = pd.isna(source_val)
+                target_missing = pd.isna(target_val)
+                if ((source_missing != target_missing) or
+                    (not source_missing and source_val != target_val)):
                     column_mismatches.append(f"{target_column}: {target_row[target_column]}, expected: {source_row[source_column]}")
 
             # If mismatches found in the row pair, append details to list
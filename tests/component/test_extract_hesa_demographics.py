@@ -0,0 +1,300 @@
+import pandas as pd
+import subprocess
+import shutil
+import os
+import sys
+from utils.data_platform_core import get_config
+
+config = get_config()
+test_results = []
+
+
+def run_etl_process(script_name: str, delivery_code: str):
+    result = subprocess.run(["python3", f"{config['extract_script_dir']}/{script_name}", delivery_code],
+                        capture_output=True, text=True)
+
+    if result.returncode != 0:
+        print(f"error running {script_name}: {result.stderr}")
+    else:
+        print(f"script {script_name} completed successfully")
+
+
+def get_transformed_csv(file_name: str, delivery_code: str):
+    """Returns a DataFrame of the transformed CSV file"""
+    file_path = os.path.join(config['transformed_dir'], delivery_code, file_name)
+    csv_df = pd.read_csv(file_path, dtype=str)
+    return csv_df
+
+
+def get_bad_data_csv(file_name: str, delivery_code: str):
+    """Returns a DataFrame of the bad data CSV file"""
+    file_path = os.path.join(config['bad_data_dir'], delivery_code, file_name)
+    csv_df = pd.read_csv(file_path, dtype=str)
+    return csv_df
+
+
+# --check-refs runs on a copy of the delivery (own code, so the outputs tested above are
+# untouched), with an orphan row: a copy of a good row whose stu_id is not in the students file
+CHECK_REFS_DELIVERY_CODE = "22056_29990101"
+ORPHAN_STU_ID = "0DDBA11E-0000-0000-0000-000000000001"
+
+
+def run_check_refs_etl(source_delivery_code: str):
+    """
+    Copies the delivery, adds an orphan demographics row and runs the students extract then
+    the demographics extract with --check-refs. Returns (transformed, bad data) DataFrames.
+    """
+    source_dir = os.path.join(config["deliveries_dir"], source_delivery_code)
+    delivery_dir = os.path.join(config["deliveries_dir"], CHECK_REFS_DELIVERY_CODE)
+    os.makedirs(delivery_dir, exist_ok=True)
+    for file_name in os.listdir(source_dir):
+        shutil.copy(os.path.join(source_dir, file_name),
+                    os.path.join(delivery_dir, file_name.replace(source_delivery_code, CHECK_REFS_DELIVERY_CODE)))
+
+    data_path = os.path.join(delivery_dir, f"hesa_{CHECK_REFS_DELIVERY_CODE}_data_demographics.csv")
+    data_df = pd.read_csv(data_path, dtype=str, keep_default_na=False)
+    orphan_row = data_df[data_df["stu_id"] == "DA9C5319-3EAE-0B29-BBF8-23E773298398"].copy()
+    orphan_row["stu_id"] = ORPHAN_STU_ID
+    pd.concat([data_df, orphan_row]).to_csv(data_path, index=False)
+
+    for script_name, script_args in [("extract_hesa_nn056_students.py", []),
+                                     ("extract_hesa_nn056_demographics.py", ["--check-refs"])]:
+        subprocess.run(["python3", f"{config['extract_script_dir']}/{script_name}", CHECK_REFS_DELIVERY_CODE] + script_args,
+                       capture_output=True, text=True)
+
+    transformed_df = get_transformed_csv(f"hesa_{CHECK_REFS_DELIVERY_CODE}_demographics_transformed.csv", CHECK_REFS_DELIVERY_CODE)
+    bad_data_df = get_bad_data_csv(f"hesa_{CHECK_REFS_DELIVERY_CODE}_demographics_bad_data.csv", CHECK_REFS_DELIVERY_CODE)
+    return transformed_df, bad_data_df
+
+
+def remove_check_refs_delivery():
+    """Removes the --check-refs delivery copy and its output files."""
+    for data_dir in [config["deliveries_dir"], config["transformed_dir"], config["bad_data_dir"]]:
+        shutil.rmtree(os.path.join(data_dir, CHECK_REFS_DELIVERY_CODE), ignore_errors=True)
+
+
+def tc001_transformed_row_count(csv_df):
+    test_desc = "Transformed file contains 2 rows"
+
+    if len(csv_df) == 2:
+        return True, test_desc
+    else:
+        return False, test_desc
+
+
+def tc002_good_row_all_cols_copied(csv_df):
+    test_desc = "all columns correctly written to transformed file"
+    test_key = "DA9C5319-3EAE-0B29-BBF8-23E773298398"
+
+    # Get test record
+    bool_series = (csv_df["student_guid"] == test_key)
+    matching_rows = csv_df[bool_series]
+    if len(matching_rows) == 0:
+        return False, f"{test_desc} - ERROR - student GUID {test_key} not in file"
+
+    good_row = matching_rows.iloc[0]
+
+    # Declare expected values (codes must keep their leading zeros)
+    expected_values = {
+        "student_guid": "DA9C5319-3EAE-0B29-BBF8-23E773298398",
+        "ethnicity": "120",
+        "gender": "02",
+        "religion": "21",
+        "sexid": "11",
+        "sexort": "10",
+        "trans": "01",
+        "ethnicity_grp1": "01",
+        "ethnicity_grp2": "02",
+        "ethnicity_grp3": "06"
+    }
+
+    # Evaluate test condition (all columns as expected)
+    for col_name, expected_value in expected_values.items():
+        if (good_row[col_name] != expected_value):
+            return False, f"{test_desc} - ERROR - row {test_key} has unexpected value in {col_name}"
+
+    return True, test_desc
+
+
+def tc501_bad_data_row_count(bad_df):
+    test_desc = "Bad data file contains 10 rows"
+
+    if len(bad_df) == 10:
+        return True, test_desc
+    else:
+        return False, test_desc
+
+
+def tc502_missing_stu_id_rejected(bad_df):
+    test_desc = "Missing stu_id filtered as bad data"
+
+    # Get test record (it has no stu_id, hence 'isna')
+    bool_series = (bad_df["stu_id"].isna())
+    matching_rows = bad_df[bool_series]
+    if len(matching_rows) == 0:
+        return False, f"{test_desc} - ERROR - test row not found"
+
+    # Evaluate test condition
+    student_row = matching_rows.iloc[0]
+    if "mandatory data missing" in student_row["failure_reasons"]:
+        return True, test_desc
+    else:
+        return False, test_desc
+
+
+def tc503_missing_ethnicity_rejected(bad_df):
+    test_desc = "Missing ethnicity filtered as bad data"
+    test_key = "A5514A52-5491-333D-D1C9-7CB8673ACDE6"
+
+    # Get test record
+    bool_series = (bad_df["stu_id"] == test_key)
+    matching_rows = bad_df[bool_series]
+    if len(matching_rows) == 0:
+        return False, f"{test_desc} - ERROR - student GUID {test_key} not in file"
+
+    # Evaluate test condition
+    student_row = matching_rows.iloc[0]
+    if ((pd.isna(student_row["ethnicity"])) and
+        ("mandatory data missing" in student_row["failure_reasons"])):
+        return True, test_desc
+    else:
+        return False, test_desc
+
+
+def tc504_invalid_sexid_code_rejected(bad_df):
+    test_desc = "SEXID code not in HESA schema spec filtered as bad data"
+    test_key = "714DA36F-84E2-C90D-E5D0-3551B19B09B3"
+
+    # Get test record
+    bool_series = (bad_df["stu_id"] == test_key)
+    matching_rows = bad_df[bool_series]
+    if len(matching_rows) == 0:
+        return False, f"{test_desc} - ERROR - student GUID {test_key} not in file"
+
+    # Evaluate test condition
+    student_row = matching_rows.iloc[0]
+    if "invalid sexid code" in student_row["failure_reasons"]:
+        return True, test_desc
+    else:
+        return False, test_desc
+
+
+def tc505_code_not_in_lookup_rejected(bad_df):
+    test_desc = "SEXID code not in delivery's SEXID lookup filtered as bad data"
+    test_key = "714DA36F-84E2-C90D-E5D0-3551B19B09B3"
+
+    # Get test record
+    bool_series = (bad_df["stu_id"] == test_key)
+    matching_rows = bad_df[bool_series]
+    if len(matching_rows) == 0:
+        return False, f"{test_desc} - ERROR - student GUID {test_key} not in file"
+
+    # Evaluate test condition
+    student_row = matching_rows.iloc[0]
+    if "sexid code not in SEXID lookup" in student_row["failure_reasons"]:
+        return True, test_desc
+    else:
+        return False, test_desc
+
+
+def tc506_orphan_stu_id_rejected_with_check_refs(transformed_df, bad_df):
+    test_desc = "With --check-refs, stu_id not in students file filtered as bad data"
+    test_key = ORPHAN_STU_ID
+
+    if (transformed_df["student_guid"] == test_key).any():
+        return False, f"{test_desc} - ERROR - student GUID {test_key} in transformed file"
+
+    # Get test record
+    bool_series = (bad_df["stu_id"] == test_key)
+    matching_rows = bad_df[bool_series]
+    if len(matching_rows) == 0:
+        return False, f"{test_desc} - ERROR - student GUID {test_key} not in file"
+
+    # Evaluate test condition
+    student_row = matching_rows.iloc[0]
+    if "stu_id not in students file" in student_row["failure_reasons"]:
+        return True, test_desc
+    else:
+        return False, test_desc
+
+
+def run_transformed_file_tests(transformed_csv_df):
+    """Check main output for successfully cleansed/transformed records"""
+    test_cases = {
+        "tc001_transformed_row_count": tc001_transformed_row_count,
+        "tc002_good_row_all_cols_copied": tc002_good_row_all_cols_copied
+    }
+
+    for test_name, test_func in test_cases.items():
+        passed, test_desc = test_func(transformed_csv_df)
+        test_results.append((test_name, passed, test_desc))
+
+
+def run_bad_data_tests(bad_data_csv_df):
+    """Check records rejected for data quality issues"""
+    test_cases = {
+        "tc501_bad_data_row_count": tc501_bad_data_row_count,
+        "tc502_missing_stu_id_rejected": tc502_missing_stu_id_rejected,
+        "tc503_missing_ethnicity_rejected": tc503_missing_ethnicity_rejected,
+        "tc504_invalid_sexid_code_rejected": tc504_invalid_sexid_code_rejected,
+        "tc505_code_not_in_lookup_rejected": tc505_code_not_in_lookup_rejected
+    }
+
+    for test_name, test_func in test_cases.items():
+        passed, test_desc = test_func(bad_data_csv_df)
+        test_results.append((test_name, passed, test_desc))
+
+
+def run_check_refs_tests(delivery_code: str):
+    """Check --check-refs referential checks against the students file (always runs its own ETL)"""
+    test_cases = {
+        "tc506_orphan_stu_id_rejected_with_check_refs": tc506_orphan_stu_id_rejected_with_check_refs
+    }
+
+    try:
+        transformed_df, bad_data_df = run_check_refs_etl(delivery_code)
+    finally:
+        remove_check_refs_delivery()
+
+    for test_name, test_func in test_cases.items():
+        passed, test_desc = test_func(transformed_df, bad_data_df)
+        test_results.append((test_name, passed, test_desc))
+
+
+def print_results():
+    # build pass/fail result lists (result[1] is boolean returned by each test func)
+    tests_passed = [result for result in test_results if result[1]]
+    tests_failed = [result for result in test_results if not result[1]]
+
+    print(f"{len(tests_failed)} tests failed:")
+    for test in tests_failed:
+        print(f"    {test[0]} ({test[2]}) : FAILED")
+
+    print(f"{len(tests_passed)} tests passed:")
+    for test in tests_passed:
+        print(f"    {test[0]} ({test[2]}) : PASSED")
+
+
+def main():
+    # Set up basic test parameters
+    delivery_code = "22056_20240331"
+    transformed_filename = f"hesa_{delivery_code}_demographics_transformed.csv"
+    bad_data_filename = f"hesa_{delivery_code}_demographics_bad_data.csv"
+
+    # Run ETL process if required
+    if "--run-etl" in sys.argv:
+        run_etl_process("extract_hesa_nn056_demographics.py", delivery_code)
+
+    # Read output files (from script being tested) into DataFrames
+    transformed_df = get_transformed_csv(transformed_filename, delivery_code)
+    bad_data_df = get_bad_data_csv(bad_data_filename, delivery_code)
+
+    # Run test cases against the two DataFrames
+    run_transformed_file_tests(transformed_df)
+    run_bad_data_tests(bad_data_df)
+    run_check_refs_tests(delivery_code)
+    print_results()
+
+
+if __name__ == '__main__':
+    main()
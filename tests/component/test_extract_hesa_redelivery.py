@@ -0,0 +1,124 @@
+import pandas as pd
+import shutil
+import os
+from utils.data_platform_core import get_config
+from flows.hesa_nn056_pipeline import run_script_in_process
+
+config = get_config()
+test_results = []
+
+# Re-delivery of 22056_20240331 under its own code, so the original's outputs are untouched
+SOURCE_DELIVERY_CODE = "22056_20240331"
+DELIVERY_CODE = "22056_29991231"
+
+
+def copy_delivery():
+    """Copies the source delivery's files to the test delivery, renamed for its code."""
+    source_dir = os.path.join(config["deliveries_dir"], SOURCE_DELIVERY_CODE)
+    delivery_dir = os.path.join(config["deliveries_dir"], DELIVERY_CODE)
+    os.makedirs(delivery_dir, exist_ok=True)
+
+    for file_name in os.listdir(source_dir):
+        shutil.copy(os.path.join(source_dir, file_name),
+                    os.path.join(delivery_dir, file_name.replace(SOURCE_DELIVERY_CODE, DELIVERY_CODE)))
+
+
+def remove_delivery():
+    """Removes the test delivery and its output files."""
+    for data_dir in [config["deliveries_dir"], config["transformed_dir"], config["bad_data_dir"]]:
+        shutil.rmtree(os.path.join(data_dir, DELIVERY_CODE), ignore_errors=True)
+
+
+def remove_lookup_code(lookup_name: str, code: str):
+    """Re-delivers a lookup file without one of its codes."""
+    lookup_path = os.path.join(config["deliveries_dir"], DELIVERY_CODE, f"hesa_{DELIVERY_CODE}_lookup_{lookup_name}.csv")
+    lookup_df = pd.read_csv(lookup_path, dtype=str, keep_default_na=False)
+    lookup_df[lookup_df["Code"] != code].to_csv(lookup_path, index=False)
+
+
+def run_extract():
+    """Runs the demographics extract in this process (as the delivery watcher does), returning its exit status."""
+    script_path = os.path.join(config["extract_script_dir"], "extract_hesa_nn056_demographics.py")
+    result = run_script_in_process(config, script_path, [DELIVERY_CODE])
+    return result["returncode"]
+
+
+def get_bad_data_csv():
+    """Returns a DataFrame of the bad data CSV file"""
+    file_path = os.path.join(config['bad_data_dir'], DELIVERY_CODE, f"hesa_{DELIVERY_CODE}_demographics_bad_data.csv")
+    csv_df = pd.read_csv(file_path, dtype=str)
+    return csv_df
+
+
+def tc001_first_run_accepts_code(returncode, bad_df):
+    test_desc = "First run: ethnicity 120 in delivery's lookup, row accepted"
+    test_key = "DA9C5319-3EAE-0B29-BBF8-23E773298398"
+
+    if returncode != 0:
+        return False, f"{test_desc} - ERROR - extract exited {returncode}"
+
+    if (bad_df["stu_id"] == test_key).any():
+        return False, f"{test_desc} - ERROR - student GUID {test_key} in bad data file"
+
+    return True, test_desc
+
+
+def tc002_rerun_rejects_code_removed_from_lookup(returncode, bad_df):
+    test_desc = "Re-run after lookup re-delivered without ethnicity 120: row rejected"
+    test_key = "DA9C5319-3EAE-0B29-BBF8-23E773298398"
+
+    if returncode != 0:
+        return False, f"{test_desc} - ERROR - extract exited {returncode}"
+
+    # Get test record
+    bool_series = (bad_df["stu_id"] == test_key)
+    matching_rows = bad_df[bool_series]
+    if len(matching_rows) == 0:
+        return False, f"{test_desc} - ERROR - student GUID {test_key} not in bad data file"
+
+    # Evaluate test condition (the re-delivered lookup applied, not the one cached by the first run)
+    student_row = matching_rows.iloc[0]
+    if "ethnicity code not in ETHNICITY lookup" in student_row["failure_reasons"]:
+        return True, test_desc
+    else:
+        return False, test_desc
+
+
+def print_results():
+    # build pass/fail result lists (result[1] is boolean returned by each test func)
+    tests_passed = [result for result in test_results if result[1]]
+    tests_failed = [result for result in test_results if not result[1]]
+
+    print(f"{len(tests_failed)} tests failed:")
+    for test in tests_failed:
+        print(f"    {test[0]} ({test[2]}) : FAILED")
+
+    print(f"{len(tests_passed)} tests passed:")
+    for test in tests_passed:
+        print(f"    {test[0]} ({test[2]}) : PASSED")
+
+
+def main():
+    # Always runs its own ETL: both extracts must run in this one process,
+    # as a long-running delivery watcher would run them
+    try:
+        copy_delivery()
+
+        returncode = run_extract()
+        test_results.append(("tc001_first_run_accepts_code",
+                             *tc001_first_run_accepts_code(returncode, get_bad_data_csv())))
+
+        remove_lookup_code("ETHNICITY", "120")
+
+        returncode = run_extract()
+        test_results.append(("tc002_rerun_rejects_code_removed_from_lookup",
+                             *tc002_rerun_rejects_code_removed_from_lookup(returncode, get_bad_data_csv())))
+
+    finally:
+        remove_delivery()
+
+    print_results()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import pandas as pd
 import subprocess
+import shutil
 import os
 import sys
 from utils.data_platform_core import get_config
@@ -32,6 +33,46 @@ def get_bad_data_csv(file_name: str, delivery_code: str):
     return csv_df
 
 
+# --check-refs runs on a copy of the delivery (own code, so the outputs tested above are
+# untouched), with an orphan row: a copy of a good row whose stu_id is not in the students file
+CHECK_REFS_DELIVERY_CODE = "22056_29990101"
+ORPHAN_STU_ID = "0DDBA11E-0000-0000-0000-000000000002"
+
+
+def run_check_refs_etl(source_delivery_code: str):
+    """
+    Copies the delivery, adds an orphan student_programs row and runs the students extract then
+    the student_programs extract with --check-refs. Returns (transformed, bad data) DataFrames.
+    """
+    source_dir = os.path.join(config["deliveries_dir"], source_delivery_code)
+    delivery_dir = os.path.join(config["deliveries_dir"], CHECK_REFS_DELIVERY_CODE)
+    os.makedirs(delivery_dir, exist_ok=True)
+    for file_name in os.listdir(source_dir):
+        shutil.copy(os.path.join(source_dir, file_name),
+                    os.path.join(delivery_dir, file_name.replace(source_delivery_code, CHECK_REFS_DELIVERY_CODE)))
+
+    data_path = os.path.join(delivery_dir, f"hesa_{CHECK_REFS_DELIVERY_CODE}_data_student_programs.csv")
+    data_df = pd.read_csv(data_path, dtype=str, keep_default_na=False)
+    orphan_row = data_df[data_df["stu_id"] == "7ED0CA1F-B4CB-27E3-39DA-71F96D949814"].copy()
+    orphan_row["stu_id"] = ORPHAN_STU_ID
+    pd.concat([data_df, orphan_row]).to_csv(data_path, index=False)
+
+    for script_name, script_args in [("extract_hesa_nn056_students.py", []),
+                                     ("extract_hesa_nn056_student_programs.py", ["--check-refs"])]:
+        subprocess.run(["python3", f"{config['extract_script_dir']}/{script_name}", CHECK_REFS_DELIVERY_CODE] + script_args,
+                       capture_output=True, text=True)
+
+    transformed_df = get_transformed_csv(f"hesa_{CHECK_REFS_DELIVERY_CODE}_student_programs_transformed.csv", CHECK_REFS_DELIVERY_CODE)
+    bad_data_df = get_bad_data_csv(f"hesa_{CHECK_REFS_DELIVERY_CODE}_student_programs_bad_data.csv", CHECK_REFS_DELIVERY_CODE)
+    return transformed_df, bad_data_df
+
+
+def remove_check_refs_delivery():
+    """Removes the --check-refs delivery copy and its output files."""
+    for data_dir in [config["deliveries_dir"], config["transformed_dir"], config["bad_data_dir"]]:
+        shutil.rmtree(os.path.join(data_dir, CHECK_REFS_DELIVERY_CODE), ignore_errors=True)
+
+
 def tc001_transformed_row_count(csv_df):
     test_desc = "Transformed file contains 6 rows"
 
@@ -227,6 +268,27 @@ def tc507_invalid_enrol_date_rejected(bad_df):
         return False, test_desc
 
 
+def tc508_orphan_stu_id_rejected_with_check_refs(transformed_df, bad_df):
+    test_desc = "With --check-refs, stu_id not in students file filtered as bad data"
+    test_key = ORPHAN_STU_ID
+
+    if (transformed_df["student_guid"] == test_key).any():
+        return False, f"{test_desc} - ERROR - student GUID {test_key} in transformed file"
+
+    # Get test record
+    bool_series = (bad_df["stu_id"] == test_key)
+    matching_rows = bad_df[bool_series]
+    if len(matching_rows) == 0:
+        return False, f"{test_desc} - ERROR - student GUID {test_key} not in file"
+
+    # Evaluate test condition
+    student_row = matching_rows.iloc[0]
+    if "stu_id not in students file" in student_row["failure_reasons"]:
+        return True, test_desc
+    else:
+        return False, test_desc
+
+
 def run_transformed_file_tests(transformed_csv_df):
     """Check main output for successfully cleansed/transformed records"""
     test_cases = {
@@ -258,6 +320,22 @@ def run_bad_data_tests(bad_data_csv_df):
         test_results.append((test_name, passed, test_desc))
 
 
+def run_check_refs_tests(delivery_code: str):
+    """Check --check-refs referential checks against the students file (always runs its own ETL)"""
+    test_cases = {
+        "tc508_orphan_stu_id_rejected_with_check_refs": tc508_orphan_stu_id_rejected_with_check_refs
+    }
+
+    try:
+        transformed_df, bad_data_df = run_check_refs_etl(delivery_code)
+    finally:
+        remove_check_refs_delivery()
+
+    for test_name, test_func in test_cases.items():
+        passed, test_desc = test_func(transformed_df, bad_data_df)
+        test_results.append((test_name, passed, test_desc))
+
+
 def print_results():
     # build pass/fail result lists (result[1] is boolean returned by each test func)
     tests_passed = [result for result in test_results if result[1]]
@@ -289,6 +367,7 @@ def main():
     # Run test cases against the two DataFrames
     run_transformed_file_tests(transformed_df)
     run_bad_data_tests(bad_data_df)
+    run_check_refs_tests(delivery_code)
     print_results()
 
 
@@ -1,5 +1,6 @@
 import pandas as pd
 import subprocess
+import shutil
 import os
 import sys
 from utils.data_platform_core import get_config
@@ -32,6 +33,36 @@ def get_bad_data_csv(file_name: str, delivery_code: str):
     csv_df = pd.read_csv(file_path, dtype=str)
     return csv_df
 
+# Other duplicate policies run on a copy of the delivery (own code, so the outputs tested
+# above, from the default keep-first policy, are untouched)
+DUPLICATES_DELIVERY_CODE = "22056_29990102"
+
+
+def run_duplicates_etl(source_delivery_code: str, policy: str):
+    """
+    Copies the delivery and runs the students extract with --duplicates=<policy>.
+    Returns (transformed, bad data) DataFrames.
+    """
+    source_dir = os.path.join(config["deliveries_dir"], source_delivery_code)
+    delivery_dir = os.path.join(config["deliveries_dir"], DUPLICATES_DELIVERY_CODE)
+    os.makedirs(delivery_dir, exist_ok=True)
+    for file_name in os.listdir(source_dir):
+        shutil.copy(os.path.join(source_dir, file_name),
+                    os.path.join(delivery_dir, file_name.replace(source_delivery_code, DUPLICATES_DELIVERY_CODE)))
+
+    subprocess.run(["python3", f"{config['extract_script_dir']}/extract_hesa_nn056_students.py",
+                    DUPLICATES_DELIVERY_CODE, f"--duplicates={policy}"], capture_output=True, text=True)
+
+    transformed_df = get_transformed_csv(f"hesa_{DUPLICATES_DELIVERY_CODE}_students_transformed.csv", DUPLICATES_DELIVERY_CODE)
+    bad_data_df = get_bad_data_csv(f"hesa_{DUPLICATES_DELIVERY_CODE}_students_bad_data.csv", DUPLICATES_DELIVERY_CODE)
+    return transformed_df, bad_data_df
+
+
+def remove_duplicates_delivery():
+    """Removes the delivery copy and its output files."""
+    for data_dir in [config["deliveries_dir"], config["transformed_dir"], config["bad_data_dir"]]:
+        shutil.rmtree(os.path.join(data_dir, DUPLICATES_DELIVERY_CODE), ignore_errors=True)
+
 
 def tc001_transformed_row_count(csv_df):
     test_desc = "Transformed file contains 9 rows"
@@ -152,9 +183,9 @@ def tc006_good_row_all_cols_copied(csv_df):
 
 
 def tc501_bad_data_row_count(bad_df):
-    test_desc = "Bad data file contains 14 rows"
+    test_desc = "Bad data file contains 15 rows"
 
-    if len(bad_df) == 14:
+    if len(bad_df) == 15:
         return True, test_desc
     else:
         return False, test_desc
@@ -439,6 +470,63 @@ def tc516_invalid_dob_rejected(bad_df):
         return False, test_desc
 
 
+def tc517_duplicate_stu_id_rejected(bad_df):
+    test_desc = "Second occurrence of stu_id filtered as bad data (keep-first)"
+    test_key = "FC039F6D-F1A9-653E-5AE2-282AD6B449E5"
+
+    # Get test record
+    bool_series = (bad_df["stu_id"] == test_key)
+    matching_rows = bad_df[bool_series]
+    if len(matching_rows) != 1:
+        return False, f"{test_desc} - ERROR - expected one row for student GUID {test_key}"
+
+    # Evaluate test condition (later row, with different email, is the one rejected)
+    student_row = matching_rows.iloc[0]
+    if ((student_row["email"] == "goodduplicate@second.row") and
+        ("duplicate stu_id" in student_row["failure_reasons"])):
+        return True, test_desc
+    else:
+        return False, test_desc
+
+def tc518_duplicate_stu_id_rejected_keep_last(transformed_df, bad_df):
+    test_desc = "First occurrence of stu_id filtered as bad data (keep-last)"
+    test_key = "FC039F6D-F1A9-653E-5AE2-282AD6B449E5"
+
+    # Get test records
+    bad_rows = bad_df[bad_df["stu_id"] == test_key]
+    transformed_rows = transformed_df[transformed_df["student_guid"] == test_key]
+    if len(bad_rows) != 1 or len(transformed_rows) != 1:
+        return False, f"{test_desc} - ERROR - expected one bad and one transformed row for student GUID {test_key}"
+
+    # Evaluate test condition (earlier row rejected, later row kept)
+    student_row = bad_rows.iloc[0]
+    if ((student_row["email"] == "goodenim.sed@aol.ca") and
+        ("duplicate stu_id (keep-last)" in student_row["failure_reasons"]) and
+        (transformed_rows.iloc[0]["email"] == "goodduplicate@second.row")):
+        return True, test_desc
+    else:
+        return False, test_desc
+
+
+def tc519_duplicate_stu_id_rejected_reject_all(transformed_df, bad_df):
+    test_desc = "Every occurrence of stu_id filtered as bad data (reject-all)"
+    test_key = "FC039F6D-F1A9-653E-5AE2-282AD6B449E5"
+
+    if (transformed_df["student_guid"] == test_key).any():
+        return False, f"{test_desc} - ERROR - student GUID {test_key} in transformed file"
+
+    # Get test records
+    bad_rows = bad_df[bad_df["stu_id"] == test_key]
+    if len(bad_rows) != 2:
+        return False, f"{test_desc} - ERROR - expected two rows for student GUID {test_key}"
+
+    # Evaluate test condition
+    if bad_rows["failure_reasons"].str.contains("duplicate stu_id (reject-all)", regex=False).all():
+        return True, test_desc
+    else:
+        return False, test_desc
+
+
 def run_transformed_file_tests(transformed_csv_df):
     """Check main output for successfully cleansed/transformed records"""
     test_cases = {
@@ -473,13 +561,30 @@ def run_bad_data_tests(bad_data_csv_df):
         "tc513_bad_format_email_rejected": tc513_bad_format_email_rejected,
         "tc514_bad_format_email_rejected": tc514_bad_format_email_rejected,
         "tc515_bad_format_dob_rejected": tc515_bad_format_dob_rejected,
-        "tc516_invalid_dob_rejected": tc516_invalid_dob_rejected
+        "tc516_invalid_dob_rejected": tc516_invalid_dob_rejected,
+        "tc517_duplicate_stu_id_rejected": tc517_duplicate_stu_id_rejected
     }
 
     for test_name, test_func in test_cases.items():
         passed, test_desc = test_func(bad_data_csv_df)
         test_results.append((test_name, passed, test_desc))
 
+def run_duplicate_policy_tests(delivery_code: str):
+    """Check --duplicates policies other than the default (each runs its own ETL)"""
+    test_cases = {
+        "keep-last": ("tc518_duplicate_stu_id_rejected_keep_last", tc518_duplicate_stu_id_rejected_keep_last),
+        "reject-all": ("tc519_duplicate_stu_id_rejected_reject_all", tc519_duplicate_stu_id_rejected_reject_all)
+    }
+
+    for policy, (test_name, test_func) in test_cases.items():
+        try:
+            transformed_df, bad_data_df = run_duplicates_etl(delivery_code, policy)
+        finally:
+            remove_duplicates_delivery()
+
+        passed, test_desc = test_func(transformed_df, bad_data_df)
+        test_results.append((test_name, passed, test_desc))
+
 
 def print_results():
     # build pass/fail result lists (result[1] is boolean returned by each test func)
@@ -508,6 +613,7 @@ def main():
     bad_data_df = get_bad_data_csv(bad_data_filename, delivery_code=delivery_code)
     run_transformed_file_tests(transformed_df)
     run_bad_data_tests(bad_data_df)
+    run_duplicate_policy_tests(delivery_code)
     print_results()
 
 
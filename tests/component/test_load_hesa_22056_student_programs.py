@@ -44,7 +44,8 @@ def main():
                                column_mappings=column_mappings,
                                source_path=source_path,
                                source_table="",
-                               caller_name=this_script_name)
+                               caller_name=this_script_name,
+                               source_entity="student_programs")
     
     table_tester.run_tests()
 
@@ -1,15 +1,24 @@
 """
-This module creates HESA-related load tables for misc static data files
-that are managed by the team and do not originate directly from HESA.
-e.g. delivery list, term code list.
+This module creates and populates dim_date, the calendar date dimension.
+
+By default the table is cleared and rebuilt for the date range. With --extend,
+only dates in the range missing from the table are inserted (existing rows are
+kept), so the dimension can grow to cover new academic years without a rebuild.
+
+Usage:
+    python utils/create_dim_date.py [--start=2000-01-01] [--end=2030-12-31] [--extend]
 """
+import sys
 import mysql.connector
 import traceback
 import mysql.connector.cursor
 import logging
 import pandas as pd
-from datetime import date, timedelta
-from utils.data_platform_core import get_config, set_up_logging, connect_to_db
+from utils.data_platform_core import get_config, set_up_logging, connect_to_db, date_key, get_option_value
+
+# Date range of a full build (also the default range for --extend)
+DEFAULT_START_DATE = "2000-01-01"
+DEFAULT_END_DATE = "2030-12-31"
 
 
 def init():
@@ -36,7 +45,8 @@ def generate_create_statement(table_name):
             weekend TINYINT COMMENT 'Flag indicating if date is a weekend day (1) or weekday (0)',
             first_day_of_month DATE COMMENT 'First day of the month containing this date',
             last_day_of_month DATE COMMENT 'Last day of the month containing this date',
-            PRIMARY KEY (dim_date_key)
+            PRIMARY KEY (dim_date_key),
+            UNIQUE KEY ux_calendar_date (calendar_date) COMMENT 'Fact builds join dates on calendar_date'
             ) COMMENT 'Calendar date dimension for date-based attributes';
             """
 
@@ -84,41 +94,54 @@ def cleardown_table(cursor, table_name):
         raise
 
 
-def generate_dates():
-    """Generate DataFrame containing all datesfrom/to the given dates."""
-    print(f"Generating date range...")
-    start_date: date = date(2000, 1, 1)
-    end_date: date = date(2030, 12, 31)
-    days = (end_date - start_date).days
-
-    date_list = []
-
-    # Build initial dataframe with just the one column
-    for i in range(days):
-        calc_date = start_date + timedelta(days=i)
-        date_list.append(calc_date)
-
-    dates_df = pd.DataFrame(date_list, columns=["calendar_date"])
-    dates_df["calendar_date"] = pd.to_datetime(dates_df["calendar_date"])
-
-    # Generate derivative values (year, month, day, month name, etc)
-    dates_df["dim_date_key"] = "DAT_" + dates_df["calendar_date"].dt.strftime("%Y%m%d")
-    dates_df["day"] = dates_df["calendar_date"].dt.day
-    dates_df["month"] = dates_df["calendar_date"].dt.month
-    dates_df["year"] = dates_df["calendar_date"].dt.year
-    dates_df["day_of_week"] = dates_df["calendar_date"].dt.day_of_week + 1
-    dates_df["day_of_year"] = dates_df["calendar_date"].dt.day_of_year
-    dates_df["week_of_year"] = dates_df["calendar_date"].dt.isocalendar().week
-    dates_df["quarter"] = dates_df["calendar_date"].dt.quarter
-    dates_df["weekend"] = dates_df["calendar_date"].dt.weekday.apply(lambda x: 1 if x >= 5 else 0)
-    dates_df["day_name"] = dates_df["calendar_date"].dt.day_name()
-    dates_df["month_name"] = dates_df["calendar_date"].dt.month_name()
-    dates_df["first_day_of_month"] = dates_df["calendar_date"].apply(lambda x: x.replace(day=1))
-    dates_df["last_day_of_month"] = dates_df["calendar_date"].apply(lambda x: x.replace(day=x.days_in_month))
+def generate_dates(start_date: str = DEFAULT_START_DATE, end_date: str = DEFAULT_END_DATE):
+    """Generate DataFrame containing all dates from/to the given dates (inclusive)."""
+    print(f"Generating date range {start_date} to {end_date}...")
+    calendar_dates = pd.Series(pd.date_range(start_date, end_date, freq="D"))
+
+    # Generate derivative values (year, month, day, month name, etc) a column at a time
+    dates = calendar_dates.dt
+    days_in_month = pd.to_timedelta(dates.days_in_month - 1, unit="D")
+    first_day_of_month = calendar_dates - pd.to_timedelta(dates.day - 1, unit="D")
+
+    dates_df = pd.DataFrame({
+        "calendar_date": dates.date,
+        "dim_date_key": date_key(calendar_dates),
+        "day": dates.day,
+        "month": dates.month,
+        "year": dates.year,
+        "day_of_week": dates.day_of_week + 1,
+        "day_of_year": dates.day_of_year,
+        "week_of_year": dates.isocalendar().week.astype(int),
+        "quarter": dates.quarter,
+        "weekend": (dates.weekday >= 5).astype(int),
+        "day_name": dates.day_name(),
+        "month_name": dates.month_name(),
+        "first_day_of_month": first_day_of_month.dt.date,
+        "last_day_of_month": (first_day_of_month + days_in_month).dt.date})
 
     return dates_df
 
 
+def get_existing_dates(cursor: mysql.connector.cursor.MySQLCursor, table_name, start_date: str, end_date: str):
+    """Returns set of dates in the range already in the table."""
+    cursor.execute(f"""
+        SELECT calendar_date
+        FROM {table_name}
+        WHERE calendar_date BETWEEN %s AND %s
+        """, (start_date, end_date))
+
+    return {row[0] for row in cursor.fetchall()}
+
+
+def remove_existing_dates(dates_df: pd.DataFrame, existing_dates: set):
+    """Returns the dates not already in the table (for --extend)."""
+    missing_df = dates_df[~dates_df["calendar_date"].isin(existing_dates)]
+    print(f"    {len(dates_df) - len(missing_df)} dates already present, {len(missing_df)} to insert")
+
+    return missing_df
+
+
 def insert_dates(cursor: mysql.connector.cursor.MySQLCursor, table_name, dates_df: pd.DataFrame):
     print(f"Inserting dates...")
     df_cols = ["dim_date_key", "calendar_date", "day", "month", "year",
@@ -126,8 +149,8 @@ def insert_dates(cursor: mysql.connector.cursor.MySQLCursor, table_name, dates_d
                "quarter", "weekend", "day_name", "month_name",
                "first_day_of_month", "last_day_of_month"]
     
-    # Build list of tuples containing values for insert
-    insert_values: list = dates_df[df_cols].values.tolist()
+    # Build list of tuples containing values for insert (as objects, so numpy ints become Python ints)
+    insert_values: list = dates_df[df_cols].astype(object).values.tolist()
 
     # Build column name/placeholder strings
     table_cols = df_cols
@@ -146,6 +169,7 @@ def insert_dates(cursor: mysql.connector.cursor.MySQLCursor, table_name, dates_d
         """
     
     cursor.executemany(insert_cmd, insert_values)
+    logging.info(f"Inserted {len(insert_values)} rows into {table_name}")
 
 
 def main():
@@ -154,6 +178,10 @@ def main():
 
     try:
         config = init()
+        start_date = get_option_value("start", DEFAULT_START_DATE)
+        end_date = get_option_value("end", DEFAULT_END_DATE)
+        extend = "--extend" in sys.argv
+
         conn = connect_to_db(config)
         cursor = conn.cursor()
 
@@ -161,8 +189,14 @@ def main():
         create_statement = generate_create_statement(table_name)
 
         create_table(cursor, table_name, create_statement)
-        cleardown_table(cursor, table_name)
-        dates_df = generate_dates()
+        dates_df = generate_dates(start_date, end_date)
+
+        if extend:
+            existing_dates = get_existing_dates(cursor, table_name, start_date, end_date)
+            dates_df = remove_existing_dates(dates_df, existing_dates)
+        else:
+            cleardown_table(cursor, table_name)
+
         insert_dates(cursor, table_name, dates_df)
 
         conn.commit()
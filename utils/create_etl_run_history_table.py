@@ -0,0 +1,91 @@
+"""
+This module creates the pipeline run telemetry table (one row per step
+per run, written by the pipeline at the end of each run).
+"""
+import mysql.connector
+import traceback
+import mysql.connector.cursor
+from utils.data_platform_core import get_config, set_up_logging, connect_to_db
+
+def init():
+    config = get_config()
+    set_up_logging(config)
+
+    return config
+
+
+def generate_create_statements():
+    create_statements = {
+        'etl_run_history':
+            """
+            CREATE TABLE etl_run_history (
+                run_id VARCHAR(36) COMMENT 'Identifies a pipeline run (YYYYMMDD_HHMMSS_<random suffix>)',
+                step_name VARCHAR(100) COMMENT 'Pipeline step, e.g. extract_students_22056_20240331',
+                delivery_code VARCHAR(36) COMMENT 'Delivery processed by the step (NULL if not delivery-specific)',
+                status VARCHAR(10) COMMENT 'Step outcome (succeeded/failed/cached)',
+                started_at DATETIME(3) COMMENT 'Step start timestamp',
+                ended_at DATETIME(3) COMMENT 'Step end timestamp',
+                wall_seconds DECIMAL(12,3) COMMENT 'Elapsed (wall clock) time',
+                cpu_seconds DECIMAL(12,3) COMMENT 'CPU time (user + system), including child processes',
+                peak_rss_kb BIGINT COMMENT 'Peak resident set size of the process running the step',
+                rows_read BIGINT COMMENT 'Rows read by the step',
+                rows_written BIGINT COMMENT 'Rows written by the step (transformed file or table)',
+                rows_rejected BIGINT COMMENT 'Rows rejected by validation (bad data file)',
+                bytes_processed BIGINT COMMENT 'Size of input file(s) processed by the step',
+                load_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT 'Timestamp of insert',
+                INDEX idx_etl_run_history_run (run_id),
+                INDEX idx_etl_run_history_step (step_name, started_at)
+                )
+                COMMENT='Per-step timing and row counts of pipeline runs';
+            """
+    }
+
+    return create_statements
+
+
+def create_table(cursor: mysql.connector.cursor.MySQLCursor, table_name, create_statement):
+    try:
+        cursor.execute(f"""
+            SELECT COUNT(*)
+            FROM information_schema.tables
+            WHERE table_name = '{table_name}'        
+            """)
+        
+        if cursor.fetchone()[0] == 1:
+            print(f"Table {table_name} : already exists")
+        else:
+            cursor.execute(create_statement)            
+            print(f"Table {table_name} : created")
+
+    except mysql.connector.Error as err:
+        print(f"Exception during creation of {table_name}: {err}")
+        raise
+
+
+def main():
+    # Declare here to ensure except/finally work if connection fails
+    conn = None
+
+    try:
+        config = init()
+        conn = connect_to_db(config)
+        cursor = conn.cursor()
+        create_statements = generate_create_statements()
+
+        for table_name, create_statement in create_statements.items():
+            create_table(cursor, table_name, create_statement)
+
+        conn.commit()
+        print("Table creation complete")
+
+    except Exception:
+        traceback.print_exc()
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,8 @@
 This module creates HESA load tables for the 23056_20250331 delivery. For subsequent deliveries
 (e.g. 23056_20250331, 24056) clone this script with new table names. These subsequent sets of
 load tables will need to be added to merge logic for loading the nn056 stage tables.
+
+Superseded by create_hesa_nn056_load_tables.py, which creates any delivery's load tables from a column spec.
 """
 import mysql.connector
 import traceback
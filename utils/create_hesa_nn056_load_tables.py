@@ -0,0 +1,316 @@
+"""
+This module creates (or brings up to date) the HESA load tables of any delivery,
+load_hesa_<delivery_code>_<entity>, from the column spec app_config/load_table_spec.json,
+replacing a cloned create_hesa_<nn>056_load_tables.py script per delivery.
+
+Column types are sized to the data. A column naming a HESA schema spec field
+(e.g. "field": "ETHNIC") takes that field's type from the collection's spec
+(static_dir/SchemaSpecification<collection>.json, e.g. NVARCHAR(3) becomes VARCHAR(3)),
+falling back to its "type" if the collection has no spec. Entities may declare
+a primary key and indexes. Audit columns (load_timestamp, source_file,
+hesa_delivery defaulting to the delivery code) are added to every table.
+
+Existing tables are compared with the spec through information_schema (two
+queries for all of the delivery's tables) and only the differences are applied:
+missing columns added, changed types/nullability/defaults modified, and
+primary keys/indexes added or replaced, in one ALTER TABLE per table. Running
+again with an unchanged spec changes nothing. Columns not in the spec are
+reported but not dropped.
+
+Usage:
+    python utils/create_hesa_nn056_load_tables.py <delivery_code> [--spec=<path>]
+        [--entities=students,lookup_ethnicity] [--dry-run]
+"""
+import os
+import re
+import sys
+import json
+import logging
+import traceback
+import mysql.connector
+import mysql.connector.cursor
+from utils.data_platform_core import get_config, set_up_logging, connect_to_db, get_option_value
+from ingest.core.SchemaValidator import SchemaValidator
+
+
+def init():
+    config = get_config()
+    set_up_logging(config)
+
+    config["delivery_code"] = sys.argv[1]
+    config["spec_path"] = get_option_value("spec", os.path.join(config["base_dir"], "app_config", "load_table_spec.json"))
+    entities = get_option_value("entities")
+    config["entities"] = entities.split(",") if entities else None
+    config["dry_run"] = "--dry-run" in sys.argv
+
+    return config
+
+
+def read_entity_specs(spec_path: str):
+    """Returns {entity: entity spec} from the column spec file, with a lookup_<name> entity per lookup."""
+    with open(spec_path, "r") as spec_file:
+        spec = json.load(spec_file)
+
+    entity_specs = dict(spec["entities"])
+
+    lookups = spec.get("lookups")
+    if lookups:
+        for lookup_name in lookups["names"]:
+            entity_specs[f"lookup_{lookup_name}"] = {**lookups, "comment": lookups["comment"].replace("{LOOKUP_NAME}", lookup_name.upper())}
+
+    return entity_specs
+
+
+def mysql_type(spec_data_type: str):
+    """Returns MySQL column type for a HESA schema spec data type, integers as the smallest type holding their digits."""
+    data_type = spec_data_type.upper().replace(" ", "")
+
+    string_match = re.match(r"^N?VARCHAR\((\d+)\)$", data_type)
+    numeric_match = re.match(r"^(?:NUMERIC|DECIMAL)\((\d+),(\d+)\)$", data_type)
+
+    if string_match:
+        return f"VARCHAR({string_match.group(1)})"
+
+    if numeric_match:
+        precision, scale = int(numeric_match.group(1)), int(numeric_match.group(2))
+        if scale > 0:
+            return f"DECIMAL({precision},{scale})"
+        for max_digits, integer_type in [(2, "TINYINT"), (4, "SMALLINT"), (6, "MEDIUMINT"), (9, "INT")]:
+            if precision <= max_digits:
+                return integer_type
+        return "BIGINT"
+
+    return data_type
+
+
+def get_field_types(config, entity_specs: dict):
+    """
+    Returns {(entity, column): MySQL type} for columns naming a schema spec
+    field, from the delivery's collection spec (compiled and cached by
+    SchemaValidator). Empty if the collection has no spec.
+    """
+    collection_ref = config["delivery_code"].split("_")[0]
+    field_mappings = {(entity, column): column_spec["field"]
+                      for entity, entity_spec in entity_specs.items()
+                      for column, column_spec in entity_spec["columns"].items() if "field" in column_spec}
+
+    # SchemaValidator keys rules by column name, so map each (entity, column) through a unique name
+    column_keys = {f"{entity}.{column}": (entity, column) for entity, column in field_mappings}
+    schema_validator = SchemaValidator(config, collection_ref,
+                                       {key: field_mappings[entity_column] for key, entity_column in column_keys.items()})
+
+    return {column_keys[key]: mysql_type(rule["data_type"]) for key, rule in schema_validator.column_rules.items()}
+
+
+def build_table_spec(delivery_code: str, entity: str, entity_spec: dict, field_types: dict):
+    """Returns table definition: name, comment, columns [{name, type, nullable, default, comment}], primary key, indexes."""
+    primary_key = entity_spec.get("primary_key", [])
+
+    columns = []
+    for column, column_spec in entity_spec["columns"].items():
+        columns.append({"name": column,
+                        "type": field_types.get((entity, column), column_spec["type"]).upper(),
+                        "nullable": column not in primary_key and column_spec.get("nullable", True),
+                        "default": None,
+                        "comment": column_spec.get("comment")})
+
+    # Audit columns, set on insert (source_file by the loaders)
+    columns += [{"name": "load_timestamp", "type": "DATETIME", "nullable": True, "default": "CURRENT_TIMESTAMP", "comment": "Timestamp of insert"},
+                {"name": "source_file", "type": "VARCHAR(100)", "nullable": True, "default": None, "comment": "File from which data was loaded"},
+                {"name": "hesa_delivery", "type": "VARCHAR(20)", "nullable": True, "default": f"'{delivery_code}'", "comment": "Originating HESA delivery"}]
+
+    indexes = {"ix_" + "_".join(index_columns): index_columns for index_columns in entity_spec.get("indexes", [])}
+
+    return {"table_name": f"load_hesa_{delivery_code}_{entity}",
+            "comment": entity_spec.get("comment"),
+            "columns": columns,
+            "primary_key": primary_key,
+            "indexes": indexes}
+
+
+def quote(text: str):
+    return "'" + text.replace("'", "''") + "'"
+
+
+def column_definition(column: dict):
+    """Returns column definition SQL, e.g. "email VARCHAR(254) COMMENT '...'"."""
+    definition = f"{column['name']} {column['type']}"
+    if not column["nullable"]:
+        definition += " NOT NULL"
+    if column["default"] is not None:
+        definition += f" DEFAULT {column['default']}"
+    if column["comment"]:
+        definition += f" COMMENT {quote(column['comment'])}"
+
+    return definition
+
+
+def generate_create_statement(table_spec: dict):
+    definitions = [column_definition(column) for column in table_spec["columns"]]
+    if table_spec["primary_key"]:
+        definitions.append(f"PRIMARY KEY ({', '.join(table_spec['primary_key'])})")
+    for index_name, index_columns in table_spec["indexes"].items():
+        definitions.append(f"INDEX {index_name} ({', '.join(index_columns)})")
+
+    create_statement = f"CREATE TABLE {table_spec['table_name']} (\n    " + ",\n    ".join(definitions) + "\n)"
+    if table_spec["comment"]:
+        create_statement += f" COMMENT={quote(table_spec['comment'])}"
+
+    return create_statement
+
+
+def get_existing_tables(cursor: mysql.connector.cursor.MySQLCursor, table_names: list):
+    """
+    Returns {table name: {"columns": {name: {type, nullable, default}} (in column order),
+    "indexes": {name: [columns]}}} for those of the tables that exist, from
+    information_schema (one query for columns, one for indexes).
+    """
+    placeholders = ", ".join(["%s"] * len(table_names))
+    existing = {}
+
+    cursor.execute(f"""
+        SELECT table_name, column_name, column_type, is_nullable, column_default
+        FROM information_schema.columns
+        WHERE table_schema = DATABASE()
+            AND table_name IN ({placeholders})
+        ORDER BY table_name, ordinal_position
+        """, table_names)
+    for table_name, column_name, column_type, is_nullable, column_default in cursor.fetchall():
+        table = existing.setdefault(table_name, {"columns": {}, "indexes": {}})
+        table["columns"][column_name] = {"type": column_type, "nullable": is_nullable == "YES", "default": column_default}
+
+    cursor.execute(f"""
+        SELECT table_name, index_name, column_name
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE()
+            AND table_name IN ({placeholders})
+        ORDER BY table_name, index_name, seq_in_index
+        """, table_names)
+    for table_name, index_name, column_name in cursor.fetchall():
+        existing[table_name]["indexes"].setdefault(index_name, []).append(column_name)
+
+    return existing
+
+
+def normalise_type(column_type: str):
+    """Returns column type comparable with information_schema's (lower case, no integer display width)."""
+    column_type = column_type.lower().replace(" ", "")
+    return re.sub(r"^(tinyint|smallint|mediumint|int|bigint)\(\d+\)", r"\1", column_type)
+
+
+def normalise_default(default):
+    """Returns column default comparable with information_schema's (unquoted)."""
+    return None if default is None else str(default).strip("'")
+
+
+def generate_alter_clauses(table_spec: dict, existing_table: dict):
+    """Returns ALTER TABLE clauses bringing an existing table in line with its spec (empty if up to date)."""
+    clauses = []
+    existing_columns = existing_table["columns"]
+    previous_column = None
+
+    for column in table_spec["columns"]:
+        existing_column = existing_columns.get(column["name"])
+        position = f"AFTER {previous_column}" if previous_column else "FIRST"
+
+        if existing_column is None:
+            clauses.append(f"ADD COLUMN {column_definition(column)} {position}")
+        elif (normalise_type(column["type"]) != normalise_type(existing_column["type"])
+              or column["nullable"] != existing_column["nullable"]
+              or normalise_default(column["default"]) != normalise_default(existing_column["default"])):
+            clauses.append(f"MODIFY COLUMN {column_definition(column)}")
+
+        previous_column = column["name"]
+
+    spec_column_names = [column["name"] for column in table_spec["columns"]]
+    extra_columns = [name for name in existing_columns if name not in spec_column_names]
+    if extra_columns:
+        logging.warning(f"{table_spec['table_name']} has columns not in spec (not dropped): {extra_columns}")
+
+    # Primary key and indexes: drop those differing from the spec, add those missing
+    existing_indexes = existing_table["indexes"]
+    existing_primary_key = existing_indexes.get("PRIMARY", [])
+    if existing_primary_key != table_spec["primary_key"]:
+        if existing_primary_key:
+            clauses.append("DROP PRIMARY KEY")
+        if table_spec["primary_key"]:
+            clauses.append(f"ADD PRIMARY KEY ({', '.join(table_spec['primary_key'])})")
+
+    for index_name, index_columns in table_spec["indexes"].items():
+        if existing_indexes.get(index_name) == index_columns:
+            continue
+        if index_name in existing_indexes:
+            clauses.append(f"DROP INDEX {index_name}")
+        clauses.append(f"ADD INDEX {index_name} ({', '.join(index_columns)})")
+
+    return clauses
+
+
+def apply_table_spec(cursor: mysql.connector.cursor.MySQLCursor, table_spec: dict, existing_table: dict, dry_run: bool):
+    """Creates the table, or alters it to match its spec. Returns the statement run (None if up to date)."""
+    table_name = table_spec["table_name"]
+
+    if existing_table is None:
+        statement = generate_create_statement(table_spec)
+        action = "created"
+    else:
+        clauses = generate_alter_clauses(table_spec, existing_table)
+        if not clauses:
+            print(f"Table {table_name} : up to date")
+            return None
+        statement = f"ALTER TABLE {table_name}\n    " + ",\n    ".join(clauses)
+        action = f"altered ({len(clauses)} changes)"
+
+    if dry_run:
+        print(f"{statement};\n")
+        return statement
+
+    try:
+        cursor.execute(statement)
+        print(f"Table {table_name} : {action}")
+        logging.info(f"Table {table_name} {action}: {statement}")
+
+    except mysql.connector.Error as err:
+        print(f"Exception during creation of {table_name}: {err}")
+        raise
+
+    return statement
+
+
+def main():
+    # Declare here to ensure except/finally work if connection fails
+    conn = None
+
+    try:
+        config = init()
+
+        entity_specs = read_entity_specs(config["spec_path"])
+        if config["entities"]:
+            entity_specs = {entity: spec for entity, spec in entity_specs.items() if entity in config["entities"]}
+
+        field_types = get_field_types(config, entity_specs)
+        table_specs = [build_table_spec(config["delivery_code"], entity, entity_spec, field_types)
+                       for entity, entity_spec in entity_specs.items()]
+
+        conn = connect_to_db(config)
+        cursor = conn.cursor()
+
+        existing_tables = get_existing_tables(cursor, [table_spec["table_name"] for table_spec in table_specs])
+        for table_spec in table_specs:
+            apply_table_spec(cursor, table_spec, existing_tables.get(table_spec["table_name"]), config["dry_run"])
+
+        conn.commit()
+        print("Table creation complete")
+
+    except Exception:
+        traceback.print_exc()
+        if conn:
+            conn.rollback()
+        sys.exit(1)
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+This module creates the consolidated HESA load tables used when app config
+load_layout is 'partitioned': one table per entity (load_hesa_nn056_<entity>)
+for all deliveries, LIST partitioned by hesa_delivery, rather than a set of
+tables per delivery (create_hesa_22056_load_tables.py etc).
+
+Tables are created with a partition per delivery found under deliveries_dir;
+partitions for later deliveries are added as they are loaded (see LoadTableLayout).
+
+LIST COLUMNS partitioning is used rather than KEY, so each delivery has its
+own named partition (p_<delivery>) to exchange or prune to; KEY would hash
+several deliveries into each partition.
+"""
+import sys
+import traceback
+import mysql.connector
+import mysql.connector.cursor
+from utils.data_platform_core import get_config, set_up_logging, connect_to_db
+from ingest.core.DeliveryRegistry import DeliveryRegistry
+from ingest.core.LoadTableLayout import LoadTableLayout
+
+LOOKUP_NAMES = ["disability", "ethnicity", "genderid", "religion", "sexid", "sexort", "trans",
+                "z_ethnicgrp1", "z_ethnicgrp2", "z_ethnicgrp3"]
+
+
+def init():
+    config = get_config()
+    set_up_logging(config)
+
+    return config
+
+
+def generate_partitions(delivery_codes: list):
+    """Returns PARTITION BY clause with a partition per delivery."""
+    partitions = ",\n                ".join(
+        f"PARTITION {LoadTableLayout.partition_name(delivery_code)} VALUES IN ('{delivery_code}')"
+        for delivery_code in delivery_codes)
+
+    return f"""
+            PARTITION BY LIST COLUMNS (hesa_delivery) (
+                {partitions}
+            )"""
+
+
+def generate_create_statements(delivery_codes: list):
+    partitions = generate_partitions(delivery_codes)
+
+    # hesa_delivery is NOT NULL without default: loads set it, so rows always match a partition
+    create_statements = {
+        'load_hesa_nn056_students':
+            f"""
+            CREATE TABLE load_hesa_nn056_students (
+                student_guid CHAR(36),
+                first_names VARCHAR(250),
+                last_name VARCHAR(250),
+                phone VARCHAR(250),
+                email VARCHAR(250),
+                home_addr VARCHAR(250),
+                home_postcode VARCHAR(50),
+                home_country VARCHAR(100),
+                term_addr VARCHAR(250),
+                term_postcode VARCHAR(50),
+                term_country VARCHAR(100),
+                dob DATE,
+                load_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT 'Timestamp of insert',
+                source_file VARCHAR(250) COMMENT 'File from which data was loaded',
+                hesa_delivery VARCHAR(20) NOT NULL COMMENT 'Originating HESA delivery (partition key)'
+                )
+                COMMENT='Student records, partitioned by delivery'{partitions};
+            """,
+        'load_hesa_nn056_student_programs':
+            f"""
+            CREATE TABLE load_hesa_nn056_student_programs (
+                student_guid CHAR(36) COMMENT 'Source system student id',
+                email VARCHAR(250) COMMENT 'Student email, included here only for data verification',
+                program_guid CHAR(36) COMMENT 'Vendor-provided unique id for program of study',
+                program_code VARCHAR(10) COMMENT 'Human-readable, unique code for the program of study',
+                program_name VARCHAR(100) COMMENT 'The program name that will appear on award certificate',
+                enrol_date DATE COMMENT 'Date on which student enrolled for the academic session',
+                fees_paid CHAR(1) COMMENT 'Indicates whether fees have been paid for the academic session',
+                load_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT 'Timestamp of insert',
+                source_file VARCHAR(250) COMMENT 'File from which data was loaded',
+                hesa_delivery VARCHAR(20) NOT NULL COMMENT 'Originating HESA delivery (partition key)'
+                )
+                COMMENT='Student-program links combined with program details, partitioned by delivery'{partitions};
+            """,
+        'load_hesa_nn056_demographics':
+            f"""
+            CREATE TABLE load_hesa_nn056_demographics (
+                student_guid CHAR(36),
+                ethnicity VARCHAR(3),
+                gender VARCHAR(3),
+                religion VARCHAR(3),
+                sexid VARCHAR(3),
+                sexort VARCHAR(3),
+                trans VARCHAR(3),
+                ethnicity_grp1 VARCHAR(3),
+                ethnicity_grp2 VARCHAR(3),
+                ethnicity_grp3 VARCHAR(3),
+                load_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT 'Timestamp of insert',
+                source_file VARCHAR(250) COMMENT 'File from which data was loaded',
+                hesa_delivery VARCHAR(20) NOT NULL COMMENT 'Originating HESA delivery (partition key)'
+                )
+                COMMENT='Demographic information per student, partitioned by delivery'{partitions};
+            """,
+    }
+
+    for lookup_name in LOOKUP_NAMES:
+        create_statements[f'load_hesa_nn056_lookup_{lookup_name}'] = f"""
+            CREATE TABLE load_hesa_nn056_lookup_{lookup_name} (
+                code VARCHAR(5) COMMENT 'HESA-internal lookup code',
+                label VARCHAR(400) COMMENT 'Description for lookup code',
+                load_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT 'Timestamp of insert',
+                source_file VARCHAR(250) COMMENT 'File from which data was loaded',
+                hesa_delivery VARCHAR(20) NOT NULL COMMENT 'Originating HESA delivery (partition key)'
+                )
+                COMMENT='HESA-provided lookup for {lookup_name.upper()} codes, partitioned by delivery'{partitions};
+            """
+
+    return create_statements
+
+
+def create_table(cursor: mysql.connector.cursor.MySQLCursor, table_name, create_statement):
+    try:
+        cursor.execute(f"""
+            SELECT COUNT(*)
+            FROM information_schema.tables
+            WHERE table_schema = DATABASE()
+                AND table_name = '{table_name}'
+            """)
+
+        if cursor.fetchone()[0] == 1:
+            print(f"Table {table_name} : already exists")
+        else:
+            cursor.execute(create_statement)
+            print(f"Table {table_name} : created")
+
+    except mysql.connector.Error as err:
+        print(f"Exception during creation of {table_name}: {err}")
+        raise
+
+
+def main():
+    # Declare here to ensure except/finally work if connection fails
+    conn = None
+
+    try:
+        config = init()
+
+        # LIST partitioning needs at least one partition
+        delivery_codes = DeliveryRegistry(config).get_delivery_codes()
+        if not delivery_codes:
+            print(f"No deliveries found under {config['deliveries_dir']}, tables not created")
+            sys.exit(1)
+
+        conn = connect_to_db(config)
+        cursor = conn.cursor()
+
+        create_statements = generate_create_statements(delivery_codes)
+        for table_name, create_statement in create_statements.items():
+            create_table(cursor, table_name, create_statement)
+
+        conn.commit()
+        print("Table creation complete")
+
+    except Exception:
+        traceback.print_exc()
+        if conn:
+            conn.rollback()
+        sys.exit(1)
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,10 @@ ETL utility module providing core functions for HESA data warehouse, including:
         - Logging setup and configuration
         - Database connection handling
         - Host IP retrieval for WSL2 environments
-        - Date validation utilities
+        - Date validation utilities and dim_date keys
+        - Command-line option parsing
+        - Worker process pool sizing (for parallelised transforms)
+        - Step row/byte counts reporting (for pipeline run telemetry)
 """
 import logging
 import os
@@ -15,9 +18,25 @@ import subprocess
 import time
 import mysql.connector
 from mysql.connector import errorcode
+from mysql.connector import pooling
 from dotenv import load_dotenv
 from datetime import datetime
 
+# Per-process state, shared by steps run in-process (e.g. by the pipeline)
+_loaded_configs = {}
+_log_handlers = {}
+_connection_pool = None
+
+# Prefix of the stdout line on which a step reports its counts to the pipeline
+STEP_COUNTS_PREFIX = "ETL_STEP_COUNTS "
+
+# Environment variable by which the pipeline sizes each step's worker process pool
+POOL_PROCESSES_VAR = "ETL_POOL_PROCESSES"
+
+# dim_date key: prefix plus date as YYYYMMDD (same format in strftime and MySQL DATE_FORMAT)
+DATE_KEY_PREFIX = "DAT_"
+DATE_KEY_FORMAT = "%Y%m%d"
+
 
 def get_windows_host_ip():
     """Retrieves Windows host IP address (WSL2 loopback address)."""
@@ -62,6 +81,9 @@ def get_config():
         - data directories
 
     Expects to find main config filepath in .env file in project root.
+
+    Config is built once per process (per set of environment variables),
+    each caller receiving its own copy to add process-specific entries.
     """
     try:
         # 0. Create flat config dictionary (to contain working directories)
@@ -80,6 +102,12 @@ def get_config():
         data_dir = os.getenv("DATA_DIR")
         log_dir = os.getenv("LOG_DIR")
         config_file_path = os.getenv("CONFIG_FILE")
+
+        config_key = (base_dir, data_dir, log_dir, config_file_path,
+                      os.getenv("DB_HOST"), os.getenv("DB_PORT"), os.getenv("DB_USER"), os.getenv("DB_NAME"))
+        if config_key in _loaded_configs:
+            return dict(_loaded_configs[config_key])
+
         print(f"using config file: {config_file_path}")
 
         # 2. Load main config file (contains nested, relative directories)
@@ -99,11 +127,17 @@ def get_config():
         config["transformed_dir"] = os.path.join(data_dir, json_config["paths"]["transformed_data"])
         config["expected_dir"] = os.path.join(data_dir, json_config["paths"]["expected_data"])
         config["static_dir"] = os.path.join(data_dir, json_config["paths"]["static_data"])
+        config["cache_dir"] = os.path.join(data_dir, json_config["paths"]["cache"])
 
         # 7. Declare script directories
+        config["base_dir"] = base_dir
         config["extract_script_dir"] = os.path.join(scripts_path, json_config["paths"]["extract_scripts"])
         config["load_script_dir"] = os.path.join(scripts_path, json_config["paths"]["load_scripts"])
         config["dbt_project_dir"] = dbt_path
+        config["dbt_target_dir"] = os.path.join(data_dir, json_config["paths"]["dbt_target"])
+
+        # 8. Declare load table layout (per_delivery or partitioned, see LoadTableLayout)
+        config["load_layout"] = json_config.get("load_layout", "per_delivery")
 
         # Get database settings
 #        config["db_host_ip"] = get_windows_host_ip() # only for windows-hosted MySQL connecting from WSL2
@@ -113,8 +147,9 @@ def get_config():
         config["db_user"] = os.getenv("DB_USER")
         config["db_pwd"] = os.getenv("DB_PWD")
         config["db_name"] = os.getenv("DB_NAME")
-        
-        return config
+
+        _loaded_configs[config_key] = config
+        return dict(config)
 
     except Exception as e:
         # As logging hasn't yet been set up, write config error to stderr
@@ -126,6 +161,9 @@ def set_up_logging(config, script_name=None):
     """
     Sets up logging (two logs: a 'main' and a 'warnings and upwards').
     Helper function for get_config().
+
+    Log file handlers are opened once per process and log directory, later
+    calls only changing the script name in the log format.
     """
     try:
         os.makedirs(config["log_dir"], exist_ok=True)
@@ -136,22 +174,26 @@ def set_up_logging(config, script_name=None):
         else:
             log_format = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 
-        info_log_file = os.path.join(config["log_dir"], "etl_info.log")
-        error_log_file = os.path.join(config["log_dir"], "etl_error.log")
+        if config["log_dir"] not in _log_handlers:
+            info_log_file = os.path.join(config["log_dir"], "etl_info.log")
+            error_log_file = os.path.join(config["log_dir"], "etl_error.log")
 
-        info_handler = logging.FileHandler(info_log_file, mode="a")
-        info_handler.setLevel(logging.INFO)
-        info_handler.setFormatter(log_format)
+            info_handler = logging.FileHandler(info_log_file, mode="a")
+            info_handler.setLevel(logging.INFO)
+
+            error_handler = logging.FileHandler(error_log_file, mode="a")
+            error_handler.setLevel(logging.WARNING)
 
-        error_handler = logging.FileHandler(error_log_file, mode="a")
-        error_handler.setLevel(logging.WARNING)
+            _log_handlers[config["log_dir"]] = (info_handler, error_handler)
+
+        info_handler, error_handler = _log_handlers[config["log_dir"]]
+        info_handler.setFormatter(log_format)
         error_handler.setFormatter(log_format)
 
         # Get root logger and clear any existing handlers
         root_logger = logging.getLogger()
-        if root_logger.handlers:
-            for handler in root_logger.handlers:
-                root_logger.removeHandler(handler)
+        for handler in list(root_logger.handlers):
+            root_logger.removeHandler(handler)
 
         # Set level and add handlers
         root_logger.setLevel(logging.INFO)  # threshold for logging
@@ -163,9 +205,31 @@ def set_up_logging(config, script_name=None):
         raise
 
 
+def enable_connection_pool(config, pool_size=5):
+    """
+    Creates a per-process MySQL connection pool. Once enabled, connect_to_db
+    hands out pooled connections, whose close() returns them to the pool,
+    so steps run in the same process share connections.
+    """
+    global _connection_pool
+
+    if _connection_pool is None:
+        _connection_pool = pooling.MySQLConnectionPool(
+            pool_name="etl_pool",
+            pool_size=pool_size,
+            host=config["db_host_ip"],
+            port=config["db_port"],
+            user=config["db_user"],
+            password=config["db_pwd"],
+            database=config["db_name"]
+        )
+        logging.info(f"Created connection pool ({pool_size}) for db: {config['db_name']} host: {config['db_host_ip']}")
+
+
 def connect_to_db(config, max_attempts=20, retry_delay=1):
     """
     Connects to MySQL database with retry logic
+    (or takes a connection from the pool, if enable_connection_pool was called)
     
     Args:
         config: Dictionary with DB connection parameters
@@ -175,6 +239,9 @@ def connect_to_db(config, max_attempts=20, retry_delay=1):
     Returns:
         Connection object or raises exception after max attempts
     """
+    if _connection_pool is not None:
+        return _connection_pool.get_connection()
+
     attempt=0
 
     while attempt < max_attempts:
@@ -228,3 +295,57 @@ def is_valid_date(date_str):
         return True
     except ValueError:
         return False
+
+
+def date_key(calendar_date):
+    """
+    Returns the dim_date key of a date ('DAT_YYYYMMDD'), derived from the date
+    alone so no dim_date lookup is needed (as DBT macro date_key). Accepts a
+    date/datetime, a 'YYYY-MM-DD' string, or a pandas datetime Series (returning
+    a Series of keys). Missing dates give None (NaN in a Series).
+    """
+    if hasattr(calendar_date, "dt"):
+        return DATE_KEY_PREFIX + calendar_date.dt.strftime(DATE_KEY_FORMAT)
+
+    if calendar_date is None or calendar_date == "":
+        return None
+    if isinstance(calendar_date, str):
+        calendar_date = datetime.strptime(calendar_date, "%Y-%m-%d")
+
+    return DATE_KEY_PREFIX + calendar_date.strftime(DATE_KEY_FORMAT)
+
+
+def get_option_value(option_name, default=None):
+    """
+    Returns value of a '--<option_name>=<value>' command-line option,
+    or default if the option was not given (e.g. --duplicates=keep-last).
+    """
+    option_prefix = f"--{option_name}="
+    for arg in sys.argv:
+        if arg.startswith(option_prefix):
+            return arg[len(option_prefix):]
+
+    return default
+
+
+def get_pool_processes():
+    """
+    Returns the number of worker processes for a step's multiprocessing Pool:
+    from a '--processes=N' option, else environment variable ETL_POOL_PROCESSES
+    (set by the pipeline to share CPUs between concurrent steps), else None
+    (i.e. Pool's default of one per CPU).
+    """
+    processes = get_option_value("processes", os.getenv(POOL_PROCESSES_VAR))
+    return max(1, int(processes)) if processes else None
+
+
+def report_step_counts(rows_read=0, rows_written=0, rows_rejected=0, bytes_processed=0):
+    """
+    Prints a step's row/byte counts as one JSON line on stdout, from which
+    the pipeline picks them up for its run telemetry (see RunTelemetry).
+    """
+    counts = {"rows_read": int(rows_read),
+              "rows_written": int(rows_written),
+              "rows_rejected": int(rows_rejected),
+              "bytes_processed": int(bytes_processed)}
+    print(f"{STEP_COUNTS_PREFIX}{json.dumps(counts)}")
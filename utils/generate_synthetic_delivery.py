@@ -0,0 +1,424 @@
+"""
+Utility script generating a synthetic HESA delivery for load testing:
+students, demographics and student_programs data files, lookup files and
+a delivery manifest, written to deliveries_dir/<delivery_code>.
+
+Data is generated with vectorised NumPy operations, chunk by chunk, so any
+size from 10k to 50M+ students can be written in bounded memory. Files are
+internally consistent (demographics and programs reference the students,
+emails match, ethnicity groups follow ethnicity). Codes are taken from the
+template delivery's lookups (and the collection's schema spec, if any).
+
+Output is deterministic for a given seed and chunk size. A fraction of
+rows can be made dirty for each validation rule of the extract scripts
+(see DIRTY_RULES); counts of dirty rows per rule are recorded in the
+manifest under "synthetic".
+
+Usage:
+    python utils/generate_synthetic_delivery.py <delivery_code> --rows=N
+        [--seed=N] [--template=<delivery code>] [--chunk-size=N]
+        [--second-program-rate=R] [--dirty-rate=R]
+        [--dirty=<rule>:<rate>,<rule>:<rate>,...]
+    e.g. python utils/generate_synthetic_delivery.py 22056_20990101 --rows=1000000 --seed=42 --dirty-rate=0.01
+"""
+import os
+import sys
+import json
+import shutil
+import logging
+from functools import reduce
+import numpy as np
+import pandas as pd
+from utils.data_platform_core import get_config, set_up_logging, get_option_value
+from ingest.core.SchemaValidator import SchemaValidator
+from ingest.core.LookupIndex import LookupIndex
+
+# Validation rules of the extract scripts that rows can be made to fail (rule: description)
+DIRTY_RULES = {
+    "students.missing_home_addr": "home address, postcode or country blank",
+    "students.missing_term_addr": "term address, postcode or country blank",
+    "students.missing_required": "stu_id, phone, email, name or dob blank",
+    "students.bad_email": "email without '@'",
+    "students.bad_format_dob": "dob not yyyy-mm-dd",
+    "students.invalid_dob": "dob yyyy-mm-dd but not a real date",
+    "students.duplicate_stu_id": "stu_id of another student",
+    "demographics.missing_required": "a demographics column blank",
+    "demographics.invalid_code": "a code not in schema spec/lookups",
+    "demographics.orphan_stu_id": "stu_id not in students file",
+    "student_programs.missing_required": "a mandatory column blank",
+    "student_programs.bad_format_enrol_date": "enrol date not yyyy-mm-dd",
+    "student_programs.invalid_enrol_date": "enrol date yyyy-mm-dd but not a real date",
+    "student_programs.bad_fees_flag": "fees_paid not y/n",
+    "student_programs.orphan_stu_id": "stu_id not in students file",
+    "student_programs.program_id_too_long": "program_id over 50 chars (schema spec)",
+}
+
+# Lookup (and schema spec field) for each coded demographics column
+DEMOGRAPHIC_CODES = {"ethnicity": "ETHNICITY", "gender": "GENDERID", "religion": "RELIGION",
+                     "sexid": "SEXID", "sexort": "SEXORT", "trans": "TRANS"}
+SCHEMA_FIELDS = {"ethnicity": "ETHNIC", "gender": "GENDERID", "religion": "RELIGION",
+                 "sexid": "SEXID", "sexort": "SEXORT", "trans": "TRANS"}
+
+FIRST_NAMES = np.array(["Amara", "Ben", "Chloe", "Dev", "Emeka", "Fatima", "George", "Hana", "Isla", "Jamal",
+                        "Kai", "Leah", "Mohammed", "Niamh", "Oliver", "Priya", "Quinn", "Rhys", "Sofia", "Tom",
+                        "Uma", "Viktor", "Wei", "Xander", "Yusuf", "Zara", "Mary Jane", "Jean Paul"])
+LAST_NAMES = np.array(["Adeyemi", "Brown", "Chen", "Davies", "Evans", "Fraser", "Gallagher", "Hughes", "Iqbal",
+                       "Jones", "Khan", "Lewis", "Murphy", "Nowak", "O'Brien", "Patel", "Roberts", "Singh",
+                       "Smith", "Taylor", "Walker", "Williams", "Wilson", "Wright"])
+STREETS = np.array(["High Street", "Station Road", "Church Lane", "Park Avenue", "Mill Road", "Victoria Street",
+                    "Green Lane", "Manor Way", "Queens Road", "Kings Crescent"])
+TOWNS = np.array(["Leeds", "Cardiff", "Glasgow", "Belfast", "Bristol", "Norwich", "Lagos", "Mumbai", "Toronto", "Lyon"])
+COUNTRIES = np.array(["United Kingdom", "United Kingdom", "United Kingdom", "Ireland", "India", "China",
+                      "Nigeria", "France", "Canada", "Malaysia"])
+LETTERS = np.array(list("ABCDEFGHJKLMNPRSTUWYZ"))
+SUBJECTS = np.array(["Computer Science", "English Literature", "History", "Mathematics", "Nursing", "Law",
+                     "Economics", "Physics", "Psychology", "Architecture"])
+AWARDS = np.array(["BSc", "BA", "MSc", "MA", "LLB"])
+
+
+def concat(*parts):
+    """Concatenates string arrays (and scalars) element-wise."""
+    return reduce(np.char.add, [np.asarray(part).astype(str) for part in parts])
+
+
+def random_guids(rng: np.random.Generator, count: int):
+    """Returns array of random upper-case GUIDs (8-4-4-4-12 hex digits)."""
+    hex_chars = np.frombuffer(rng.bytes(count * 16).hex().upper().encode(), dtype="S1").reshape(count, 32)
+    dash = np.full((count, 1), b"-", dtype="S1")
+    guid_chars = np.hstack([hex_chars[:, :8], dash, hex_chars[:, 8:12], dash, hex_chars[:, 12:16],
+                            dash, hex_chars[:, 16:20], dash, hex_chars[:, 20:]])
+    return np.ascontiguousarray(guid_chars).view("S36").ravel().astype("U36")
+
+
+def random_dates(rng: np.random.Generator, count: int, start: str, end: str):
+    """Returns array of random yyyy-mm-dd dates between start and end."""
+    start_date = np.datetime64(start)
+    days = (np.datetime64(end) - start_date).astype(int)
+    return (start_date + rng.integers(0, days, count)).astype("U10")
+
+
+def digits(rng: np.random.Generator, count: int, width: int):
+    """Returns array of random zero-padded digit strings."""
+    return np.char.zfill(rng.integers(0, 10 ** width, count).astype(str), width)
+
+
+def derive_ethnic_groups(label: str):
+    """Returns (Z_ETHNICGRP1, Z_ETHNICGRP2, Z_ETHNICGRP3) codes for an ethnicity lookup label."""
+    label = label.lower()
+    if "not known" in label or "prefer not" in label or "not available" in label:
+        return "Z9", "Z9", "Z9"
+
+    asian_groups = {"bangladeshi": "01", "chinese": "02", "indian": "03", "pakistani": "04"}
+    if "asian" in label and "mixed" not in label:
+        grp3 = next((code for name, code in asian_groups.items() if name in label), "05")
+        return "01", "01", grp3
+    if "black" in label and "mixed" not in label:
+        grp3 = "06" if "african" in label else "07" if "caribbean" in label else "08"
+        return "01", "02", grp3
+    if "mixed" in label:
+        return "01", "03", "09"
+    if "white" in label:
+        return "02", "04", "10"
+    return "01", "05", "11"
+
+
+def get_code_lists(config, template_code: str, collection_ref: str):
+    """
+    Returns ({column: array of valid codes}, ethnic groups {column: array aligned to ethnicity codes}).
+    Codes are those in the template's lookups, and in the collection's schema spec if there is one.
+    """
+    lookups = LookupIndex(config, template_code, DEMOGRAPHIC_CODES).lookups
+    schema_rules = SchemaValidator(config, collection_ref, SCHEMA_FIELDS).column_rules
+
+    code_lists = {}
+    for col, lookup_name in DEMOGRAPHIC_CODES.items():
+        codes = sorted(lookups[lookup_name])
+        valid_entries = schema_rules.get(col, {}).get("valid_entries")
+        if valid_entries is not None:
+            codes = [code for code in codes if code in valid_entries]
+        code_lists[col] = np.array(codes)
+
+    ethnic_groups = [derive_ethnic_groups(lookups["ETHNICITY"][code]) for code in code_lists["ethnicity"]]
+    group_lists = {f"ethnicity_grp{i + 1}": np.array([groups[i] for groups in ethnic_groups]) for i in range(3)}
+
+    return code_lists, group_lists
+
+
+def pick(rng: np.random.Generator, mask: np.ndarray, options: list):
+    """Returns array (len of mask) of randomly picked options, used where mask is set."""
+    return np.asarray(options)[rng.integers(0, len(options), len(mask))]
+
+
+def set_values(frame: dict, col: str, mask: np.ndarray, values):
+    """Sets column values where mask is set, widening the column's fixed-width string type if needed."""
+    values = np.asarray(values)
+    if values.dtype.itemsize > frame[col].dtype.itemsize:
+        frame[col] = frame[col].astype(values.dtype)
+    frame[col][mask] = values
+
+
+def apply_dirty(rng: np.random.Generator, frame: dict, rule: str, rate: float, counts: dict):
+    """Applies one dirty rule to a random fraction (rate) of rows in frame (dict of column arrays)."""
+    count = len(frame["stu_id"])
+    mask = rng.random(count) < rate
+
+    if rule == "students.duplicate_stu_id":
+        # Re-uses the stu_id of the row before, so not the first row of a chunk (nothing before it),
+        # nor a row after another re-used one (it would copy a stu_id no longer in the file)
+        mask[0] = False
+        mask[1:] &= ~mask[:-1]
+
+    # Counted once the rows a rule can't apply to are excluded, so the manifest matches the file
+    counts[rule] = counts.get(rule, 0) + int(mask.sum())
+    if not mask.any():
+        return
+
+    if rule == "students.missing_home_addr" or rule == "students.missing_term_addr":
+        prefix = "home" if "home" in rule else "term"
+        blank_cols = pick(rng, mask, [f"{prefix}_address", f"{prefix}_postcode", f"{prefix}_country"])
+        for col in np.unique(blank_cols[mask]):
+            frame[col][mask & (blank_cols == col)] = ""
+
+    elif rule.endswith(".missing_required"):
+        required = {"students": ["stu_id", "phone", "email", "name", "dob"],
+                    "demographics": list(DEMOGRAPHIC_CODES) + ["ethnicity_grp1", "ethnicity_grp2", "ethnicity_grp3"],
+                    "student_programs": ["stu_id", "program_id", "program_code", "program_name", "enrol_date", "fees_paid"]}
+        blank_cols = pick(rng, mask, required[rule.split(".")[0]])
+        for col in np.unique(blank_cols[mask]):
+            frame[col][mask & (blank_cols == col)] = ""
+
+    elif rule == "students.bad_email":
+        set_values(frame, "email", mask, np.char.replace(frame["email"][mask], "@", " at "))
+
+    elif rule in ("students.bad_format_dob", "student_programs.bad_format_enrol_date"):
+        col = "dob" if rule.startswith("students") else "enrol_date"
+        dates = pd.Series(frame[col][mask])
+        # dd/mm/yyyy in place of yyyy-mm-dd
+        set_values(frame, col, mask, (dates.str[8:10] + "/" + dates.str[5:7] + "/" + dates.str[:4]).to_numpy(dtype=str))
+
+    elif rule in ("students.invalid_dob", "student_programs.invalid_enrol_date"):
+        col = "dob" if rule.startswith("students") else "enrol_date"
+        # yyyy-13-dd, a well-formed but impossible date
+        dates = pd.Series(frame[col][mask])
+        set_values(frame, col, mask, (dates.str[:4] + "-13-" + dates.str[8:10]).to_numpy(dtype=str))
+
+    elif rule == "students.duplicate_stu_id":
+        # Re-use the stu_id of the row before (mask excludes rows it can't apply to, see above)
+        frame["stu_id"][mask] = frame["stu_id"][np.flatnonzero(mask) - 1]
+
+    elif rule == "demographics.invalid_code":
+        bad_cols = pick(rng, mask, list(DEMOGRAPHIC_CODES))
+        for col in np.unique(bad_cols[mask]):
+            set_values(frame, col, mask & (bad_cols == col), "X7")
+
+    elif rule.endswith(".orphan_stu_id"):
+        frame["stu_id"][mask] = random_guids(rng, int(mask.sum()))
+
+    elif rule == "student_programs.bad_fees_flag":
+        set_values(frame, "fees_paid", mask, pick(rng, mask, ["x", "yes", "0"])[mask])
+
+    elif rule == "student_programs.program_id_too_long":
+        set_values(frame, "program_id", mask, concat(frame["program_id"][mask], "-", frame["program_id"][mask]))
+
+
+def write_csv(frame: dict, csv_path: str, header: bool):
+    """
+    Appends frame (dict of column arrays) to a CSV file. Values with commas or
+    quotes are quoted (as pandas to_csv would), rows are joined with vectorised
+    string adds, which is several times quicker than pandas' csv writer.
+    """
+    columns = []
+    for values in frame.values():
+        needs_quotes = (np.char.find(values, ",") >= 0) | (np.char.find(values, '"') >= 0)
+        if needs_quotes.any():
+            values = np.where(needs_quotes, concat('"', np.char.replace(values, '"', '""'), '"'), values)
+        columns.append(values)
+
+    lines = reduce(lambda left, right: np.char.add(np.char.add(left, ","), right), columns)
+
+    with open(csv_path, "a", newline="") as csv_file:
+        if header:
+            csv_file.write(",".join(frame) + "\n")
+        csv_file.write("\n".join(lines.tolist()) + "\n")
+
+
+def generate_programs(rng: np.random.Generator, program_count: int):
+    """Returns the programme catalogue: dict of program_id, program_code and program_name arrays."""
+    awards = pick(rng, np.ones(program_count, dtype=bool), AWARDS)
+    subjects = pick(rng, np.ones(program_count, dtype=bool), SUBJECTS)
+    codes = concat(np.char.upper(np.char.ljust(subjects, 3).astype("U3")), digits(rng, program_count, 5))
+
+    return {"program_id": random_guids(rng, program_count),
+            "program_code": codes,
+            "program_name": concat(awards, " ", subjects)}
+
+
+def generate_chunk(config, chunk_index: int, first_row: int, row_count: int, code_lists: dict,
+                   group_lists: dict, programs: dict, collection_year: int):
+    """Returns (students, demographics, student_programs) clean column dictionaries for one chunk of students."""
+    rng = np.random.default_rng([config["seed"], 1, chunk_index])
+    all_rows = np.ones(row_count, dtype=bool)
+
+    stu_ids = random_guids(rng, row_count)
+    first_names = pick(rng, all_rows, FIRST_NAMES)
+    last_names = pick(rng, all_rows, LAST_NAMES)
+    row_numbers = np.arange(first_row, first_row + row_count).astype(str)
+    emails = np.char.lower(concat(np.char.replace(first_names, " ", "."), ".",
+                                  np.char.replace(last_names, "'", ""), row_numbers, "@example.ac.uk"))
+
+    students = {"stu_id": stu_ids,
+                "phone": concat("07", digits(rng, row_count, 9)),
+                "email": emails,
+                "home_address": concat(rng.integers(1, 300, row_count), " ", pick(rng, all_rows, STREETS), ", ",
+                                       pick(rng, all_rows, TOWNS)),
+                "home_postcode": concat(pick(rng, all_rows, LETTERS), pick(rng, all_rows, LETTERS),
+                                        rng.integers(1, 30, row_count), " ", rng.integers(1, 10, row_count),
+                                        pick(rng, all_rows, LETTERS), pick(rng, all_rows, LETTERS)),
+                "home_country": pick(rng, all_rows, COUNTRIES),
+                "term_address": concat("Flat ", rng.integers(1, 120, row_count), ", ", pick(rng, all_rows, STREETS)),
+                "term_postcode": concat(pick(rng, all_rows, LETTERS), rng.integers(1, 30, row_count), " ",
+                                        rng.integers(1, 10, row_count), pick(rng, all_rows, LETTERS),
+                                        pick(rng, all_rows, LETTERS)),
+                "term_country": np.full(row_count, "United Kingdom"),
+                "name": concat(first_names, " ", last_names),
+                "dob": random_dates(rng, row_count, f"{collection_year - 60}-01-01", f"{collection_year - 17}-01-01")}
+
+    ethnicity_index = rng.integers(0, len(code_lists["ethnicity"]), row_count)
+    demographics = {"stu_id": stu_ids.copy()}
+    for col, codes in code_lists.items():
+        demographics[col] = codes[ethnicity_index] if col == "ethnicity" else pick(rng, all_rows, codes)
+    for col, groups in group_lists.items():
+        demographics[col] = groups[ethnicity_index]
+
+    # Every student on one programme, some on a second
+    second_program = rng.random(row_count) < config["second_program_rate"]
+    program_students = np.concatenate([np.arange(row_count), np.flatnonzero(second_program)])
+    program_index = rng.integers(0, len(programs["program_id"]), len(program_students))
+    student_programs = {"stu_id": stu_ids[program_students],
+                        "email": emails[program_students],
+                        "program_id": programs["program_id"][program_index],
+                        "program_code": programs["program_code"][program_index],
+                        "program_name": programs["program_name"][program_index],
+                        "enrol_date": random_dates(rng, len(program_students), f"{collection_year - 3}-09-01",
+                                                   f"{collection_year}-08-01"),
+                        "fees_paid": pick(rng, np.ones(len(program_students), dtype=bool), ["y", "n", "Y", "N"])}
+
+    return students, demographics, student_programs
+
+
+def write_lookups(config, template_code: str, delivery_code: str, output_dir: str):
+    """Copies the template delivery's lookup files, renamed for the new delivery (unless it is the template)."""
+    template_dir = os.path.join(config["deliveries_dir"], template_code)
+    template_prefix = f"hesa_{template_code}_lookup_"
+    if os.path.samefile(template_dir, output_dir):
+        return
+
+    for file_name in sorted(os.listdir(template_dir)):
+        if file_name.startswith(template_prefix):
+            lookup_name = file_name[len(template_prefix):]
+            shutil.copyfile(os.path.join(template_dir, file_name),
+                            os.path.join(output_dir, f"hesa_{delivery_code}_lookup_{lookup_name}"))
+
+
+def generate_delivery(config, delivery_code: str, row_count: int):
+    """
+    Writes a synthetic delivery of row_count students to deliveries_dir/<delivery_code>.
+    Returns its manifest (including per-rule dirty row counts).
+    """
+    collection_ref, received = delivery_code.split("_")
+    # Collection 22056 covers academic year 2022-2023
+    collection_year = 2000 + int(collection_ref[:2]) + 1
+    output_dir = os.path.join(config["deliveries_dir"], delivery_code)
+    os.makedirs(output_dir, exist_ok=True)
+
+    code_lists, group_lists = get_code_lists(config, config["template"], collection_ref)
+    programs = generate_programs(np.random.default_rng([config["seed"], 0]), config["program_count"])
+    write_lookups(config, config["template"], delivery_code, output_dir)
+
+    data_paths = {entity: os.path.join(output_dir, f"hesa_{delivery_code}_data_{entity}.csv")
+                  for entity in ["students", "demographics", "student_programs"]}
+    for data_path in data_paths.values():
+        if os.path.exists(data_path):
+            os.remove(data_path)
+
+    dirty_counts = {}
+    for chunk_index, first_row in enumerate(range(0, row_count, config["chunk_size"])):
+        chunk_rows = min(config["chunk_size"], row_count - first_row)
+        entity_frames = generate_chunk(config, chunk_index, first_row, chunk_rows,
+                                       code_lists, group_lists, programs, collection_year)
+
+        # Dirty rows drawn from their own generator, so clean data is the same whatever the rates
+        dirty_rng = np.random.default_rng([config["seed"], 2, chunk_index])
+        for entity, frame in zip(data_paths, entity_frames):
+            for rule, rate in config["dirty_rates"].items():
+                if rule.startswith(f"{entity}.") and rate > 0:
+                    apply_dirty(dirty_rng, frame, rule, rate, dirty_counts)
+
+            write_csv(frame, data_paths[entity], header=(chunk_index == 0))
+
+        logging.info(f"Generated students {first_row} to {first_row + chunk_rows - 1} of {row_count}")
+        print(f"Generated {first_row + chunk_rows} of {row_count} students")
+
+    manifest = {"delivery_code": delivery_code,
+                "collection_reference": collection_ref,
+                "collection_date": f"{collection_year}-11-30",
+                "received_date": f"{received[:4]}-{received[4:6]}-{received[6:8]}",
+                "description": f"Synthetic delivery of {row_count} students for academic year "
+                               f"{collection_year - 1}-{collection_year} (seed {config['seed']})",
+                "synthetic": {"rows": row_count,
+                              "seed": config["seed"],
+                              "template": config["template"],
+                              "chunk_size": config["chunk_size"],
+                              "dirty_rates": config["dirty_rates"],
+                              "dirty_counts": dirty_counts}}
+
+    with open(os.path.join(output_dir, f"{delivery_code}.json"), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+
+    return manifest
+
+
+def parse_dirty_rates(default_rate: float, rule_rates: str = None):
+    """Returns {rule: rate} for every rule in DIRTY_RULES, from a default and 'rule:rate,...' overrides."""
+    dirty_rates = {rule: default_rate for rule in DIRTY_RULES}
+
+    for rule_rate in (rule_rates.split(",") if rule_rates else []):
+        rule, rate = rule_rate.rsplit(":", 1)
+        if rule not in DIRTY_RULES:
+            raise ValueError(f"Unknown dirty rule '{rule}', expected one of: {list(DIRTY_RULES)}")
+        dirty_rates[rule] = float(rate)
+
+    return dirty_rates
+
+
+def init():
+    """Set generic config and generator options"""
+    config = get_config()
+    set_up_logging(config, os.path.basename(__file__))
+
+    config["seed"] = int(get_option_value("seed", 0))
+    config["template"] = get_option_value("template", "22056_20240331")
+    config["chunk_size"] = int(get_option_value("chunk-size", 100_000))
+    config["program_count"] = int(get_option_value("programs", 200))
+    config["second_program_rate"] = float(get_option_value("second-program-rate", 0.2))
+    config["dirty_rates"] = parse_dirty_rates(float(get_option_value("dirty-rate", 0.0)), get_option_value("dirty"))
+
+    return config
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1].startswith("--") or not get_option_value("rows"):
+        print(__doc__)
+        sys.exit(1)
+
+    delivery_code = sys.argv[1]
+    config = init()
+    manifest = generate_delivery(config, delivery_code, int(get_option_value("rows")))
+
+    print(f"Delivery {delivery_code} written to {os.path.join(config['deliveries_dir'], delivery_code)}")
+    for rule, count in manifest["synthetic"]["dirty_counts"].items():
+        print(f"    {rule}: {count} dirty rows")
+
+
+if __name__ == "__main__":
+    main()